@@ -12,62 +12,31 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from typing import Optional, Tuple, Dict
-from google.cloud import bigquery
 import matplotlib.pyplot as plt
 import seaborn as sns
 from loguru import logger
 
+from ..utils.bigquery_clients import get_client
+from ..utils.bigquery_results import results_to_dataframe
+from ..utils.query_templates import QueryTemplate
+
 
 class CohortAnalyzer:
     """Classe para análise de cohort de clientes"""
     
-    def __init__(self, project_id: str, dataset_id: str):
-        """
-        Inicializa o analisador de cohort
-        
-        Args:
-            project_id: ID do projeto GCP
-            dataset_id: ID do dataset BigQuery
-        """
-        self.project_id = project_id
-        self.dataset_id = dataset_id
-        self.client = bigquery.Client(project=project_id)
-        self.cohort_data = None
-        self.retention_matrix = None
-        
-        logger.info("Cohort Analyzer inicializado")
-    
-    def extract_cohort_data(self, start_date: Optional[str] = None, 
-                           end_date: Optional[str] = None) -> pd.DataFrame:
+    COHORT_QUERY = QueryTemplate(
         """
-        Extrai dados de cohort do BigQuery
-        
-        Args:
-            start_date: Data inicial (formato YYYY-MM-DD)
-            end_date: Data final (formato YYYY-MM-DD)
-            
-        Returns:
-            DataFrame com dados de cohort
-        """
-        logger.info("Extraindo dados de cohort do BigQuery...")
-        
-        date_filter = ""
-        if start_date:
-            date_filter += f"AND o.order_purchase_timestamp >= '{start_date}' "
-        if end_date:
-            date_filter += f"AND o.order_purchase_timestamp <= '{end_date}' "
-        
-        query = f"""
         WITH first_purchase AS (
             SELECT 
                 c.customer_unique_id,
                 MIN(o.order_purchase_timestamp) AS first_purchase_date,
                 DATE_TRUNC(MIN(o.order_purchase_timestamp), MONTH) AS cohort_month
-            FROM `{self.project_id}.{self.dataset_id}.orders` o
-            INNER JOIN `{self.project_id}.{self.dataset_id}.customers` c 
+            FROM `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.orders` o
+            INNER JOIN `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.customers` c 
                 ON o.customer_id = c.customer_id
-            WHERE o.order_status = 'delivered'
-                {date_filter}
+            WHERE o.order_status = @order_status
+                AND (@start_date IS NULL OR o.order_purchase_timestamp >= @start_date)
+                AND (@end_date IS NULL OR o.order_purchase_timestamp <= @end_date)
             GROUP BY c.customer_unique_id
         ),
         
@@ -78,14 +47,14 @@ class CohortAnalyzer:
                 DATE_TRUNC(o.order_purchase_timestamp, MONTH) AS purchase_month,
                 fp.cohort_month,
                 p.payment_value
-            FROM `{self.project_id}.{self.dataset_id}.orders` o
-            INNER JOIN `{self.project_id}.{self.dataset_id}.customers` c 
+            FROM `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.orders` o
+            INNER JOIN `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.customers` c 
                 ON o.customer_id = c.customer_id
             INNER JOIN first_purchase fp 
                 ON c.customer_unique_id = fp.customer_unique_id
-            INNER JOIN `{self.project_id}.{self.dataset_id}.payments` p 
+            INNER JOIN `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.payments` p 
                 ON o.order_id = p.order_id
-            WHERE o.order_status = 'delivered'
+            WHERE o.order_status = @order_status
         )
         
         SELECT 
@@ -96,9 +65,53 @@ class CohortAnalyzer:
             DATE_DIFF(purchase_month, cohort_month, MONTH) AS months_since_first_purchase
         FROM all_purchases
         ORDER BY cohort_month, customer_unique_id, purchase_month
+        """,
+        {'start_date': 'TIMESTAMP', 'end_date': 'TIMESTAMP', 'order_status': 'STRING'}
+    )
+    
+    def __init__(self, project_id: str, dataset_id: str):
+        """
+        Inicializa o analisador de cohort
+        
+        Args:
+            project_id: ID do projeto GCP
+            dataset_id: ID do dataset BigQuery
         """
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.client = get_client(project_id)
+        self.cohort_data = None
+        self.retention_matrix = None
+        
+        logger.info("Cohort Analyzer inicializado")
+    
+    def extract_cohort_data(self, start_date: Optional[str] = None, 
+                           end_date: Optional[str] = None,
+                           order_status: str = 'delivered') -> pd.DataFrame:
+        """
+        Extrai dados de cohort do BigQuery
+        
+        O período vai como parâmetro (NULL = sem limite), então o SQL é o
+        mesmo para qualquer intervalo.
+        
+        Args:
+            start_date: Data inicial (formato YYYY-MM-DD)
+            end_date: Data final (formato YYYY-MM-DD)
+            order_status: Status dos pedidos considerados
+            
+        Returns:
+            DataFrame com dados de cohort
+        """
+        logger.info("Extraindo dados de cohort do BigQuery...")
+        
+        query = self.COHORT_QUERY.render(self.project_id, self.dataset_id)
+        job_config = self.COHORT_QUERY.job_config(
+            start_date=start_date,
+            end_date=end_date,
+            order_status=order_status
+        )
         
-        df = self.client.query(query).to_dataframe()
+        df = results_to_dataframe(self.client.query(query, job_config=job_config))
         
         logger.success(f"✓ {len(df):,} registros extraídos")
         logger.info(f"Cohorts: {df['cohort_month'].min()} a {df['cohort_month'].max()}")
@@ -15,11 +15,13 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Tuple
-from google.cloud import bigquery
 import matplotlib.pyplot as plt
 import seaborn as sns
 from loguru import logger
 
+from ..utils.bigquery_clients import get_client
+from ..utils.bigquery_results import results_to_dataframe
+
 
 class LTVCalculator:
     """Classe para cálculo de Customer Lifetime Value"""
@@ -34,7 +36,7 @@ class LTVCalculator:
         """
         self.project_id = project_id
         self.dataset_id = dataset_id
-        self.client = bigquery.Client(project=project_id)
+        self.client = get_client(project_id)
         self.customer_ltv = None
         
         logger.info("LTV Calculator inicializado")
@@ -101,7 +103,7 @@ class LTVCalculator:
         GROUP BY customer_unique_id, customer_state, customer_city
         """
         
-        df = self.client.query(query).to_dataframe()
+        df = results_to_dataframe(self.client.query(query))
         
         logger.success(f"✓ LTV calculado para {len(df):,} clientes")
         
@@ -253,7 +255,7 @@ class LTVCalculator:
         ORDER BY cohort_month
         """
         
-        df = self.client.query(query).to_dataframe()
+        df = results_to_dataframe(self.client.query(query))
         
         # Formatar
         df['cohort_month'] = pd.to_datetime(df['cohort_month'])
@@ -0,0 +1,124 @@
+"""
+Quantile Sketch - Olist E-Commerce
+-----------------------------------
+Quantis aproximados em streaming (sketch KLL).
+Recebe os valores em blocos, guarda só O(k log(n/k)) itens e responde
+quantis com erro de rank limitado, sem ordenar a coluna inteira.
+
+Precisão: com k=200 o erro de rank normalizado fica abaixo de ~1,7% com
+99% de confiança (ex: o limite do quintil 0,2 cai entre os ranks 0,183 e
+0,217). O erro diminui proporcionalmente a 1/k.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import math
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+class KLLSketch:
+    """Sketch KLL de quantis para valores numéricos"""
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        """
+        Inicializa o sketch
+
+        Args:
+            k: Tamanho do compactor do nível mais alto (precisão ~1/k)
+            seed: Semente do sorteio de compactação (reprodutibilidade)
+        """
+        if k < 8:
+            raise ValueError("k deve ser >= 8")
+
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        # Níveis mais baixos (itens de peso menor) recebem capacidade menor
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 8)
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+
+                items = np.sort(items)
+                keep = items[:0]
+                if len(items) % 2:
+                    keep, items = items[-1:], items[:-1]
+
+                # Metade dos itens sobe de nível com o dobro do peso
+                offset = int(self._rng.integers(2))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[offset::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def update(self, values: Sequence[float]) -> None:
+        """
+        Adiciona um bloco de valores (NaN são ignorados)
+
+        Args:
+            values: Valores do bloco
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: 'KLLSketch') -> None:
+        """
+        Incorpora outro sketch (ex: blocos processados em paralelo)
+
+        Args:
+            other: Sketch com o mesmo k
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+
+    @property
+    def num_retained(self) -> int:
+        """Itens guardados pelo sketch"""
+        return sum(len(items) for items in self.levels)
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """
+        Quantis aproximados
+
+        Args:
+            qs: Frações entre 0 e 1
+
+        Returns:
+            Array com um valor por fração
+        """
+        if self.n == 0:
+            raise ValueError("Sketch vazio")
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level_items), 2 ** level, dtype=np.float64)
+            for level, level_items in enumerate(self.levels)
+        ])
+
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+
+        targets = np.asarray(qs, dtype=np.float64) * cumulative[-1]
+        positions = np.searchsorted(cumulative, targets, side='left')
+        return items[np.minimum(positions, len(items) - 1)]
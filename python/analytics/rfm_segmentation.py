@@ -11,60 +11,34 @@ Data: Outubro 2025
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from google.cloud import bigquery
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Tuple, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from loguru import logger
 
+from ..utils.bigquery_clients import get_client
+from ..utils.bigquery_results import iter_result_batches, results_to_dataframe
+from ..utils.query_templates import QueryTemplate
+from .quantile_sketch import KLLSketch
+from .segment_rules import assign_segments, load_segment_rules
+
 
 class RFMAnalyzer:
     """Classe para análise RFM de clientes"""
     
-    def __init__(self, project_id: str, dataset_id: str):
-        """
-        Inicializa o analisador RFM
-        
-        Args:
-            project_id: ID do projeto GCP
-            dataset_id: ID do dataset BigQuery
+    MAX_DATE_QUERY = QueryTemplate(
         """
-        self.project_id = project_id
-        self.dataset_id = dataset_id
-        self.client = bigquery.Client(project=project_id)
-        self.rfm_data = None
-        
-        logger.info("RFM Analyzer inicializado")
+        SELECT MAX(order_purchase_timestamp) as max_date
+        FROM `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.orders`
+        WHERE order_status = @order_status
+        """,
+        {'order_status': 'STRING'}
+    )
     
-    def extract_rfm_data(self, reference_date: str = None) -> pd.DataFrame:
+    RFM_QUERY = QueryTemplate(
         """
-        Extrai dados para cálculo RFM do BigQuery
-        
-        Args:
-            reference_date: Data de referência (formato YYYY-MM-DD)
-                           Se None, usa a data máxima do dataset
-        
-        Returns:
-            DataFrame com dados RFM
-        """
-        logger.info("Extraindo dados para RFM...")
-        
-        # Se não fornecida, buscar data máxima
-        if reference_date is None:
-            query_max_date = f"""
-            SELECT MAX(order_purchase_timestamp) as max_date
-            FROM `{self.project_id}.{self.dataset_id}.orders`
-            WHERE order_status = 'delivered'
-            """
-            max_date = self.client.query(query_max_date).to_dataframe()
-            reference_date = max_date['max_date'].iloc[0]
-        
-        logger.info(f"Data de referência: {reference_date}")
-        
-        # Query principal para RFM
-        query = f"""
         WITH customer_orders AS (
             SELECT 
                 c.customer_unique_id,
@@ -75,18 +49,18 @@ class RFMAnalyzer:
                 
                 -- Recência: dias desde a última compra
                 DATE_DIFF(
-                    DATE('{reference_date}'),
+                    DATE(@reference_date),
                     DATE(o.order_purchase_timestamp),
                     DAY
                 ) AS days_since_purchase
 
-            FROM `{self.project_id}.{self.dataset_id}.orders` o
-            INNER JOIN `{self.project_id}.{self.dataset_id}.customers` c 
+            FROM `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.orders` o
+            INNER JOIN `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.customers` c 
                 ON o.customer_id = c.customer_id
-            INNER JOIN `{self.project_id}.{self.dataset_id}.payments` p 
+            INNER JOIN `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.payments` p 
                 ON o.order_id = p.order_id
-            WHERE o.order_status = 'delivered'
-                AND o.order_purchase_timestamp <= '{reference_date}'
+            WHERE o.order_status = @order_status
+                AND o.order_purchase_timestamp <= @reference_date
         )
 
         SELECT 
@@ -109,83 +83,298 @@ class RFMAnalyzer:
 
         FROM customer_orders
         GROUP BY customer_unique_id, customer_state
+        """,
+        {'reference_date': 'TIMESTAMP', 'order_status': 'STRING'}
+    )
+    
+    def __init__(self, project_id: str, dataset_id: str,
+                 segment_rules: Optional[str] = None):
+        """
+        Inicializa o analisador RFM
+        
+        Args:
+            project_id: ID do projeto GCP
+            dataset_id: ID do dataset BigQuery
+            segment_rules: Arquivo JSON com conjuntos de regras de
+                           segmentação (além do 'default' embutido)
         """
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.client = get_client(project_id)
+        self.rfm_data = None
+        self.segment_rules = load_segment_rules(segment_rules)
+        
+        logger.info("RFM Analyzer inicializado")
+    
+    def _run_rfm_query(self, reference_date: Optional[str],
+                       order_status: str = 'delivered'):
+        """
+        Executa a query RFM (buscando a data máxima se necessário)
         
-        df = self.client.query(query).to_dataframe()
+        Args:
+            reference_date: Data de referência (None = data máxima do dataset)
+            order_status: Status dos pedidos considerados
+        
+        Returns:
+            QueryJob da query RFM
+        """
+        # Se não fornecida, buscar data máxima
+        if reference_date is None:
+            query_max_date = self.MAX_DATE_QUERY.render(self.project_id, self.dataset_id)
+            max_date = results_to_dataframe(self.client.query(
+                query_max_date,
+                job_config=self.MAX_DATE_QUERY.job_config(order_status=order_status)
+            ))
+            reference_date = max_date['max_date'].iloc[0]
+        
+        logger.info(f"Data de referência: {reference_date}")
+        
+        # Query principal para RFM
+        query = self.RFM_QUERY.render(self.project_id, self.dataset_id)
+        job_config = self.RFM_QUERY.job_config(
+            reference_date=reference_date,
+            order_status=order_status
+        )
+        
+        return self.client.query(query, job_config=job_config)
+    
+    def extract_rfm_data(self, reference_date: str = None,
+                         order_status: str = 'delivered') -> pd.DataFrame:
+        """
+        Extrai dados para cálculo RFM do BigQuery
+        
+        O SQL é fixo e as datas vão como parâmetros, então a mesma data de
+        referência reaproveita o cache de resultados do BigQuery.
+        
+        Args:
+            reference_date: Data de referência (formato YYYY-MM-DD)
+                           Se None, usa a data máxima do dataset
+            order_status: Status dos pedidos considerados
+        
+        Returns:
+            DataFrame com dados RFM
+        """
+        logger.info("Extraindo dados para RFM...")
+        
+        df = results_to_dataframe(self._run_rfm_query(reference_date, order_status))
         
         logger.success(f"✓ {len(df):,} clientes extraídos")
         
         self.rfm_data = df
         return df
     
-    def calculate_rfm_scores(self, df: pd.DataFrame, n_quantiles: int = 5) -> pd.DataFrame:
+    # (score, métrica, maior é melhor)
+    RFM_METRICS = (
+        ('R_score', 'recency', False),  # Recency: menor é melhor (inverter)
+        ('F_score', 'frequency', True),
+        ('M_score', 'monetary', True),
+    )
+    
+    @staticmethod
+    def quantile_edges(values: np.ndarray, n_quantiles: int) -> np.ndarray:
+        """
+        Limites internos dos quantis (mesma interpolação do pd.qcut)
+        
+        Args:
+            values: Valores da métrica
+            n_quantiles: Número de quantis
+        
+        Returns:
+            Array com n_quantiles - 1 limites
+        """
+        return np.quantile(values, np.linspace(0, 1, n_quantiles + 1)[1:-1])
+    
+    @staticmethod
+    def scores_from_edges(values: np.ndarray, edges: np.ndarray,
+                          ascending: bool = True) -> np.ndarray:
+        """
+        Atribui scores 1..n pelos limites dos quantis
+        
+        Intervalos fechados à direita, como no pd.qcut; valores repetidos
+        em um limite ficam todos no quantil inferior.
+        
+        Args:
+            values: Valores da métrica
+            edges: Limites internos (quantile_edges)
+            ascending: Se False, o menor valor recebe o maior score
+        
+        Returns:
+            Array int8 de scores
+        """
+        bins = np.searchsorted(edges, values, side='left')
+        scores = bins + 1 if ascending else len(edges) + 1 - bins
+        return scores.astype(np.int8)
+    
+    def calculate_rfm_scores(self, df: pd.DataFrame, n_quantiles: int = 5,
+                             edges: Optional[Dict[str, np.ndarray]] = None,
+                             with_labels: bool = False) -> pd.DataFrame:
         """
         Calcula scores RFM (1-5) usando quantis
         
+        Os scores são int8 e o código combinado fica em RFM_code (ex: 545),
+        para filtros e agrupamentos sem comparação de strings. O texto
+        RFM_score (ex: '545') só é gerado na exportação (rfm_score_labels).
+        
         Args:
             df: DataFrame com dados RFM
             n_quantiles: Número de quantis (default: 5 para 1-5)
+            edges: Limites já calculados por métrica (ex: sketch_rfm_edges);
+                   se None, são calculados a partir de df
+            with_labels: Se True, adiciona também RFM_score em texto
+                         (compatibilidade com consumidores da coluna antiga)
         
         Returns:
             DataFrame com scores RFM adicionados
         """
         logger.info(f"Calculando scores RFM ({n_quantiles} quantis)...")
         
-        df = df.copy()
+        # Cópia rasa: as colunas existentes não são duplicadas
+        df = df.copy(deep=False)
         
-        # Recency: menor é melhor (inverter)
-        df['R_score'] = pd.qcut(
-            df['recency'], 
-            q=n_quantiles, 
-            labels=range(n_quantiles, 0, -1),
-            duplicates='drop'
-        )
-        
-        # Frequency: maior é melhor
-        df['F_score'] = pd.qcut(
-            df['frequency'], 
-            q=n_quantiles, 
-            labels=range(1, n_quantiles + 1),
-            duplicates='drop'
-        )
+        for score, metric, ascending in self.RFM_METRICS:
+            values = df[metric].to_numpy(dtype=np.float64)
+            metric_edges = edges[metric] if edges is not None \
+                else self.quantile_edges(values, n_quantiles)
+            df[score] = self.scores_from_edges(values, metric_edges, ascending)
         
-        # Monetary: maior é melhor
-        df['M_score'] = pd.qcut(
-            df['monetary'], 
-            q=n_quantiles, 
-            labels=range(1, n_quantiles + 1),
-            duplicates='drop'
-        )
+        r = df['R_score'].to_numpy()
+        f = df['F_score'].to_numpy()
+        m = df['M_score'].to_numpy()
         
-        # Converter para int
-        df['R_score'] = df['R_score'].astype(int)
-        df['F_score'] = df['F_score'].astype(int)
-        df['M_score'] = df['M_score'].astype(int)
-        
-        # RFM Score combinado (string)
-        df['RFM_score'] = (
-            df['R_score'].astype(str) + 
-            df['F_score'].astype(str) + 
-            df['M_score'].astype(str)
-        )
+        # RFM Score combinado: um dígito (ou dois, se n_quantiles >= 10) por score
+        base = 10 ** len(str(n_quantiles))
+        code_dtype = np.int16 if base ** 3 <= np.iinfo(np.int16).max else np.int32
+        df['RFM_code'] = (r.astype(code_dtype) * base + f) * base + m
+        if with_labels:
+            df['RFM_score'] = self.rfm_score_labels(df)
         
         # RFM Score numérico (média ponderada)
         df['RFM_score_numeric'] = (
-            df['R_score'] * 0.4 +  # Recency mais importante
-            df['F_score'] * 0.3 + 
-            df['M_score'] * 0.3
+            r * 0.4 +  # Recency mais importante
+            f * 0.3 + 
+            m * 0.3
         )
         
+        # Escala dos scores, usada na segmentação
+        df.attrs['rfm_quantiles'] = n_quantiles
+        
         logger.success("✓ Scores RFM calculados")
         
         return df
     
-    def segment_customers(self, df: pd.DataFrame) -> pd.DataFrame:
+    def sketch_rfm_edges(self, batches: Iterable[pd.DataFrame],
+                         n_quantiles: int = 5,
+                         sketch_k: int = 200,
+                         seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Limites dos quantis R/F/M estimados em streaming (sketch KLL)
+        
+        Cada bloco é descartado após alimentar os sketches, então a memória
+        não depende do número de clientes. Com sketch_k=200 o rank de cada
+        limite erra no máximo ~1,7% (99% de confiança): um cliente só muda
+        de score se estiver nessa faixa em torno do limite exato.
+        
+        Args:
+            batches: Blocos com recency, frequency e monetary
+            n_quantiles: Número de quantis
+            sketch_k: Precisão do sketch (erro ~1/k)
+            seed: Semente do sketch (reprodutibilidade)
+        
+        Returns:
+            Dict métrica -> limites internos (como quantile_edges)
+        """
+        sketches = {
+            metric: KLLSketch(k=sketch_k, seed=seed)
+            for _, metric, _ in self.RFM_METRICS
+        }
+        
+        for batch in batches:
+            for metric, sketch in sketches.items():
+                sketch.update(batch[metric].to_numpy(dtype=np.float64))
+        
+        qs = np.linspace(0, 1, n_quantiles + 1)[1:-1]
+        edges = {metric: sketch.quantiles(qs) for metric, sketch in sketches.items()}
+        
+        logger.info(
+            f"Limites RFM estimados: {sketches['recency'].n:,} clientes, "
+            f"{sketches['recency'].num_retained} itens retidos por métrica"
+        )
+        
+        return edges
+    
+    def iter_rfm_scores(self, reference_date: str = None,
+                        n_quantiles: int = 5,
+                        page_size: int = 100_000,
+                        sketch_k: int = 200,
+                        order_status: str = 'delivered') -> Iterator[pd.DataFrame]:
+        """
+        RFM em streaming: scores e segmentos bloco a bloco
+        
+        A query roda uma vez; o resultado (tabela temporária do job) é lido
+        duas vezes com list_rows, sem novo custo de query: a primeira
+        passada alimenta os sketches dos limites, a segunda atribui scores
+        e segmentos. Nenhuma passada mantém o resultado inteiro em memória.
+        
+        Args:
+            reference_date: Data de referência (None = data máxima do dataset)
+            n_quantiles: Número de quantis
+            page_size: Clientes por bloco
+            sketch_k: Precisão do sketch (ver sketch_rfm_edges)
+            order_status: Status dos pedidos considerados
+        
+        Yields:
+            DataFrames com scores RFM e segmentos
+        """
+        job = self._run_rfm_query(reference_date, order_status)
+        job.result()
+        
+        def pages():
+            return iter_result_batches(self.client.list_rows(job.destination, page_size=page_size))
+        
+        edges = self.sketch_rfm_edges(pages(), n_quantiles, sketch_k)
+        
+        for batch in pages():
+            batch = self.calculate_rfm_scores(batch, n_quantiles, edges=edges)
+            yield self.segment_customers(batch)
+    
+    @staticmethod
+    def rfm_score_labels(df: pd.DataFrame) -> pd.Series:
+        """
+        RFM_score em texto (ex: '545') a partir de RFM_code
+        
+        Cada código distinto é formatado uma única vez.
+        
+        Args:
+            df: DataFrame com R_score, F_score, M_score e RFM_code
+        
+        Returns:
+            Series de strings alinhada ao índice de df
+        """
+        codes = df['RFM_code'].to_numpy()
+        _, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        
+        r, f, m = (df[col].to_numpy()[first] for col in ('R_score', 'F_score', 'M_score'))
+        labels = np.array([f"{a}{b}{c}" for a, b, c in zip(r, f, m)], dtype=object)
+        
+        return pd.Series(labels[inverse], index=df.index, dtype=object)
+    
+    def segment_customers(self, df: pd.DataFrame,
+                          rule_sets: Optional[List[str]] = None,
+                          n_quantiles: Optional[int] = None) -> pd.DataFrame:
         """
         Segmenta clientes em categorias de negócio
         
+        Cada conjunto de regras (segment_rules) é compilado em um cubo
+        [R, F, M] -> segmento; todos os conjuntos pedidos são avaliados na
+        mesma passada sobre os scores.
+        
         Args:
             df: DataFrame com scores RFM
+            rule_sets: Conjuntos de regras a aplicar (default: ['default']).
+                       O primeiro gera 'segment'/'priority'; os demais,
+                       'segment_<nome>'/'priority_<nome>'
+            n_quantiles: Escala dos scores (default: a usada em
+                         calculate_rfm_scores ou o maior score, mínimo 5)
         
         Returns:
             DataFrame com segmentos adicionados
@@ -193,77 +382,29 @@ class RFMAnalyzer:
         logger.info("Segmentando clientes...")
         
         df = df.copy()
+        rule_sets = rule_sets or ['default']
         
-        # Segmentação baseada em regras de negócio
-        def assign_segment(row):
-            r, f, m = row['R_score'], row['F_score'], row['M_score']
-            
-            # Champions: Melhores clientes
-            if r >= 4 and f >= 4 and m >= 4:
-                return 'Champions'
-            
-            # Loyal: Compram frequentemente
-            elif f >= 4:
-                return 'Loyal Customers'
-            
-            # Potential Loyalist: Clientes recentes com potencial
-            elif r >= 4 and f >= 2 and m >= 2:
-                return 'Potential Loyalist'
-            
-            # New Customers: Clientes novos
-            elif r >= 4 and f == 1:
-                return 'New Customers'
-            
-            # Promising: Compradores recentes, baixa frequência
-            elif r >= 3 and f == 1 and m >= 2:
-                return 'Promising'
-            
-            # Need Attention: Clientes em risco
-            elif r >= 2 and f >= 2 and m >= 2:
-                return 'Need Attention'
-            
-            # About to Sleep: Risco de churn
-            elif r >= 2 and f <= 2 and m <= 2:
-                return 'About To Sleep'
-            
-            # At Risk: Alto risco de perda
-            elif r <= 2 and f >= 3 and m >= 3:
-                return 'At Risk'
-            
-            # Cannot Lose Them: Clientes valiosos inativos
-            elif r <= 2 and f >= 4 and m >= 4:
-                return 'Cannot Lose Them'
-            
-            # Hibernating: Inativos há muito tempo
-            elif r <= 2 and f <= 2 and m <= 2:
-                return 'Hibernating'
-            
-            # Lost: Perdidos
-            elif r == 1:
-                return 'Lost'
-            
-            else:
-                return 'Others'
-        
-        df['segment'] = df.apply(assign_segment, axis=1)
-        
-        # Adicionar prioridade de ação
-        priority_map = {
-            'Champions': 1,
-            'Loyal Customers': 2,
-            'Cannot Lose Them': 1,
-            'At Risk': 2,
-            'Potential Loyalist': 3,
-            'Need Attention': 3,
-            'Promising': 4,
-            'New Customers': 4,
-            'About To Sleep': 3,
-            'Hibernating': 5,
-            'Lost': 6,
-            'Others': 5
-        }
+        missing = [name for name in rule_sets if name not in self.segment_rules]
+        if missing:
+            raise ValueError(f"Conjuntos de regras não encontrados: {missing}")
+        
+        r = df['R_score'].to_numpy(dtype=np.intp)
+        f = df['F_score'].to_numpy(dtype=np.intp)
+        m = df['M_score'].to_numpy(dtype=np.intp)
         
-        df['priority'] = df['segment'].map(priority_map)
+        max_score = int(max(r.max(), f.max(), m.max())) if len(df) else 0
+        n_quantiles = max(n_quantiles or df.attrs.get('rfm_quantiles', 5), max_score)
+        
+        results = assign_segments(
+            r, f, m, [self.segment_rules[name] for name in rule_sets], n_quantiles
+        )
+        
+        for i, (name, (segments, priorities)) in enumerate(zip(rule_sets, results)):
+            suffix = '' if i == 0 else f'_{name}'
+            df[f'segment{suffix}'] = segments
+            
+            # Adicionar prioridade de ação
+            df[f'priority{suffix}'] = priorities
         
         logger.success("✓ Clientes segmentados")
         
@@ -440,7 +581,10 @@ class RFMAnalyzer:
         
         # 7. Salvar resultados
         if save_results:
-            df.to_csv('data/processed/rfm_customers.csv', index=False)
+            # RFM_score em texto só no arquivo exportado
+            df.assign(RFM_score=self.rfm_score_labels(df)).to_csv(
+                'data/processed/rfm_customers.csv', index=False
+            )
             summary.to_csv('data/processed/rfm_summary.csv')
             logger.success("✓ Resultados salvos em data/processed/")
         
@@ -460,7 +604,7 @@ def main():
     dataset_id = os.getenv('GCP_DATASET_ID', 'olist_ecommerce')
     
     # Executar análise
-    analyzer = RFMAnalyzer(project_id, dataset_id)
+    analyzer = RFMAnalyzer(project_id, dataset_id, segment_rules=os.getenv('RFM_SEGMENT_RULES'))
     rfm_data, summary = analyzer.run_full_analysis()
     
     # Plot (opcional)
@@ -0,0 +1,268 @@
+"""
+Segment Rules - Olist E-Commerce
+---------------------------------
+Regras declarativas de segmentação RFM.
+Cada conjunto de regras é compilado uma vez em um cubo denso
+[R, F, M] -> segmento para o número de quantis usado, e vários
+conjuntos são avaliados na mesma passada sobre os scores.
+
+Formato (JSON, ver load_segment_rules):
+
+    {
+      "default": {
+        "scale": 5,
+        "fallback": "Others",
+        "rules": [
+          {"segment": "Champions", "when": {"R": [">=", 4], "F": [">=", 4], "M": [">=", 4]}},
+          {"segment": "Loyal Customers", "when": {"F": [">=", 4]}}
+        ],
+        "priority": {"Champions": 1, "Loyal Customers": 2, "Others": 5}
+      }
+    }
+
+As regras são avaliadas na ordem (a primeira que casa vence). Os limites
+são escritos na escala `scale`; com outro n_quantiles cada score é
+convertido para essa escala pelo ponto médio do seu quantil.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import json
+import operator
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from loguru import logger
+
+
+OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+DEFAULT_SEGMENT_RULES = {
+    'default': {
+        'scale': 5,
+        'fallback': 'Others',
+        'rules': [
+            # Champions: Melhores clientes
+            {'segment': 'Champions', 'when': {'R': ['>=', 4], 'F': ['>=', 4], 'M': ['>=', 4]}},
+            # Loyal: Compram frequentemente
+            {'segment': 'Loyal Customers', 'when': {'F': ['>=', 4]}},
+            # Potential Loyalist: Clientes recentes com potencial
+            {'segment': 'Potential Loyalist', 'when': {'R': ['>=', 4], 'F': ['>=', 2], 'M': ['>=', 2]}},
+            # New Customers: Clientes novos
+            {'segment': 'New Customers', 'when': {'R': ['>=', 4], 'F': ['==', 1]}},
+            # Promising: Compradores recentes, baixa frequência
+            {'segment': 'Promising', 'when': {'R': ['>=', 3], 'F': ['==', 1], 'M': ['>=', 2]}},
+            # Need Attention: Clientes em risco
+            {'segment': 'Need Attention', 'when': {'R': ['>=', 2], 'F': ['>=', 2], 'M': ['>=', 2]}},
+            # About to Sleep: Risco de churn
+            {'segment': 'About To Sleep', 'when': {'R': ['>=', 2], 'F': ['<=', 2], 'M': ['<=', 2]}},
+            # At Risk: Alto risco de perda
+            {'segment': 'At Risk', 'when': {'R': ['<=', 2], 'F': ['>=', 3], 'M': ['>=', 3]}},
+            # Cannot Lose Them: Clientes valiosos inativos
+            {'segment': 'Cannot Lose Them', 'when': {'R': ['<=', 2], 'F': ['>=', 4], 'M': ['>=', 4]}},
+            # Hibernating: Inativos há muito tempo
+            {'segment': 'Hibernating', 'when': {'R': ['<=', 2], 'F': ['<=', 2], 'M': ['<=', 2]}},
+            # Lost: Perdidos
+            {'segment': 'Lost', 'when': {'R': ['==', 1]}},
+        ],
+        # Prioridade de ação por segmento
+        'priority': {
+            'Champions': 1,
+            'Loyal Customers': 2,
+            'Cannot Lose Them': 1,
+            'At Risk': 2,
+            'Potential Loyalist': 3,
+            'Need Attention': 3,
+            'Promising': 4,
+            'New Customers': 4,
+            'About To Sleep': 3,
+            'Hibernating': 5,
+            'Lost': 6,
+            'Others': 5,
+        },
+    }
+}
+
+
+class SegmentRuleSet:
+    """Conjunto ordenado de regras (primeira que casa) compilável em cubo"""
+
+    def __init__(self, name: str,
+                 rules: List[Dict],
+                 priority: Dict[str, int],
+                 fallback: str = 'Others',
+                 scale: int = 5):
+        """
+        Inicializa o conjunto de regras
+
+        Args:
+            name: Nome do conjunto (ex: 'default', 'variant_b')
+            rules: Lista de {'segment': nome, 'when': {'R'|'F'|'M': [op, valor]}}
+            priority: Dict segmento -> prioridade de ação
+            fallback: Segmento quando nenhuma regra casa
+            scale: Escala em que os limites foram escritos (1..scale)
+        """
+        self.name = name
+        self.rules = rules
+        self.fallback = fallback
+        self.scale = scale
+        self.priority = priority
+        self._cubes: Dict[int, np.ndarray] = {}
+
+        self._validate()
+
+        # Códigos na ordem de primeira aparição (regras, fallback)
+        names = list(dict.fromkeys([rule['segment'] for rule in rules] + [fallback]))
+        self.segments = np.array(names, dtype=object)
+        self.priorities = np.array([priority.get(seg, 0) for seg in names], dtype=np.int64)
+
+    @classmethod
+    def from_dict(cls, name: str, spec: Dict) -> 'SegmentRuleSet':
+        """Cria o conjunto a partir da definição declarativa (JSON)"""
+        return cls(
+            name=name,
+            rules=spec['rules'],
+            priority=spec.get('priority', {}),
+            fallback=spec.get('fallback', 'Others'),
+            scale=spec.get('scale', 5),
+        )
+
+    def _validate(self) -> None:
+        """Valida eixos (R, F, M) e operadores de cada regra"""
+        for rule in self.rules:
+            for axis, condition in rule['when'].items():
+                if axis not in ('R', 'F', 'M'):
+                    raise ValueError(f"{self.name}: eixo inválido '{axis}' em {rule['segment']}")
+                if condition[0] not in OPERATORS:
+                    raise ValueError(f"{self.name}: operador inválido '{condition[0]}' em {rule['segment']}")
+
+    def to_scale(self, scores: np.ndarray, n_quantiles: int) -> np.ndarray:
+        """
+        Converte scores 1..n_quantiles para a escala das regras
+
+        Usa o ponto médio de cada quantil: com 10 quantis, 9 e 10 viram 5;
+        com 3 quantis, 1, 2 e 3 viram 1, 3 e 5.
+
+        Args:
+            scores: Scores inteiros
+            n_quantiles: Número de quantis dos scores
+
+        Returns:
+            Scores na escala 1..scale
+        """
+        if n_quantiles == self.scale:
+            return scores
+        return np.floor((scores - 0.5) * self.scale / n_quantiles).astype(np.int64) + 1
+
+    def compile(self, n_quantiles: int = 5) -> np.ndarray:
+        """
+        Cubo denso de códigos de segmento indexado por [R, F, M]
+
+        Args:
+            n_quantiles: Maior score (o índice 0 fica sem uso)
+
+        Returns:
+            Array int8 (n+1, n+1, n+1) com índices em self.segments
+        """
+        if n_quantiles not in self._cubes:
+            if n_quantiles != self.scale:
+                logger.warning(
+                    f"Regras '{self.name}' escritas na escala 1-{self.scale}: scores de "
+                    f"{n_quantiles} quantis serão convertidos (declare scale={n_quantiles} "
+                    f"para regras próprias dessa escala)"
+                )
+
+            size = n_quantiles + 1
+            grid = dict(zip('RFM', (
+                self.to_scale(axis, n_quantiles) for axis in np.indices((size, size, size))
+            )))
+            codes = {name: code for code, name in enumerate(self.segments)}
+
+            cube = np.full((size, size, size), codes[self.fallback], dtype=np.int8)
+            unassigned = np.ones(cube.shape, dtype=bool)
+
+            for rule in self.rules:
+                match = unassigned.copy()
+                for axis, (op, value) in rule['when'].items():
+                    match &= OPERATORS[op](grid[axis], value)
+                cube[match] = codes[rule['segment']]
+                unassigned &= ~match
+
+            self._cubes[n_quantiles] = cube
+
+        return self._cubes[n_quantiles]
+
+    def segment_for(self, r: int, f: int, m: int, n_quantiles: int = 5) -> str:
+        """Segmento de uma combinação de scores"""
+        return self.segments[self.compile(n_quantiles)[r, f, m]]
+
+
+def build_rule_sets(spec: Dict[str, Dict]) -> Dict[str, SegmentRuleSet]:
+    """
+    Cria os conjuntos de regras a partir de um dict {nome: definição}
+
+    Args:
+        spec: Definições declarativas
+
+    Returns:
+        Dict nome -> SegmentRuleSet
+    """
+    return {name: SegmentRuleSet.from_dict(name, rule_spec) for name, rule_spec in spec.items()}
+
+
+def load_segment_rules(path: Optional[Union[str, Path]] = None) -> Dict[str, SegmentRuleSet]:
+    """
+    Carrega conjuntos de regras de um arquivo JSON
+
+    O conjunto 'default' embutido é mantido, a menos que o arquivo
+    defina outro com o mesmo nome.
+
+    Args:
+        path: Arquivo JSON (None = só as regras embutidas)
+
+    Returns:
+        Dict nome -> SegmentRuleSet
+    """
+    spec = dict(DEFAULT_SEGMENT_RULES)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            spec.update(json.load(f))
+    return build_rule_sets(spec)
+
+
+def assign_segments(r: np.ndarray, f: np.ndarray, m: np.ndarray,
+                    rule_sets: Sequence[SegmentRuleSet],
+                    n_quantiles: int = 5) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Avalia vários conjuntos de regras em uma única passada
+
+    O índice linear de (R, F, M) é calculado uma vez; os cubos de todos os
+    conjuntos são empilhados e lidos com um único take.
+
+    Args:
+        r, f, m: Arrays de scores inteiros (1..n_quantiles)
+        rule_sets: Conjuntos de regras
+        n_quantiles: Maior score
+
+    Returns:
+        Lista (segmentos, prioridades) na ordem de rule_sets
+    """
+    size = n_quantiles + 1
+    flat_index = (np.asarray(r, dtype=np.intp) * size + np.asarray(f, dtype=np.intp)) * size \
+        + np.asarray(m, dtype=np.intp)
+
+    stacked = np.stack([rule_set.compile(n_quantiles).ravel() for rule_set in rule_sets])
+    codes = stacked[:, flat_index]
+
+    return [
+        (rule_set.segments[row], rule_set.priorities[row])
+        for rule_set, row in zip(rule_sets, codes)
+    ]
@@ -10,12 +10,16 @@ Data: Outubro 2025
 
 import os
 import sys
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from operator import eq, ge, gt, le, lt, ne
 import pandas as pd
-from google.cloud import bigquery
 from loguru import logger
 
+from ..utils.bigquery_clients import get_client
+from ..utils.bigquery_jobs import wait_for_jobs
+
 # Configuração de logging
 logger.remove()
 logger.add(sys.stderr, level="INFO")
@@ -25,6 +29,196 @@ logger.add("logs/data_validation.log", rotation="10 MB", level="DEBUG")
 class DataValidator:
     """Validador de qualidade de dados no BigQuery"""
     
+    # Regras declarativas, compartilhadas entre os backends BigQuery
+    # (compiladas para SQL) e local (avaliadas em pandas)
+    PRIMARY_KEY_RULES = [
+        # Customers
+        {
+            "name": "customers: customer_id único",
+            "rule": {"kind": "unique", "table": "customers", "columns": ["customer_id"]}
+        },
+        {
+            "name": "customers: customer_id não nulo",
+            "rule": {"kind": "count_if", "table": "customers",
+                     "where": {"column": "customer_id", "op": "is_null"}}
+        },
+        
+        # Orders
+        {
+            "name": "orders: order_id único",
+            "rule": {"kind": "unique", "table": "orders", "columns": ["order_id"]}
+        },
+        {
+            "name": "orders: order_id não nulo",
+            "rule": {"kind": "count_if", "table": "orders",
+                     "where": {"column": "order_id", "op": "is_null"}}
+        },
+        
+        # Order Items (composite key)
+        {
+            "name": "order_items: (order_id, order_item_id) único",
+            "rule": {"kind": "unique", "table": "order_items",
+                     "columns": ["order_id", "order_item_id"]}
+        },
+    ]
+    
+    FOREIGN_KEY_RULES = [
+        {
+            "name": "orders.customer_id existe em customers",
+            "rule": {"kind": "orphans", "table": "orders", "column": "customer_id",
+                     "ref_table": "customers", "ref_column": "customer_id"}
+        },
+        {
+            "name": "order_items.order_id existe em orders",
+            "rule": {"kind": "orphans", "table": "order_items", "column": "order_id",
+                     "ref_table": "orders", "ref_column": "order_id"}
+        },
+        {
+            "name": "order_items.product_id existe em products",
+            "rule": {"kind": "orphans", "table": "order_items", "column": "product_id",
+                     "ref_table": "products", "ref_column": "product_id"}
+        },
+        {
+            "name": "payments.order_id existe em orders",
+            "rule": {"kind": "orphans", "table": "payments", "column": "order_id",
+                     "ref_table": "orders", "ref_column": "order_id"}
+        },
+    ]
+    
+    VALID_VALUE_RULES = [
+        # Preços positivos
+        {
+            "name": "order_items: price >= 0",
+            "rule": {"kind": "count_if", "table": "order_items",
+                     "where": {"column": "price", "op": "<", "value": 0}}
+        },
+        {
+            "name": "order_items: freight_value >= 0",
+            "rule": {"kind": "count_if", "table": "order_items",
+                     "where": {"column": "freight_value", "op": "<", "value": 0}}
+        },
+        {
+            "name": "payments: payment_value > 0",
+            "rule": {"kind": "count_if", "table": "payments",
+                     "where": {"column": "payment_value", "op": "<=", "value": 0}}
+        },
+        
+        # Review scores válidos (1-5); NULL não é contado
+        {
+            "name": "reviews: review_score entre 1 e 5",
+            "rule": {"kind": "count_if", "table": "reviews",
+                     "where": {"any": [
+                         {"column": "review_score", "op": "<", "value": 1},
+                         {"column": "review_score", "op": ">", "value": 5},
+                     ]}}
+        },
+        
+        # Estados válidos (26 UFs + DF)
+        {
+            "name": "customers: customer_state válido (27 estados)",
+            "rule": {"kind": "count_distinct_if", "table": "customers",
+                     "column": "customer_state",
+                     "where": {"column": "customer_state", "op": "not_in", "value": [
+                         'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
+                         'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI', 'RJ', 'RN',
+                         'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO'
+                     ]}}
+        },
+        
+        # Order status válidos
+        {
+            "name": "orders: order_status válido",
+            "rule": {"kind": "count_if", "table": "orders",
+                     "where": {"column": "order_status", "op": "not_in", "value": [
+                         'delivered', 'shipped', 'canceled', 'unavailable',
+                         'invoiced', 'processing', 'created', 'approved'
+                     ]}}
+        },
+    ]
+    
+    COMPLETENESS_RULES = [
+        {
+            "name": "orders: order_purchase_timestamp não nulo (>99%)",
+            "rule": {"kind": "ratio", "table": "orders",
+                     "where": {"column": "order_purchase_timestamp", "op": "is_not_null"}},
+            "expected": 99,
+            "operator": ">"
+        },
+        {
+            "name": "products: product_category_name não nulo (>95%)",
+            "rule": {"kind": "ratio", "table": "products",
+                     "where": {"column": "product_category_name", "op": "is_not_null"}},
+            "expected": 95,
+            "operator": ">"
+        },
+        {
+            "name": "orders delivered: tem data de entrega (>95%)",
+            "rule": {"kind": "ratio", "table": "orders",
+                     "where": {"all": [
+                         {"column": "order_status", "op": "=", "value": "delivered"},
+                         {"column": "order_delivered_customer_date", "op": "is_not_null"},
+                     ]},
+                     "base": {"column": "order_status", "op": "=", "value": "delivered"}},
+            "expected": 95,
+            "operator": ">"
+        },
+    ]
+    
+    CONSISTENCY_RULES = [
+        # Comparações com NULL não são contadas
+        {
+            "name": "orders: data de compra < data de entrega",
+            "rule": {"kind": "count_if", "table": "orders",
+                     "where": {"column": "order_purchase_timestamp", "op": ">=",
+                               "other": "order_delivered_customer_date"}}
+        },
+        {
+            "name": "orders: data estimada >= data de compra",
+            "rule": {"kind": "count_if", "table": "orders",
+                     "where": {"column": "order_estimated_delivery_date", "op": "<",
+                               "other": "order_purchase_timestamp"}}
+        },
+        {
+            "name": "payments: soma por pedido = order_value (diferença <1%)",
+            "rule": {"kind": "total_mismatch", "table": "payments",
+                     "columns": ["payment_value"],
+                     "ref_table": "order_items",
+                     "ref_columns": ["price", "freight_value"],
+                     "key": "order_id", "tolerance": 0.01}
+        },
+    ]
+    
+    VOLUMETRY_RULES = [
+        {
+            "name": "customers: tem registros (>90k)",
+            "rule": {"kind": "row_count", "table": "customers"},
+            "expected": 90000,
+            "operator": ">"
+        },
+        {
+            "name": "orders: tem registros (>90k)",
+            "rule": {"kind": "row_count", "table": "orders"},
+            "expected": 90000,
+            "operator": ">"
+        },
+        {
+            "name": "order_items: tem mais itens que orders",
+            "rule": {"kind": "row_count_diff", "table": "order_items", "other": "orders"},
+            "expected": 0,
+            "operator": ">"
+        },
+        {
+            "name": "orders delivered: >90% do total",
+            "rule": {"kind": "ratio", "table": "orders",
+                     "where": {"column": "order_status", "op": "=", "value": "delivered"}},
+            "expected": 90,
+            "operator": ">"
+        },
+    ]
+    
+    # Regras que envolvem mais de uma tabela (compiladas para query completa)
+    MULTI_TABLE_KINDS = {"orphans", "row_count_diff", "total_mismatch"}
+    
     def __init__(self, project_id: str, dataset_id: str):
         """
         Inicializa o validador
@@ -35,11 +229,85 @@ class DataValidator:
         """
         self.project_id = project_id
         self.dataset_id = dataset_id
-        self.client = bigquery.Client(project=project_id)
+        self.client = get_client(project_id)
         self.validation_results = []
         
         logger.info(f"Validator inicializado: {project_id}.{dataset_id}")
     
+    def _table_ref(self, table: str) -> str:
+        """Retorna o ID completo de uma tabela do dataset"""
+        return f"{self.project_id}.{self.dataset_id}.{table}"
+    
+    def _evaluate(self, actual_value: any, expected_value: any, operator: str) -> bool:
+        """
+        Compara o valor obtido com o esperado
+        
+        Args:
+            actual_value: Valor retornado pela query
+            expected_value: Valor esperado
+            operator: Operador de comparação (==, >, <, <=, >=)
+            
+        Returns:
+            True se a condição é satisfeita
+        """
+        if operator == "==":
+            return actual_value == expected_value
+        elif operator == ">":
+            return actual_value > expected_value
+        elif operator == "<":
+            return actual_value < expected_value
+        elif operator == "<=":
+            return actual_value <= expected_value
+        elif operator == ">=":
+            return actual_value >= expected_value
+        return False
+    
+    def _record_result(self, test_name: str, actual_value: any,
+                       expected_value: any = 0, operator: str = "==") -> Dict:
+        """
+        Avalia e registra o resultado de um teste
+        
+        Args:
+            test_name: Nome do teste
+            actual_value: Valor obtido
+            expected_value: Valor esperado
+            operator: Operador de comparação
+            
+        Returns:
+            Dict com resultado do teste
+        """
+        passed = self._evaluate(actual_value, expected_value, operator)
+        status = "✅ PASS" if passed else "❌ FAIL"
+        
+        validation = {
+            "test_name": test_name,
+            "status": status,
+            "expected": expected_value,
+            "actual": actual_value,
+            "passed": passed,
+            "timestamp": datetime.now()
+        }
+        
+        self.validation_results.append(validation)
+        
+        if passed:
+            logger.success(f"{status} - {test_name}: {actual_value}")
+        else:
+            logger.error(f"{status} - {test_name}: Expected {expected_value}, Got {actual_value}")
+        
+        return validation
+    
+    def _record_error(self, test_name: str, error: Exception) -> Dict:
+        """Monta o resultado de um teste que não pôde ser executado"""
+        logger.error(f"Erro no teste '{test_name}': {str(error)}")
+        return {
+            "test_name": test_name,
+            "status": "⚠️ ERROR",
+            "error": str(error),
+            "passed": False,
+            "timestamp": datetime.now()
+        }
+    
     def _run_validation_query(self, test_name: str, query: str, 
                              expected_value: any = 0, 
                              operator: str = "==") -> Dict:
@@ -59,395 +327,443 @@ class DataValidator:
             result = self.client.query(query).to_dataframe()
             actual_value = result.iloc[0, 0]
             
-            # Avaliar condição
-            if operator == "==":
-                passed = actual_value == expected_value
-            elif operator == ">":
-                passed = actual_value > expected_value
-            elif operator == "<":
-                passed = actual_value < expected_value
-            elif operator == "<=":
-                passed = actual_value <= expected_value
-            elif operator == ">=":
-                passed = actual_value >= expected_value
-            else:
-                passed = False
+            return self._record_result(test_name, actual_value, expected_value, operator)
             
-            status = "✅ PASS" if passed else "❌ FAIL"
+        except Exception as e:
+            return self._record_error(test_name, e)
+    
+    # =========================================
+    # EXECUÇÃO DOS CHECKS
+    # =========================================
+    
+    def _check_query(self, check: Dict) -> str:
+        """
+        Retorna a query isolada de um check
+        
+        Checks de tabela única são declarados como `table` + `expression`
+        (agregação sobre a tabela inteira); checks com joins trazem `query`.
+        """
+        if "query" in check:
+            return check["query"]
+        return f"SELECT {check['expression']} FROM `{self._table_ref(check['table'])}`"
+    
+    def _run_checks(self, checks: List[Dict], batch: bool = False,
+                    concurrent: bool = False) -> List[Dict]:
+        """
+        Executa uma lista de checks
+        
+        Args:
+            checks: Checks (name, table/expression ou query, expected, operator)
+            batch: Se True, agrupa checks da mesma tabela em uma única query
+            concurrent: Se True, submete todas as queries de uma vez e
+                        coleta os resultados conforme terminam
             
-            validation = {
-                "test_name": test_name,
-                "status": status,
-                "expected": expected_value,
-                "actual": actual_value,
-                "passed": passed,
-                "timestamp": datetime.now()
-            }
+        Returns:
+            Lista de resultados, na ordem dos checks
+        """
+        if not batch and not concurrent:
+            return [
+                self._run_validation_query(
+                    check["name"],
+                    self._check_query(check),
+                    expected_value=check.get("expected", 0),
+                    operator=check.get("operator", "==")
+                )
+                for check in checks
+            ]
+        
+        plan = self._plan_queries(checks, batch)
+        values = self._execute_plan(plan, concurrent)
+        
+        # Registrar na ordem original dos checks
+        results = []
+        for check in checks:
+            actual_value, error = values[check["name"]]
+            if error is not None:
+                results.append(self._record_error(check["name"], error))
+            else:
+                results.append(self._record_result(
+                    check["name"], actual_value,
+                    check.get("expected", 0), check.get("operator", "==")
+                ))
+        
+        return results
+    
+    def _build_batch_query(self, table: str, checks: List[Dict]) -> str:
+        """
+        Monta uma query que avalia vários checks com um único scan da tabela
+        
+        Args:
+            table: Nome da tabela
+            checks: Checks de tabela única sobre `table`
             
-            self.validation_results.append(validation)
+        Returns:
+            Query SQL com uma coluna por check (check_0, check_1, ...)
+        """
+        columns = ",\n    ".join(
+            f"{check['expression']} AS check_{i}" for i, check in enumerate(checks)
+        )
+        return f"SELECT\n    {columns}\nFROM `{self._table_ref(table)}`"
+    
+    def _plan_queries(self, checks: List[Dict],
+                      batch: bool) -> Dict[str, Tuple[str, List[Tuple[Dict, Optional[str]]]]]:
+        """
+        Define as queries a executar para uma lista de checks
+        
+        No modo batch, checks da mesma tabela compartilham uma query (uma
+        coluna por check); checks com joins e o modo não-batch usam uma
+        query por check.
+        
+        Args:
+            checks: Lista de checks
+            batch: Se True, agrupa por tabela
             
-            if passed:
-                logger.success(f"{status} - {test_name}: {actual_value}")
+        Returns:
+            Dict chave -> (sql, [(check, coluna do resultado ou None)])
+        """
+        plan = {}
+        by_table: Dict[str, List[Dict]] = {}
+        
+        for check in checks:
+            if batch and "query" not in check:
+                by_table.setdefault(check["table"], []).append(check)
             else:
-                logger.error(f"{status} - {test_name}: Expected {expected_value}, Got {actual_value}")
+                plan[check["name"]] = (self._check_query(check), [(check, None)])
+        
+        for table, table_checks in by_table.items():
+            plan[f"table:{table}"] = (
+                self._build_batch_query(table, table_checks),
+                [(check, f"check_{i}") for i, check in enumerate(table_checks)]
+            )
+        
+        if batch:
+            logger.info(f"Modo batch: {len(checks)} checks em {len(plan)} queries")
+        
+        return plan
+    
+    def _execute_plan(self, plan: Dict[str, Tuple[str, List[Tuple[Dict, Optional[str]]]]],
+                      concurrent: bool) -> Dict[str, Tuple[any, Optional[Exception]]]:
+        """
+        Executa as queries planejadas e extrai o valor de cada check
+        
+        No modo concorrente, todas as queries são submetidas como jobs
+        assíncronos antes de aguardar qualquer uma (wait_for_jobs). Se uma
+        query falhar, todos os checks que dependem dela recebem o erro.
+        
+        Args:
+            plan: Saída de _plan_queries
+            concurrent: Se True, executa as queries simultaneamente
+            
+        Returns:
+            Dict nome do check -> (valor, erro)
+        """
+        frames: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, Exception] = {}
+        
+        if concurrent:
+            jobs = {}
+            for key, (query, _) in plan.items():
+                try:
+                    jobs[key] = self.client.query(query)
+                except Exception as e:
+                    errors[key] = e
             
-            return validation
+            logger.info(f"{len(jobs)} queries de validação submetidas")
             
-        except Exception as e:
-            logger.error(f"Erro no teste '{test_name}': {str(e)}")
-            return {
-                "test_name": test_name,
-                "status": "⚠️ ERROR",
-                "error": str(e),
-                "passed": False,
-                "timestamp": datetime.now()
-            }
+            for key, error in wait_for_jobs(jobs, desc="Validações").items():
+                if error is not None:
+                    errors[key] = error
+                    continue
+                try:
+                    frames[key] = jobs[key].to_dataframe()
+                except Exception as e:
+                    errors[key] = e
+        else:
+            for key, (query, _) in plan.items():
+                try:
+                    frames[key] = self.client.query(query).to_dataframe()
+                except Exception as e:
+                    errors[key] = e
+        
+        values = {}
+        for key, (_, targets) in plan.items():
+            for check, column in targets:
+                if key in errors:
+                    values[check["name"]] = (None, errors[key])
+                    continue
+                try:
+                    df = frames[key]
+                    value = df.iloc[0, 0] if column is None else df[column].iloc[0]
+                    values[check["name"]] = (value, None)
+                except Exception as e:
+                    values[check["name"]] = (None, e)
+        
+        return values
     
     # =========================================
-    # TESTES DE INTEGRIDADE REFERENCIAL
+    # REGRAS COMPARTILHADAS
     # =========================================
     
-    def test_primary_keys(self) -> List[Dict]:
-        """Testa se primary keys são únicas e não nulas"""
+    @staticmethod
+    def _sql_literal(value: any) -> str:
+        """Formata um valor Python como literal SQL"""
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if isinstance(value, str):
+            escaped = value.replace("'", "\\'")
+            return f"'{escaped}'"
+        return str(value)
+    
+    def _sql_predicate(self, predicate: Dict, nested: bool = False) -> str:
+        """
+        Compila um predicado de regra para SQL
         
-        logger.info("Testando Primary Keys...")
+        Predicados: {column, op, value}, {column, op, other} (comparação
+        entre colunas), op in/not_in/is_null/is_not_null, e combinações
+        {any: [...]} / {all: [...]}.
+        """
+        if "any" in predicate or "all" in predicate:
+            joiner = " OR " if "any" in predicate else " AND "
+            parts = predicate.get("any") or predicate.get("all")
+            sql = joiner.join(self._sql_predicate(p, nested=True) for p in parts)
+            return f"({sql})" if nested else sql
         
-        tests = [
-            # Customers
-            {
-                "name": "customers: customer_id único",
-                "query": f"""
-                    SELECT COUNT(*) - COUNT(DISTINCT customer_id) 
-                    FROM `{self.project_id}.{self.dataset_id}.customers`
-                """
-            },
-            {
-                "name": "customers: customer_id não nulo",
-                "query": f"""
-                    SELECT COUNTIF(customer_id IS NULL)
-                    FROM `{self.project_id}.{self.dataset_id}.customers`
-                """
-            },
-            
-            # Orders
-            {
-                "name": "orders: order_id único",
-                "query": f"""
-                    SELECT COUNT(*) - COUNT(DISTINCT order_id)
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
+        column, op = predicate["column"], predicate["op"]
+        
+        if op == "is_null":
+            return f"{column} IS NULL"
+        if op == "is_not_null":
+            return f"{column} IS NOT NULL"
+        if op in ("in", "not_in"):
+            values = ", ".join(self._sql_literal(v) for v in predicate["value"])
+            return f"{column} {'NOT IN' if op == 'not_in' else 'IN'} ({values})"
+        if "other" in predicate:
+            return f"{column} {op} {predicate['other']}"
+        return f"{column} {op} {self._sql_literal(predicate['value'])}"
+    
+    def _rule_expression(self, rule: Dict) -> str:
+        """
+        Compila uma regra de tabela única para uma agregação SQL
+        
+        Args:
+            rule: Regra (kind unique, count_if, count_distinct_if, ratio ou row_count)
+        
+        Returns:
+            Expressão SQL avaliada sobre a tabela inteira
+        """
+        kind = rule["kind"]
+        
+        if kind == "unique":
+            columns = rule["columns"]
+            if len(columns) == 1:
+                key = columns[0]
+            else:
+                key = "CONCAT(" + ", '-', ".join(f"CAST({c} AS STRING)" for c in columns) + ")"
+            return f"COUNT(*) - COUNT(DISTINCT {key})"
+        if kind == "count_if":
+            return f"COUNTIF({self._sql_predicate(rule['where'])})"
+        if kind == "count_distinct_if":
+            return (f"COUNT(DISTINCT IF({self._sql_predicate(rule['where'])}, "
+                    f"{rule['column']}, NULL))")
+        if kind == "ratio":
+            base = f"COUNTIF({self._sql_predicate(rule['base'])})" if rule.get("base") else "COUNT(*)"
+            return f"COUNTIF({self._sql_predicate(rule['where'])}) / {base} * 100"
+        if kind == "row_count":
+            return "COUNT(*)"
+        
+        raise ValueError(f"Regra de tabela única desconhecida: {kind}")
+    
+    def _rule_query(self, rule: Dict) -> str:
+        """
+        Compila uma regra entre tabelas para uma query SQL completa
+        
+        Args:
+            rule: Regra (kind orphans, row_count_diff ou total_mismatch)
+        
+        Returns:
+            Query SQL que retorna um único valor
+        """
+        kind = rule["kind"]
+        
+        if kind == "orphans":
+            return f"""
+                    SELECT COUNT(*)
+                    FROM `{self._table_ref(rule['table'])}` child
+                    LEFT JOIN `{self._table_ref(rule['ref_table'])}` parent
+                      ON child.{rule['column']} = parent.{rule['ref_column']}
+                    WHERE parent.{rule['ref_column']} IS NULL
                 """
-            },
-            {
-                "name": "orders: order_id não nulo",
-                "query": f"""
-                    SELECT COUNTIF(order_id IS NULL)
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
+        if kind == "row_count_diff":
+            return f"""
+                    SELECT
+                        (SELECT COUNT(*) FROM `{self._table_ref(rule['table'])}`) -
+                        (SELECT COUNT(*) FROM `{self._table_ref(rule['other'])}`)
                 """
-            },
-            
-            # Order Items (composite key)
-            {
-                "name": "order_items: (order_id, order_item_id) único",
-                "query": f"""
-                    SELECT COUNT(*) - COUNT(DISTINCT CONCAT(order_id, '-', CAST(order_item_id AS STRING)))
-                    FROM `{self.project_id}.{self.dataset_id}.order_items`
+        if kind == "total_mismatch":
+            key = rule["key"]
+            return f"""
+                    WITH left_totals AS (
+                        SELECT
+                            {key},
+                            SUM({' + '.join(rule['columns'])}) as total
+                        FROM `{self._table_ref(rule['table'])}`
+                        GROUP BY {key}
+                    ),
+                    right_totals AS (
+                        SELECT
+                            {key},
+                            SUM({' + '.join(rule['ref_columns'])}) as total
+                        FROM `{self._table_ref(rule['ref_table'])}`
+                        GROUP BY {key}
+                    )
+                    SELECT COUNTIF(ABS(lt.total - rt.total) > rt.total * {rule['tolerance']})
+                    FROM left_totals lt
+                    INNER JOIN right_totals rt ON lt.{key} = rt.{key}
                 """
-            },
-        ]
         
-        for test in tests:
-            self._run_validation_query(test["name"], test["query"], expected_value=0)
+        raise ValueError(f"Regra entre tabelas desconhecida: {kind}")
+    
+    def _build_check(self, spec: Dict) -> Dict:
+        """
+        Monta um check executável a partir de uma regra declarada
+        
+        Regras de tabela única viram `table` + `expression`; regras entre
+        tabelas viram `query`. A regra original fica em `rule`.
+        
+        Args:
+            spec: Entrada de uma lista *_RULES (name, rule, expected, operator)
+        
+        Returns:
+            Dict do check
+        """
+        rule = spec["rule"]
+        check = {
+            "name": spec["name"],
+            "rule": rule,
+            "expected": spec.get("expected", 0),
+            "operator": spec.get("operator", "==")
+        }
+        
+        if rule["kind"] in self.MULTI_TABLE_KINDS:
+            check["query"] = self._rule_query(rule)
+        else:
+            check["table"] = rule["table"]
+            check["expression"] = self._rule_expression(rule)
+        
+        return check
+    
+    # =========================================
+    # TESTES DE INTEGRIDADE REFERENCIAL
+    # =========================================
+    
+    def _primary_key_checks(self) -> List[Dict]:
+        """Checks de primary keys"""
+        return [self._build_check(spec) for spec in self.PRIMARY_KEY_RULES]
+    
+    def _foreign_key_checks(self) -> List[Dict]:
+        """Checks de foreign keys (joins entre tabelas)"""
+        return [self._build_check(spec) for spec in self.FOREIGN_KEY_RULES]
+    
+    def test_primary_keys(self) -> List[Dict]:
+        """Testa se primary keys são únicas e não nulas"""
+        
+        logger.info("Testando Primary Keys...")
+        
+        return self._run_checks(self._primary_key_checks())
     
     def test_foreign_keys(self) -> List[Dict]:
         """Testa integridade de foreign keys"""
         
         logger.info("Testando Foreign Keys...")
         
-        tests = [
-            {
-                "name": "orders.customer_id existe em customers",
-                "query": f"""
-                    SELECT COUNT(*)
-                    FROM `{self.project_id}.{self.dataset_id}.orders` o
-                    LEFT JOIN `{self.project_id}.{self.dataset_id}.customers` c
-                      ON o.customer_id = c.customer_id
-                    WHERE c.customer_id IS NULL
-                """
-            },
-            {
-                "name": "order_items.order_id existe em orders",
-                "query": f"""
-                    SELECT COUNT(*)
-                    FROM `{self.project_id}.{self.dataset_id}.order_items` oi
-                    LEFT JOIN `{self.project_id}.{self.dataset_id}.orders` o
-                      ON oi.order_id = o.order_id
-                    WHERE o.order_id IS NULL
-                """
-            },
-            {
-                "name": "order_items.product_id existe em products",
-                "query": f"""
-                    SELECT COUNT(*)
-                    FROM `{self.project_id}.{self.dataset_id}.order_items` oi
-                    LEFT JOIN `{self.project_id}.{self.dataset_id}.products` p
-                      ON oi.product_id = p.product_id
-                    WHERE p.product_id IS NULL
-                """
-            },
-            {
-                "name": "payments.order_id existe em orders",
-                "query": f"""
-                    SELECT COUNT(*)
-                    FROM `{self.project_id}.{self.dataset_id}.payments` p
-                    LEFT JOIN `{self.project_id}.{self.dataset_id}.orders` o
-                      ON p.order_id = o.order_id
-                    WHERE o.order_id IS NULL
-                """
-            },
-        ]
-        
-        for test in tests:
-            self._run_validation_query(test["name"], test["query"], expected_value=0)
+        return self._run_checks(self._foreign_key_checks())
     
     # =========================================
     # TESTES DE VALORES VÁLIDOS
     # =========================================
     
+    def _valid_value_checks(self) -> List[Dict]:
+        """Checks de ranges e domínios válidos"""
+        return [self._build_check(spec) for spec in self.VALID_VALUE_RULES]
+    
     def test_valid_values(self) -> List[Dict]:
         """Testa se valores estão dentro de ranges válidos"""
         
         logger.info("Testando Valores Válidos...")
         
-        tests = [
-            # Preços positivos
-            {
-                "name": "order_items: price >= 0",
-                "query": f"""
-                    SELECT COUNTIF(price < 0)
-                    FROM `{self.project_id}.{self.dataset_id}.order_items`
-                """
-            },
-            {
-                "name": "order_items: freight_value >= 0",
-                "query": f"""
-                    SELECT COUNTIF(freight_value < 0)
-                    FROM `{self.project_id}.{self.dataset_id}.order_items`
-                """
-            },
-            {
-                "name": "payments: payment_value > 0",
-                "query": f"""
-                    SELECT COUNTIF(payment_value <= 0)
-                    FROM `{self.project_id}.{self.dataset_id}.payments`
-                """
-            },
-            
-            # Review scores válidos (1-5)
-            {
-                "name": "reviews: review_score entre 1 e 5",
-                "query": f"""
-                    SELECT COUNTIF(review_score < 1 OR review_score > 5)
-                    FROM `{self.project_id}.{self.dataset_id}.reviews`
-                    WHERE review_score IS NOT NULL
-                """
-            },
-            
-            # Estados válidos (26 UFs + DF)
-            {
-                "name": "customers: customer_state válido (27 estados)",
-                "query": f"""
-                    SELECT COUNT(DISTINCT customer_state)
-                    FROM `{self.project_id}.{self.dataset_id}.customers`
-                    WHERE customer_state NOT IN (
-                        'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA',
-                        'MT', 'MS', 'MG', 'PA', 'PB', 'PR', 'PE', 'PI', 'RJ', 'RN',
-                        'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO'
-                    )
-                """
-            },
-            
-            # Order status válidos
-            {
-                "name": "orders: order_status válido",
-                "query": f"""
-                    SELECT COUNTIF(order_status NOT IN (
-                        'delivered', 'shipped', 'canceled', 'unavailable', 
-                        'invoiced', 'processing', 'created', 'approved'
-                    ))
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                """
-            },
-        ]
-        
-        for test in tests:
-            self._run_validation_query(test["name"], test["query"], expected_value=0)
+        return self._run_checks(self._valid_value_checks())
     
     # =========================================
     # TESTES DE COMPLETUDE
     # =========================================
     
+    def _completeness_checks(self) -> List[Dict]:
+        """Checks de % de valores preenchidos"""
+        return [self._build_check(spec) for spec in self.COMPLETENESS_RULES]
+    
     def test_completeness(self) -> List[Dict]:
         """Testa % de valores faltantes em colunas críticas"""
         
         logger.info("Testando Completude de Dados...")
         
-        tests = [
-            {
-                "name": "orders: order_purchase_timestamp não nulo (>99%)",
-                "query": f"""
-                    SELECT COUNTIF(order_purchase_timestamp IS NOT NULL) / COUNT(*) * 100
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                """,
-                "expected": 99,
-                "operator": ">"
-            },
-            {
-                "name": "products: product_category_name não nulo (>95%)",
-                "query": f"""
-                    SELECT COUNTIF(product_category_name IS NOT NULL) / COUNT(*) * 100
-                    FROM `{self.project_id}.{self.dataset_id}.products`
-                """,
-                "expected": 95,
-                "operator": ">"
-            },
-            {
-                "name": "orders delivered: tem data de entrega (>95%)",
-                "query": f"""
-                    SELECT COUNTIF(order_delivered_customer_date IS NOT NULL) / COUNT(*) * 100
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                    WHERE order_status = 'delivered'
-                """,
-                "expected": 95,
-                "operator": ">"
-            },
-        ]
-        
-        for test in tests:
-            self._run_validation_query(
-                test["name"], 
-                test["query"], 
-                expected_value=test.get("expected", 0),
-                operator=test.get("operator", "==")
-            )
+        return self._run_checks(self._completeness_checks())
     
     # =========================================
     # TESTES DE CONSISTÊNCIA
     # =========================================
     
+    def _consistency_checks(self) -> List[Dict]:
+        """Checks de consistência lógica entre campos"""
+        return [self._build_check(spec) for spec in self.CONSISTENCY_RULES]
+    
     def test_consistency(self) -> List[Dict]:
         """Testa consistência lógica entre campos"""
         
         logger.info("Testando Consistência Lógica...")
         
-        tests = [
-            {
-                "name": "orders: data de compra < data de entrega",
-                "query": f"""
-                    SELECT COUNTIF(order_purchase_timestamp >= order_delivered_customer_date)
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                    WHERE order_delivered_customer_date IS NOT NULL
-                """
-            },
-            {
-                "name": "orders: data estimada >= data de compra",
-                "query": f"""
-                    SELECT COUNTIF(order_estimated_delivery_date < order_purchase_timestamp)
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                    WHERE order_estimated_delivery_date IS NOT NULL
-                """
-            },
-            {
-                "name": "payments: soma por pedido = order_value (diferença <1%)",
-                "query": f"""
-                    WITH payment_totals AS (
-                        SELECT 
-                            order_id,
-                            SUM(payment_value) as total_paid
-                        FROM `{self.project_id}.{self.dataset_id}.payments`
-                        GROUP BY order_id
-                    ),
-                    item_totals AS (
-                        SELECT 
-                            order_id,
-                            SUM(price + freight_value) as total_items
-                        FROM `{self.project_id}.{self.dataset_id}.order_items`
-                        GROUP BY order_id
-                    )
-                    SELECT COUNTIF(ABS(pt.total_paid - it.total_items) > it.total_items * 0.01)
-                    FROM payment_totals pt
-                    INNER JOIN item_totals it ON pt.order_id = it.order_id
-                """
-            },
-        ]
-        
-        for test in tests:
-            self._run_validation_query(test["name"], test["query"], expected_value=0)
+        return self._run_checks(self._consistency_checks())
     
     # =========================================
     # TESTES DE VOLUMETRIA
     # =========================================
     
+    def _volumetry_checks(self) -> List[Dict]:
+        """Checks de volumes esperados"""
+        return [self._build_check(spec) for spec in self.VOLUMETRY_RULES]
+    
     def test_volumetry(self) -> List[Dict]:
         """Testa volumes esperados de dados"""
         
         logger.info("Testando Volumetria...")
         
-        tests = [
-            {
-                "name": "customers: tem registros (>90k)",
-                "query": f"""
-                    SELECT COUNT(*)
-                    FROM `{self.project_id}.{self.dataset_id}.customers`
-                """,
-                "expected": 90000,
-                "operator": ">"
-            },
-            {
-                "name": "orders: tem registros (>90k)",
-                "query": f"""
-                    SELECT COUNT(*)
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                """,
-                "expected": 90000,
-                "operator": ">"
-            },
-            {
-                "name": "order_items: tem mais itens que orders",
-                "query": f"""
-                    SELECT 
-                        (SELECT COUNT(*) FROM `{self.project_id}.{self.dataset_id}.order_items`) -
-                        (SELECT COUNT(*) FROM `{self.project_id}.{self.dataset_id}.orders`)
-                """,
-                "expected": 0,
-                "operator": ">"
-            },
-            {
-                "name": "orders delivered: >90% do total",
-                "query": f"""
-                    SELECT COUNTIF(order_status = 'delivered') / COUNT(*) * 100
-                    FROM `{self.project_id}.{self.dataset_id}.orders`
-                """,
-                "expected": 90,
-                "operator": ">"
-            },
-        ]
-        
-        for test in tests:
-            self._run_validation_query(
-                test["name"], 
-                test["query"], 
-                expected_value=test.get("expected", 0),
-                operator=test.get("operator", "==")
-            )
+        return self._run_checks(self._volumetry_checks())
+    
+    def _all_checks(self) -> List[Dict]:
+        """Todos os checks, na ordem de run_all_validations"""
+        return (
+            self._primary_key_checks()
+            + self._foreign_key_checks()
+            + self._valid_value_checks()
+            + self._completeness_checks()
+            + self._consistency_checks()
+            + self._volumetry_checks()
+        )
     
     # =========================================
     # MÉTODO PRINCIPAL
     # =========================================
     
-    def run_all_validations(self) -> pd.DataFrame:
+    def run_all_validations(self, batch: bool = False,
+                            concurrent: bool = False) -> pd.DataFrame:
         """
         Executa todas as validações
         
+        Args:
+            batch: Se True, checks da mesma tabela são avaliados em uma única
+                   query (um scan por tabela em vez de um por check)
+            concurrent: Se True, todas as queries são submetidas de uma vez
+                        e aguardadas em paralelo
+        
         Returns:
             DataFrame com resultados
         """
@@ -456,12 +772,15 @@ class DataValidator:
         logger.info("=" * 60)
         
         # Executar todos os testes
-        self.test_primary_keys()
-        self.test_foreign_keys()
-        self.test_valid_values()
-        self.test_completeness()
-        self.test_consistency()
-        self.test_volumetry()
+        if batch or concurrent:
+            self._run_checks(self._all_checks(), batch=batch, concurrent=concurrent)
+        else:
+            self.test_primary_keys()
+            self.test_foreign_keys()
+            self.test_valid_values()
+            self.test_completeness()
+            self.test_consistency()
+            self.test_volumetry()
         
         # Consolidar resultados
         df_results = pd.DataFrame(self.validation_results)
@@ -494,6 +813,237 @@ class DataValidator:
         return df_results
 
 
+class LocalDataValidator(DataValidator):
+    """
+    Validador de qualidade de dados em memória (pandas)
+    
+    Avalia as mesmas regras do DataValidator sobre DataFrames ou arquivos
+    Parquet locais, sem acesso ao BigQuery, permitindo barrar dados ruins
+    antes da carga. A semântica de NULL segue a do SQL: comparações com
+    NULL não são contadas e chaves nulas não encontram correspondência.
+    """
+    
+    COMPARATORS = {
+        "=": eq,
+        "!=": ne,
+        "<": lt,
+        "<=": le,
+        ">": gt,
+        ">=": ge,
+    }
+    
+    def __init__(self, tables: Dict[str, pd.DataFrame], source: str = "memória"):
+        """
+        Inicializa o validador local
+        
+        Args:
+            tables: Dict nome da tabela -> DataFrame
+            source: Descrição da origem dos dados (para os logs)
+        """
+        self.project_id = None
+        self.dataset_id = None
+        self.client = None
+        self.tables = tables
+        self.validation_results = []
+        
+        logger.info(f"Validator local inicializado: {len(tables)} tabelas ({source})")
+    
+    @classmethod
+    def required_tables(cls) -> List[str]:
+        """Tabelas referenciadas pelas regras, na ordem em que aparecem"""
+        tables = []
+        for spec in (cls.PRIMARY_KEY_RULES + cls.FOREIGN_KEY_RULES + cls.VALID_VALUE_RULES
+                     + cls.COMPLETENESS_RULES + cls.CONSISTENCY_RULES + cls.VOLUMETRY_RULES):
+            rule = spec["rule"]
+            for key in ("table", "ref_table", "other"):
+                if key in rule and rule[key] not in tables:
+                    tables.append(rule[key])
+        return tables
+    
+    @classmethod
+    def from_parquet(cls, parquet_dir: str) -> 'LocalDataValidator':
+        """
+        Cria o validador a partir dos Parquet de staging do ETL
+        
+        Args:
+            parquet_dir: Diretório com arquivos <tabela>.parquet
+        
+        Returns:
+            LocalDataValidator com as tabelas encontradas
+        """
+        parquet_dir = Path(parquet_dir)
+        tables = {}
+        
+        for table in cls.required_tables():
+            parquet_path = parquet_dir / f"{table}.parquet"
+            if parquet_path.exists():
+                tables[table] = pd.read_parquet(parquet_path)
+            else:
+                logger.warning(f"Parquet não encontrado: {parquet_path}")
+        
+        return cls(tables, source=str(parquet_dir))
+    
+    @classmethod
+    def from_etl(cls, etl, typed: bool = True) -> 'LocalDataValidator':
+        """
+        Cria o validador lendo os CSVs com o leitor do ETL
+        
+        Args:
+            etl: Instância de OlistBigQueryETL (usa table_mapping e
+                 load_csv_to_dataframe)
+            typed: Se True, usa a leitura tipada pelo schema
+        
+        Returns:
+            LocalDataValidator com as tabelas necessárias às regras
+        """
+        required = cls.required_tables()
+        tables = {
+            table: etl.load_csv_to_dataframe(csv_file, typed=typed)
+            for csv_file, table in etl.table_mapping.items()
+            if table in required
+        }
+        
+        return cls(tables, source=str(etl.data_path))
+    
+    def _build_check(self, spec: Dict) -> Dict:
+        """Monta o check sem compilar SQL (avaliado localmente)"""
+        return {
+            "name": spec["name"],
+            "rule": spec["rule"],
+            "expected": spec.get("expected", 0),
+            "operator": spec.get("operator", "==")
+        }
+    
+    def _table(self, table: str) -> pd.DataFrame:
+        """Retorna o DataFrame de uma tabela carregada"""
+        if table not in self.tables:
+            raise KeyError(f"Tabela não carregada: {table}")
+        return self.tables[table]
+    
+    def _predicate_mask(self, df: pd.DataFrame, predicate: Dict) -> pd.Series:
+        """
+        Avalia um predicado de regra sobre um DataFrame
+        
+        Args:
+            df: DataFrame da tabela
+            predicate: Predicado (mesmo formato de _sql_predicate)
+        
+        Returns:
+            Série booleana; linhas em que o SQL daria NULL ficam False
+        """
+        if "any" in predicate or "all" in predicate:
+            masks = [self._predicate_mask(df, p) for p in predicate.get("any") or predicate.get("all")]
+            result = masks[0]
+            for mask in masks[1:]:
+                result = (result | mask) if "any" in predicate else (result & mask)
+            return result
+        
+        column, op = df[predicate["column"]], predicate["op"]
+        
+        if op == "is_null":
+            return column.isna()
+        if op == "is_not_null":
+            return column.notna()
+        if op == "in":
+            return column.notna() & column.isin(predicate["value"])
+        if op == "not_in":
+            return column.notna() & ~column.isin(predicate["value"])
+        
+        valid = column.notna()
+        if "other" in predicate:
+            other = df[predicate["other"]]
+            valid &= other.notna()
+            other = other[valid]
+        else:
+            other = predicate["value"]
+        
+        result = pd.Series(False, index=df.index)
+        result[valid] = self.COMPARATORS[op](column[valid], other).astype(bool)
+        return result
+    
+    def _evaluate_rule(self, rule: Dict) -> any:
+        """
+        Calcula o valor de uma regra sobre as tabelas locais
+        
+        Unicidade usa hash das chaves (pd.util.hash_pandas_object) e
+        foreign keys usam anti-join via isin.
+        
+        Args:
+            rule: Regra declarada
+        
+        Returns:
+            Valor equivalente ao retornado pela query do BigQuery
+        """
+        kind = rule["kind"]
+        df = self._table(rule["table"])
+        
+        if kind == "unique":
+            # COUNT(DISTINCT ...) ignora chaves com NULL
+            keys = df[rule["columns"]].dropna()
+            hashes = pd.util.hash_pandas_object(keys, index=False)
+            return len(df) - int(hashes.nunique())
+        if kind == "count_if":
+            return int(self._predicate_mask(df, rule["where"]).sum())
+        if kind == "count_distinct_if":
+            mask = self._predicate_mask(df, rule["where"])
+            return int(df.loc[mask, rule["column"]].nunique())
+        if kind == "ratio":
+            numerator = int(self._predicate_mask(df, rule["where"]).sum())
+            if rule.get("base"):
+                denominator = int(self._predicate_mask(df, rule["base"]).sum())
+            else:
+                denominator = len(df)
+            return numerator / denominator * 100
+        if kind == "row_count":
+            return len(df)
+        if kind == "orphans":
+            parent = self._table(rule["ref_table"])[rule["ref_column"]].dropna().unique()
+            return int((~df[rule["column"]].isin(parent)).sum())
+        if kind == "row_count_diff":
+            return len(df) - len(self._table(rule["other"]))
+        if kind == "total_mismatch":
+            left = self._group_totals(df, rule["columns"], rule["key"])
+            right = self._group_totals(self._table(rule["ref_table"]), rule["ref_columns"], rule["key"])
+            joined = pd.concat([left.rename("left"), right.rename("right")], axis=1, join="inner")
+            diff = (joined["left"] - joined["right"]).abs()
+            return int((diff > joined["right"] * rule["tolerance"]).sum())
+        
+        raise ValueError(f"Regra desconhecida: {kind}")
+    
+    def _group_totals(self, df: pd.DataFrame, columns: List[str], key: str) -> pd.Series:
+        """SUM(col1 + col2 ...) GROUP BY key, com a semântica de NULL do SQL"""
+        values = df[columns].sum(axis=1, min_count=len(columns))
+        return values.groupby(df[key], observed=True).sum(min_count=1)
+    
+    def _run_checks(self, checks: List[Dict], batch: bool = False,
+                    concurrent: bool = False) -> List[Dict]:
+        """
+        Avalia os checks localmente
+        
+        Args:
+            checks: Checks montados por _build_check
+            batch: Ignorado (não há queries a agrupar)
+            concurrent: Ignorado
+        
+        Returns:
+            Lista de resultados, na ordem dos checks
+        """
+        results = []
+        for check in checks:
+            try:
+                actual_value = self._evaluate_rule(check["rule"])
+            except Exception as e:
+                results.append(self._record_error(check["name"], e))
+                continue
+            
+            results.append(self._record_result(
+                check["name"], actual_value,
+                check.get("expected", 0), check.get("operator", "==")
+            ))
+        
+        return results
+
+
 def main():
     """Função principal"""
     
@@ -503,15 +1053,24 @@ def main():
     
     project_id = os.getenv('GCP_PROJECT_ID')
     dataset_id = os.getenv('GCP_DATASET_ID', 'olist_ecommerce')
+    backend = os.getenv('VALIDATION_BACKEND', 'bigquery').lower()
     
-    # Validar configuração
-    if not project_id:
-        logger.error("GCP_PROJECT_ID não definido no .env")
-        sys.exit(1)
+    # Backend local: valida os Parquet de staging, sem BigQuery
+    if backend == 'local':
+        processed_path = os.getenv('DATA_PROCESSED_PATH', './data/processed')
+        validator = LocalDataValidator.from_parquet(processed_path)
+    else:
+        # Validar configuração
+        if not project_id:
+            logger.error("GCP_PROJECT_ID não definido no .env")
+            sys.exit(1)
+        
+        validator = DataValidator(project_id, dataset_id)
     
     # Executar validações
-    validator = DataValidator(project_id, dataset_id)
-    results = validator.run_all_validations()
+    batch = os.getenv('VALIDATION_BATCH', 'false').lower() == 'true'
+    concurrent = os.getenv('VALIDATION_CONCURRENT', 'false').lower() == 'true'
+    results = validator.run_all_validations(batch=batch, concurrent=concurrent)
     
     # Exit code baseado no resultado
     if results['passed'].all():
@@ -10,10 +10,13 @@ Data: Outubro 2025
 
 import os
 import sys
+import mmap
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 import json
+import numpy as np
 from loguru import logger
 
 # Configuração de logging
@@ -185,12 +188,16 @@ class KaggleExtractor:
             logger.error(f"❌ Erro ao baixar dataset: {str(e)}")
             return False
     
-    def extract_zip(self, zip_path: Optional[str] = None) -> bool:
+    def extract_zip(self, zip_path: Optional[str] = None, etl=None) -> bool:
         """
         Extrai arquivo ZIP do Kaggle (se necessário)
         
         Args:
             zip_path: Caminho do arquivo ZIP. Se None, procura no output_dir
+            etl: Instância de OlistBigQueryETL. Se informada, os CSVs são
+                 convertidos em streaming direto do ZIP para Parquet
+                 (etl.stage_zip_to_parquet), sem gravar os CSVs em disco;
+                 o ZIP é mantido como fonte dos dados
             
         Returns:
             True se sucesso, False caso contrário
@@ -206,6 +213,12 @@ class KaggleExtractor:
             else:
                 zip_path = Path(zip_path)
             
+            if etl is not None:
+                logger.info(f"Convertendo para Parquet (sem extrair): {zip_path.name}")
+                staged = etl.stage_zip_to_parquet(str(zip_path))
+                logger.success(f"✓ {len(staged)} tabelas em Parquet: {etl.processed_path}")
+                return True
+            
             logger.info(f"Extraindo: {zip_path.name}")
             
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
@@ -260,10 +273,113 @@ class KaggleExtractor:
         
         return {}
     
-    def validate_downloaded_files(self) -> bool:
+    def _iter_file_buffers(self, file_path: Path,
+                           buffer_size: int) -> Iterator[bytes]:
+        """
+        Lê um arquivo em blocos grandes, via mmap quando possível
+        
+        Args:
+            file_path: Caminho do arquivo
+            buffer_size: Tamanho de cada bloco em bytes
+            
+        Yields:
+            Blocos de bytes do arquivo, em ordem
+        """
+        with open(file_path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Arquivo vazio ou mmap indisponível: leitura bufferizada
+                data = None
+            
+            if data is None:
+                while True:
+                    buffer = f.read(buffer_size)
+                    if not buffer:
+                        return
+                    yield buffer
+            
+            with data:
+                for start in range(0, len(data), buffer_size):
+                    yield data[start:start + buffer_size]
+    
+    @staticmethod
+    def _count_records_in_buffer(buffer: bytes, in_quotes: bool) -> Tuple[int, bool]:
+        """
+        Conta quebras de linha fora de aspas em um bloco
+        
+        Uma quebra de linha termina um registro quando o número de aspas
+        antes dela é par; aspas escapadas ("") não alteram a paridade.
+        
+        Args:
+            buffer: Bloco de bytes do CSV
+            in_quotes: Se o bloco começa dentro de um campo entre aspas
+            
+        Returns:
+            Tuple (registros terminados no bloco, estado de aspas no fim)
+        """
+        # Caminho rápido: sem aspas, basta contar as quebras de linha
+        if not in_quotes and b'"' not in buffer:
+            return buffer.count(b'\n'), False
+        
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        # uint8 pode estourar, mas a paridade (bit menos significativo) é preservada
+        quotes = np.cumsum(data == ord('"'), dtype=np.uint8)
+        outside = ((quotes + in_quotes) & 1) == 0
+        records = int(np.count_nonzero((data == ord('\n')) & outside))
+        
+        return records, bool((int(quotes[-1]) + in_quotes) & 1)
+    
+    def count_csv_rows(self, file_path: Path,
+                       buffer_size: int = 8 * 1024 * 1024) -> int:
+        """
+        Conta as linhas de dados de um CSV sem fazer o parse
+        
+        Varre os bytes brutos em blocos grandes e respeita quebras de linha
+        dentro de campos entre aspas (ex: comentários das reviews).
+        
+        Args:
+            file_path: Caminho do CSV
+            buffer_size: Tamanho dos blocos lidos em bytes
+            
+        Returns:
+            Número de linhas de dados (sem o header)
+        """
+        records = 0
+        in_quotes = False
+        last_byte = b'\n'
+        trailing_newlines = 0
+        
+        for buffer in self._iter_file_buffers(Path(file_path), buffer_size):
+            count, in_quotes = self._count_records_in_buffer(buffer, in_quotes)
+            records += count
+            last_byte = buffer[-1:]
+            
+            # Quebras de linha consecutivas no fim do arquivo (pode cruzar blocos)
+            content = buffer.rstrip(b'\r\n')
+            newlines = buffer.count(b'\n', len(content))
+            trailing_newlines = newlines if content else trailing_newlines + newlines
+        
+        # Último registro sem quebra de linha final
+        if last_byte != b'\n':
+            records += 1
+        elif not in_quotes and trailing_newlines > 1:
+            # Linhas em branco no fim não são registros (como no pandas.read_csv)
+            records -= trailing_newlines - 1
+        
+        return max(records - 1, 0)
+    
+    def validate_downloaded_files(self, max_workers: Optional[int] = None) -> bool:
         """
         Valida se todos os arquivos esperados foram baixados
         
+        As linhas são contadas por varredura dos bytes (count_csv_rows),
+        com os arquivos processados em paralelo.
+        
+        Args:
+            max_workers: Nº de arquivos contados simultaneamente
+                         (default: nº de CPUs)
+        
         Returns:
             True se todos os arquivos existem, False caso contrário
         """
@@ -278,22 +394,30 @@ class KaggleExtractor:
             'olist_order_payments_dataset.csv': 103886,
             'olist_order_reviews_dataset.csv': 99224,
             'product_category_name_translation.csv': 71,
+            'olist_geolocation_dataset.csv': 1000163,
         }
         
         all_valid = True
         
+        # Contar todos os arquivos existentes em paralelo
+        existing = [f for f in expected_files if (self.output_dir / f).exists()]
+        futures = {}
+        if existing:
+            workers = max_workers or min(len(existing), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    filename: executor.submit(self.count_csv_rows, self.output_dir / filename)
+                    for filename in existing
+                }
+        
         for filename, expected_rows in expected_files.items():
-            file_path = self.output_dir / filename
-            
-            if not file_path.exists():
+            if filename not in futures:
                 logger.error(f"  ❌ Arquivo faltando: {filename}")
                 all_valid = False
                 continue
             
             try:
-                import pandas as pd
-                df = pd.read_csv(file_path)
-                actual_rows = len(df)
+                actual_rows = futures[filename].result()
                 
                 # Tolerância de 5% no número de linhas
                 tolerance = expected_rows * 0.05
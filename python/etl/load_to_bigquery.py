@@ -10,15 +10,23 @@ Data: Outubro 2025
 
 import os
 import sys
+import json
+import hashlib
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 from loguru import logger
-from tqdm import tqdm
 import time
 
+from ..utils.bigquery_clients import get_client
+from ..utils.bigquery_jobs import job_stats, wait_for_job
+
 # Configuração de logging
 logger.remove()
 logger.add(sys.stderr, level="INFO")
@@ -28,7 +36,51 @@ logger.add("logs/etl_bigquery.log", rotation="10 MB", level="DEBUG")
 class OlistBigQueryETL:
     """Pipeline ETL para carregar dados Olist no BigQuery"""
     
-    def __init__(self, project_id: str, dataset_id: str, data_path: str):
+    # Colunas STRING de baixa cardinalidade lidas como category no modo tipado;
+    # as demais (IDs, textos livres) usam strings Arrow
+    CATEGORICAL_COLUMNS = {
+        'customer_city', 'customer_state', 'seller_city', 'seller_state',
+        'order_status', 'payment_type', 'product_category_name',
+        'product_category_name_english',
+    }
+    
+    # Tabelas com carga incremental: coluna de high-water mark e chave primária.
+    # Tabelas sem timestamp próprio usam o do pedido pai (via order_id).
+    INCREMENTAL_TABLES = {
+        'orders': {
+            'watermark': 'order_purchase_timestamp',
+            'primary_key': ['order_id'],
+        },
+        'reviews': {
+            'watermark': 'review_creation_date',
+            'primary_key': ['review_id', 'order_id'],
+        },
+        'order_items': {
+            'watermark': 'order_purchase_timestamp',
+            'primary_key': ['order_id', 'order_item_id'],
+            'parent': 'orders',
+            'parent_key': 'order_id',
+        },
+        'payments': {
+            'watermark': 'order_purchase_timestamp',
+            'primary_key': ['order_id', 'payment_sequential'],
+            'parent': 'orders',
+            'parent_key': 'order_id',
+        },
+    }
+    
+    # Limites do território brasileiro (lat_min, lat_max, lng_min, lng_max);
+    # o dataset tem pontos de geolocalização espúrios fora do país
+    BRAZIL_BOUNDS = (-33.75, 5.27, -73.99, -34.79)
+    
+    def __init__(self, project_id: str, dataset_id: str, data_path: str,
+                 chunksize: Optional[int] = None, typed: bool = False,
+                 parquet_staging: bool = False,
+                 processed_path: str = './data/processed',
+                 skip_unchanged: bool = False,
+                 incremental: bool = False,
+                 lookback_days: int = 7,
+                 zip_path: Optional[str] = None):
         """
         Inicializa o pipeline ETL
         
@@ -36,11 +88,40 @@ class OlistBigQueryETL:
             project_id: ID do projeto GCP
             dataset_id: ID do dataset BigQuery
             data_path: Caminho para os CSVs do Olist
+            chunksize: Se definido, lê e carrega os CSVs em blocos de
+                       `chunksize` linhas (modo streaming)
+            typed: Se True, lê os CSVs com tipos derivados do schema
+                   (engine pyarrow)
+            parquet_staging: Se True, converte cada CSV uma única vez para
+                             Parquet em `processed_path` e carrega o Parquet
+            processed_path: Diretório dos arquivos Parquet de staging
+            skip_unchanged: Se True, pula tabelas cujo CSV não mudou desde
+                            a última carga (manifesto em data_path)
+            incremental: Se True, tabelas em INCREMENTAL_TABLES recebem apenas
+                         as linhas novas (WRITE_APPEND) e as atualizações
+                         tardias via MERGE
+            lookback_days: Janela (dias antes do high-water mark) em que
+                           linhas já carregadas são reconciliadas via MERGE
+            zip_path: Se definido, os CSVs são lidos direto do ZIP do Kaggle
+                      e convertidos para Parquet sem extração (ver
+                      stage_zip_to_parquet)
         """
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.data_path = Path(data_path)
-        self.client = bigquery.Client(project=project_id)
+        self.chunksize = chunksize
+        self.typed = typed
+        self.parquet_staging = parquet_staging
+        self.processed_path = Path(processed_path)
+        self.skip_unchanged = skip_unchanged
+        self.manifest_path = self.data_path / '.etl_manifest.json'
+        self._manifest = None
+        self._manifest_lock = threading.Lock()
+        self.incremental = incremental
+        self.lookback_days = lookback_days
+        self.zip_path = Path(zip_path) if zip_path else None
+        self._staged_parquet: Dict[str, Path] = {}
+        self.client = get_client(project_id)
         
         # Mapeamento de arquivos CSV para tabelas BigQuery
         self.table_mapping = {
@@ -52,7 +133,8 @@ class OlistBigQueryETL:
             'olist_order_payments_dataset.csv': 'payments',
             'olist_order_reviews_dataset.csv': 'reviews',
             'product_category_name_translation.csv': 'product_category_translation',
-            # 'olist_geolocation_dataset.csv': 'geolocation',  # Muito grande - opcional
+            # Alto volume: agregado em centróides por CEP (load_geolocation_centroids)
+            'olist_geolocation_dataset.csv': 'geolocation',
         }
         
         # Schema definitions para cada tabela
@@ -127,6 +209,14 @@ class OlistBigQueryETL:
                 bigquery.SchemaField("product_category_name", "STRING", mode="REQUIRED"),
                 bigquery.SchemaField("product_category_name_english", "STRING", mode="REQUIRED"),
             ],
+            'geolocation': [
+                bigquery.SchemaField("geolocation_zip_code_prefix", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("geolocation_lat", "FLOAT"),
+                bigquery.SchemaField("geolocation_lng", "FLOAT"),
+                bigquery.SchemaField("geolocation_city", "STRING"),
+                bigquery.SchemaField("geolocation_state", "STRING"),
+                bigquery.SchemaField("geolocation_points", "INTEGER"),
+            ],
         }
         
         return schemas
@@ -147,16 +237,20 @@ class OlistBigQueryETL:
             self.client.create_dataset(dataset)
             logger.success(f"Dataset {dataset_ref} criado com sucesso")
     
-    def load_csv_to_dataframe(self, csv_file: str) -> pd.DataFrame:
+    def load_csv_to_dataframe(self, csv_file: str, typed: bool = False) -> pd.DataFrame:
         """
         Carrega CSV para DataFrame com tratamento de erros
         
         Args:
             csv_file: Nome do arquivo CSV
+            typed: Se True, usa leitura tipada pelo schema (load_csv_typed)
             
         Returns:
             DataFrame com os dados
         """
+        if typed:
+            return self.load_csv_typed(csv_file)
+        
         file_path = self.data_path / csv_file
         
         if not file_path.exists():
@@ -180,20 +274,169 @@ class OlistBigQueryETL:
         
         return df
     
-    def load_table_to_bigquery(self, df: pd.DataFrame, table_name: str) -> None:
+    def _schema_to_dtypes(self, table_name: str,
+                          string_dtype: str = 'string[pyarrow]') -> Tuple[Dict[str, str], List[str]]:
+        """
+        Traduz o schema BigQuery de uma tabela para dtypes pandas/Arrow
+        
+        Args:
+            table_name: Nome da tabela (chave em self.schemas)
+            string_dtype: dtype das colunas STRING não categóricas
+            
+        Returns:
+            Tuple (dict coluna -> dtype, lista de colunas TIMESTAMP)
+        """
+        dtypes = {}
+        timestamp_cols = []
+        
+        for field in self.schemas.get(table_name, []):
+            if field.field_type == "STRING":
+                if field.name in self.CATEGORICAL_COLUMNS:
+                    dtypes[field.name] = 'category'
+                else:
+                    dtypes[field.name] = string_dtype
+            elif field.field_type == "INTEGER":
+                dtypes[field.name] = 'Int64'
+            elif field.field_type == "FLOAT":
+                dtypes[field.name] = 'float64'
+            elif field.field_type == "TIMESTAMP":
+                timestamp_cols.append(field.name)
+        
+        return dtypes, timestamp_cols
+    
+    def load_csv_typed(self, csv_file: str) -> pd.DataFrame:
+        """
+        Carrega CSV com tipos explícitos derivados do schema BigQuery
+        
+        Usa a engine pyarrow (multithread), que já reconhece timestamps ISO
+        na própria leitura. STRING vira category (baixa cardinalidade) ou
+        string Arrow, INTEGER vira Int64 nullable. Sem pyarrow, cai para a
+        engine C com os mesmos tipos.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            
+        Returns:
+            DataFrame tipado conforme o schema da tabela
+        """
+        file_path = self.data_path / csv_file
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+        
+        try:
+            import pyarrow  # noqa: F401
+            engine, string_dtype = 'pyarrow', 'string[pyarrow]'
+        except ImportError:
+            logger.warning("pyarrow não instalado - usando engine C")
+            engine, string_dtype = 'c', 'string'
+        
+        table_name = self.table_mapping.get(csv_file)
+        dtypes, timestamp_cols = self._schema_to_dtypes(table_name, string_dtype)
+        
+        logger.info(f"Carregando {csv_file} (tipado, engine={engine})...")
+        
+        df = pd.read_csv(
+            file_path,
+            encoding='utf-8',
+            engine=engine,
+            dtype=dtypes,
+            parse_dates=timestamp_cols or None,
+        )
+        df.columns = df.columns.str.strip()
+        
+        # Valores inválidos impedem o parse nativo: coagir apenas essas colunas
+        for col in timestamp_cols:
+            if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+        
+        logger.info(f"✓ {len(df):,} linhas carregadas de {csv_file}")
+        
+        return df
+    
+    def _cast_to_schema(self, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        """
+        Converte as colunas do DataFrame para os tipos do schema BigQuery
+        
+        Args:
+            df: DataFrame lido do CSV
+            table_name: Nome da tabela (chave em self.schemas)
+            
+        Returns:
+            DataFrame com tipos ajustados
+        """
+        for field in self.schemas.get(table_name, []):
+            if field.name not in df.columns:
+                continue
+            
+            if field.field_type == "TIMESTAMP":
+                df[field.name] = pd.to_datetime(df[field.name], errors='coerce')
+            elif field.field_type == "INTEGER":
+                df[field.name] = pd.to_numeric(df[field.name], errors='coerce').astype('Int64')
+            elif field.field_type == "FLOAT":
+                df[field.name] = pd.to_numeric(df[field.name], errors='coerce').astype('float64')
+        
+        return df
+    
+    def iter_csv_chunks(self, csv_file: str,
+                        chunksize: int = 100_000,
+                        source=None) -> Iterator[pd.DataFrame]:
+        """
+        Lê um CSV em blocos de tamanho fixo, tipando cada bloco pelo schema
+        
+        Colunas STRING são lidas como texto (preserva zeros à esquerda de CEPs)
+        e as demais são convertidas bloco a bloco, de modo que o pico de
+        memória depende de `chunksize` e não do tamanho do arquivo.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            chunksize: Número de linhas por bloco
+            source: Objeto file-like a ler no lugar do arquivo em data_path
+                    (ex: membro de ZIP)
+            
+        Yields:
+            DataFrames com no máximo `chunksize` linhas
+        """
+        if source is None:
+            source = self.data_path / csv_file
+            
+            if not source.exists():
+                raise FileNotFoundError(f"Arquivo não encontrado: {source}")
+        
+        table_name = self.table_mapping.get(csv_file)
+        string_cols = {
+            field.name: str
+            for field in self.schemas.get(table_name, [])
+            if field.field_type == "STRING"
+        }
+        
+        logger.info(f"Lendo {csv_file} em blocos de {chunksize:,} linhas...")
+        
+        reader = pd.read_csv(
+            source, encoding='utf-8', dtype=string_cols, chunksize=chunksize
+        )
+        
+        with reader:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                yield self._cast_to_schema(chunk, table_name)
+    
+    def load_table_to_bigquery(self, df: pd.DataFrame, table_name: str,
+                               write_disposition: str = bigquery.WriteDisposition.WRITE_TRUNCATE) -> None:
         """
         Carrega DataFrame para BigQuery
         
         Args:
             df: DataFrame com os dados
             table_name: Nome da tabela de destino
+            write_disposition: WRITE_TRUNCATE (default) ou WRITE_APPEND
         """
         table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
         
         # Configuração do job
         job_config = bigquery.LoadJobConfig(
             schema=self.schemas.get(table_name),
-            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,  # Sobrescrever
+            write_disposition=write_disposition,
             create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
         )
         
@@ -204,19 +447,742 @@ class OlistBigQueryETL:
             df, table_id, job_config=job_config
         )
         
-        # Aguardar conclusão
-        with tqdm(total=100, desc=f"Upload {table_name}", unit="%") as pbar:
-            while not job.done():
-                time.sleep(1)
-                pbar.update(1)
-            pbar.update(100 - pbar.n)
+        self._wait_for_load_job(job, table_name)
+        
+        logger.success(f"✓ {table_name}: {len(df):,} linhas carregadas")
+    
+    def _wait_for_load_job(self, job: bigquery.LoadJob, table_name: str) -> None:
+        """
+        Aguarda a conclusão de um load job e verifica erros
+        
+        Args:
+            job: Load job submetido
+            table_name: Nome da tabela (para progresso/logs)
+        """
+        # Aguardar conclusão (job.result com backoff, sem polling fixo)
+        try:
+            wait_for_job(job)
+        except Exception as e:
+            raise Exception(f"Job falhou: {str(e)}") from e
         
         # Verificar erros
         if job.errors:
             logger.error(f"Erros no job: {job.errors}")
             raise Exception(f"Job falhou: {job.errors}")
         
-        logger.success(f"✓ {table_name}: {len(df):,} linhas carregadas")
+        rows, num_bytes = job_stats(job)
+        if rows:
+            logger.debug(
+                f"{table_name}: {rows:,} linhas, "
+                f"{num_bytes / (1024 * 1024):.2f} MB gravados"
+            )
+    
+    def load_csv_in_chunks(self, csv_file: str, table_name: str,
+                           chunksize: int = 100_000) -> int:
+        """
+        Carrega um CSV para o BigQuery bloco a bloco (modo streaming)
+        
+        Os blocos vão para uma tabela de staging (o primeiro com
+        WRITE_TRUNCATE, os seguintes com WRITE_APPEND), copiada sobre a
+        tabela de destino só depois do último bloco. Uma falha no meio do
+        arquivo mantém a tabela anterior intacta; um CSV sem blocos deixa
+        a tabela vazia.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            table_name: Nome da tabela de destino
+            chunksize: Número de linhas por bloco
+            
+        Returns:
+            Total de linhas carregadas
+        """
+        table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        staging_id = f"{table_id}__staging"
+        schema = self.schemas.get(table_name)
+        
+        total_rows = 0
+        write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+        
+        try:
+            for chunk in self.iter_csv_chunks(csv_file, chunksize):
+                job_config = bigquery.LoadJobConfig(
+                    schema=schema,
+                    write_disposition=write_disposition,
+                    create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+                )
+                job = self.client.load_table_from_dataframe(chunk, staging_id, job_config=job_config)
+                self._wait_for_load_job(job, f"{table_name}__staging")
+                
+                write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+                total_rows += len(chunk)
+            
+            # Nenhum bloco: staging vazia, para que a cópia esvazie o destino
+            if write_disposition == bigquery.WriteDisposition.WRITE_TRUNCATE:
+                self.client.delete_table(staging_id, not_found_ok=True)
+                self.client.create_table(bigquery.Table(staging_id, schema=schema))
+            
+            job = self.client.copy_table(
+                staging_id, table_id,
+                job_config=bigquery.CopyJobConfig(
+                    write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE
+                )
+            )
+            self._wait_for_load_job(job, table_name)
+        finally:
+            self.client.delete_table(staging_id, not_found_ok=True)
+        
+        logger.info(f"✓ {total_rows:,} linhas carregadas de {csv_file} (streaming)")
+        
+        return total_rows
+    
+    def _schema_to_arrow(self, table_name: str) -> Dict:
+        """
+        Traduz o schema BigQuery de uma tabela para tipos Arrow
+        
+        Args:
+            table_name: Nome da tabela (chave em self.schemas)
+            
+        Returns:
+            Dict coluna -> pyarrow.DataType
+        """
+        import pyarrow as pa
+        
+        arrow_types = {
+            "STRING": pa.string(),
+            "INTEGER": pa.int64(),
+            "FLOAT": pa.float64(),
+            "TIMESTAMP": pa.timestamp('us'),
+        }
+        
+        return {
+            field.name: arrow_types[field.field_type]
+            for field in self.schemas.get(table_name, [])
+            if field.field_type in arrow_types
+        }
+    
+    @staticmethod
+    def _coerce_arrow_column(column, arrow_type) -> Tuple:
+        """
+        Converte uma coluna de texto para o tipo Arrow do schema
+        
+        O cast do pyarrow é tentado primeiro; se algum valor for inválido,
+        a coluna é convertida com pandas (errors='coerce') e os valores
+        inválidos viram nulos.
+        
+        Args:
+            column: pyarrow.Array de strings
+            arrow_type: Tipo de destino (timestamp, int64, float64)
+            
+        Returns:
+            (coluna convertida, número de valores inválidos)
+        """
+        import pyarrow as pa
+        
+        try:
+            return column.cast(arrow_type), 0
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+        
+        values = column.to_pandas()
+        if pa.types.is_timestamp(arrow_type):
+            coerced = pd.to_datetime(values, errors='coerce')
+        else:
+            coerced = pd.to_numeric(values, errors='coerce')
+        
+        n_invalid = int((coerced.isna() & values.notna()).sum())
+        return pa.array(coerced, type=arrow_type, from_pandas=True, safe=False), n_invalid
+    
+    def _parquet_is_current(self, parquet_path: Path, csv_path: Path) -> bool:
+        """
+        Verifica se o Parquet de staging foi gerado a partir do CSV atual
+        
+        A assinatura do CSV (tamanho e mtime) é gravada nos metadados do
+        Parquet no momento da conversão.
+        
+        Args:
+            parquet_path: Caminho do Parquet de staging
+            csv_path: Caminho do CSV de origem
+            
+        Returns:
+            True se o Parquet pode ser reutilizado
+        """
+        stat = csv_path.stat()
+        return self._parquet_matches_source(parquet_path, {
+            'source_size': str(stat.st_size),
+            'source_mtime_ns': str(stat.st_mtime_ns),
+        })
+    
+    def _parquet_matches_source(self, parquet_path: Path, source: Dict[str, str]) -> bool:
+        """
+        Compara a assinatura da origem com os metadados de um Parquet
+        
+        Args:
+            parquet_path: Caminho do Parquet de staging
+            source: Chaves de metadados esperadas (ex: source_size, source_crc)
+            
+        Returns:
+            True se todas as chaves coincidem
+        """
+        import pyarrow.parquet as pq
+        
+        if not parquet_path.exists():
+            return False
+        
+        try:
+            metadata = pq.read_schema(parquet_path).metadata or {}
+        except Exception:
+            return False
+        
+        return all(
+            metadata.get(key.encode()) == value.encode()
+            for key, value in source.items()
+        )
+    
+    def stage_csv_to_parquet(self, csv_file: str,
+                             block_size: int = 64 * 1024 * 1024) -> Path:
+        """
+        Converte um CSV para Parquet comprimido em `processed_path`
+        
+        A conversão é feita em streaming (pyarrow.csv.open_csv): cada bloco
+        lido vira um row group, então a memória fica limitada a `block_size`.
+        Se o CSV não mudou desde a última conversão, o Parquet é reutilizado.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            block_size: Bytes de CSV lidos por bloco (~ tamanho do row group)
+            
+        Returns:
+            Caminho do arquivo Parquet
+        """
+        csv_path = self.data_path / csv_file
+        
+        if not csv_path.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {csv_path}")
+        
+        table_name = self.table_mapping.get(csv_file, csv_path.stem)
+        parquet_path = self.processed_path / f"{table_name}.parquet"
+        
+        if self._parquet_is_current(parquet_path, csv_path):
+            logger.info(f"Parquet atualizado, reutilizando: {parquet_path}")
+            return parquet_path
+        
+        logger.info(f"Convertendo {csv_file} -> {parquet_path}...")
+        
+        stat = csv_path.stat()
+        self._write_csv_to_parquet(csv_path, table_name, parquet_path, {
+            'source_file': csv_file,
+            'source_size': str(stat.st_size),
+            'source_mtime_ns': str(stat.st_mtime_ns),
+        }, block_size)
+        
+        return parquet_path
+    
+    def _write_csv_to_parquet(self, source, table_name: str, parquet_path: Path,
+                              metadata: Dict[str, str],
+                              block_size: int = 64 * 1024 * 1024) -> int:
+        """
+        Converte um CSV (caminho ou stream) em Parquet tipado, bloco a bloco
+        
+        Args:
+            source: Caminho do CSV ou objeto file-like (ex: membro de ZIP)
+            table_name: Tabela cujo schema define os tipos
+            parquet_path: Caminho do Parquet de saída
+            metadata: Assinatura da origem gravada nos metadados do Parquet
+            block_size: Bytes de CSV lidos por bloco (~ tamanho do row group)
+            
+        Returns:
+            Número de linhas escritas
+        """
+        import pyarrow as pa
+        import pyarrow.csv as pv
+        import pyarrow.parquet as pq
+        
+        self.processed_path.mkdir(parents=True, exist_ok=True)
+        tmp_path = parquet_path.with_suffix('.parquet.tmp')
+        
+        # Colunas não-texto são lidas como string e convertidas bloco a bloco:
+        # um valor inválido vira nulo (como em _cast_to_schema) em vez de abortar
+        target_types = {
+            name: arrow_type
+            for name, arrow_type in self._schema_to_arrow(table_name).items()
+            if not pa.types.is_string(arrow_type)
+        }
+        
+        # Um erro no meio (bloco malformado, disco cheio) não deixa .tmp órfão
+        try:
+            reader = pv.open_csv(
+                source,
+                read_options=pv.ReadOptions(block_size=block_size),
+                # Comentários de reviews têm quebras de linha entre aspas
+                parse_options=pv.ParseOptions(newlines_in_values=True),
+                convert_options=pv.ConvertOptions(
+                    column_types={
+                        name: pa.string() if name in target_types else arrow_type
+                        for name, arrow_type in self._schema_to_arrow(table_name).items()
+                    },
+                    strings_can_be_null=True,
+                ),
+            )
+            
+            schema = reader.schema
+            for name, arrow_type in target_types.items():
+                if name in schema.names:
+                    index = schema.get_field_index(name)
+                    schema = schema.set(index, schema.field(index).with_type(arrow_type))
+            schema = schema.with_metadata(metadata)
+            
+            total_rows = 0
+            invalid: Dict[str, int] = {}
+            with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+                for batch in reader:
+                    columns = []
+                    for name, column in zip(batch.schema.names, batch.columns):
+                        if name in target_types:
+                            column, n_invalid = self._coerce_arrow_column(column, target_types[name])
+                            if n_invalid:
+                                invalid[name] = invalid.get(name, 0) + n_invalid
+                        columns.append(column)
+                    
+                    writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+                    total_rows += batch.num_rows
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        
+        for name, count in invalid.items():
+            logger.warning(f"{table_name}.{name}: {count:,} valores inválidos convertidos para nulo")
+        
+        # Renomear só no final: um Parquet parcial nunca é reutilizado
+        tmp_path.replace(parquet_path)
+        
+        size_mb = parquet_path.stat().st_size / (1024 * 1024)
+        logger.info(f"✓ {total_rows:,} linhas em {parquet_path.name} ({size_mb:.2f} MB)")
+        
+        return total_rows
+    
+    def _stage_zip_member(self, zip_path: Path, member: zipfile.ZipInfo,
+                          block_size: int) -> Path:
+        """
+        Converte um membro do ZIP em Parquet sem extrair o CSV para disco
+        
+        Cada chamada abre seu próprio handle do ZIP, permitindo que vários
+        membros sejam descomprimidos e convertidos ao mesmo tempo.
+        
+        Args:
+            zip_path: Caminho do arquivo ZIP
+            member: Entrada do CSV dentro do ZIP
+            block_size: Bytes de CSV lidos por bloco
+            
+        Returns:
+            Caminho do arquivo Parquet
+        """
+        csv_file = Path(member.filename).name
+        table_name = self.table_mapping[csv_file]
+        parquet_path = self.processed_path / f"{table_name}.parquet"
+        
+        # CRC e tamanho descomprimido identificam o conteúdo do membro
+        metadata = {
+            'source_file': csv_file,
+            'source_size': str(member.file_size),
+            'source_crc': str(member.CRC),
+        }
+        
+        if self._parquet_matches_source(parquet_path, metadata):
+            logger.info(f"Parquet atualizado, reutilizando: {parquet_path}")
+            return parquet_path
+        
+        logger.info(f"Convertendo {zip_path.name}:{csv_file} -> {parquet_path}...")
+        
+        with zipfile.ZipFile(zip_path) as zip_ref, zip_ref.open(member) as stream:
+            self._write_csv_to_parquet(stream, table_name, parquet_path, metadata, block_size)
+        
+        return parquet_path
+    
+    def stage_zip_to_parquet(self, zip_path: str,
+                             max_workers: Optional[int] = None,
+                             block_size: int = 64 * 1024 * 1024) -> Dict[str, Path]:
+        """
+        Converte os CSVs de um ZIP direto para Parquet, sem extraí-los
+        
+        Cada membro é lido em streaming do ZIP pelo parser CSV do pyarrow e
+        gravado como Parquet tipado em `processed_path`. Os membros são
+        processados em paralelo. As tabelas convertidas passam a ser
+        carregadas a partir do Parquet por _process_table.
+        
+        Args:
+            zip_path: Caminho do ZIP do dataset
+            max_workers: Nº de membros convertidos simultaneamente
+            block_size: Bytes de CSV lidos por bloco
+            
+        Returns:
+            Dict tabela -> caminho do Parquet, na ordem do table_mapping
+        """
+        zip_path = Path(zip_path)
+        
+        if not zip_path.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {zip_path}")
+        
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            # geolocation não vira Parquet bruto: é agregada em centróides
+            members = [
+                info for info in zip_ref.infolist()
+                if self.table_mapping.get(Path(info.filename).name) not in (None, 'geolocation')
+            ]
+        
+        if not members:
+            logger.warning(f"Nenhum CSV conhecido em {zip_path.name}")
+            return {}
+        
+        logger.info(f"Convertendo {len(members)} CSVs de {zip_path.name} para Parquet...")
+        
+        staged = {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(members)) as executor:
+            futures = {
+                executor.submit(self._stage_zip_member, zip_path, info, block_size):
+                    self.table_mapping[Path(info.filename).name]
+                for info in members
+            }
+            
+            for future in as_completed(futures):
+                staged[futures[future]] = future.result()
+        
+        self._staged_parquet.update(staged)
+        
+        return {
+            table_name: staged[table_name]
+            for table_name in self.table_mapping.values()
+            if table_name in staged
+        }
+    
+    def load_parquet_to_bigquery(self, parquet_path: Path, table_name: str) -> int:
+        """
+        Carrega um arquivo Parquet diretamente para o BigQuery
+        
+        Args:
+            parquet_path: Caminho do arquivo Parquet
+            table_name: Nome da tabela de destino
+            
+        Returns:
+            Número de linhas do arquivo
+        """
+        import pyarrow.parquet as pq
+        
+        table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        
+        job_config = bigquery.LoadJobConfig(
+            schema=self.schemas.get(table_name),
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+        )
+        
+        logger.info(f"Carregando Parquet para BigQuery: {table_id}")
+        
+        with open(parquet_path, 'rb') as f:
+            job = self.client.load_table_from_file(f, table_id, job_config=job_config)
+        
+        self._wait_for_load_job(job, table_name)
+        
+        num_rows = pq.read_metadata(parquet_path).num_rows
+        logger.success(f"✓ {table_name}: {num_rows:,} linhas carregadas")
+        
+        return num_rows
+    
+    # =========================================
+    # GEOLOCALIZAÇÃO (ALTO VOLUME)
+    # =========================================
+    
+    def _geolocation_centroids(self, chunks: Iterator[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Reduz os pontos de geolocalização a um centróide por prefixo de CEP
+        
+        Pontos repetidos (mesmo CEP, lat e lng) são descartados em streaming
+        com um conjunto compacto de hashes de 64 bits (array numpy ordenado,
+        8 bytes por ponto distinto); pontos fora dos limites do Brasil são
+        ignorados. Por CEP são mantidas apenas somas e contagens, então a
+        memória não cresce com o tamanho do arquivo.
+        
+        Args:
+            chunks: Blocos tipados do CSV (iter_csv_chunks)
+            
+        Returns:
+            DataFrame com uma linha por geolocation_zip_code_prefix
+        """
+        key_cols = ['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng']
+        lat_min, lat_max, lng_min, lng_max = self.BRAZIL_BOUNDS
+        
+        seen = np.empty(0, dtype=np.uint64)
+        totals = None
+        total_points = 0
+        dropped = 0
+        
+        for chunk in chunks:
+            total_points += len(chunk)
+            chunk = chunk.dropna(subset=key_cols)
+            in_bounds = (
+                chunk['geolocation_lat'].between(lat_min, lat_max)
+                & chunk['geolocation_lng'].between(lng_min, lng_max)
+            )
+            dropped += int((~in_bounds).sum())
+            chunk = chunk[in_bounds]
+            
+            # Deduplicação: primeira ocorrência no bloco e inédita nos anteriores
+            hashes = pd.util.hash_pandas_object(chunk[key_cols], index=False).to_numpy()
+            is_new = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, seen)
+            seen = np.union1d(seen, hashes[is_new])
+            chunk = chunk[is_new]
+            
+            partial = chunk.groupby('geolocation_zip_code_prefix').agg(
+                lat_sum=('geolocation_lat', 'sum'),
+                lng_sum=('geolocation_lng', 'sum'),
+                points=('geolocation_lat', 'size'),
+                geolocation_city=('geolocation_city', 'first'),
+                geolocation_state=('geolocation_state', 'first'),
+            )
+            totals = partial if totals is None else pd.concat([totals, partial]).groupby(level=0).agg({
+                'lat_sum': 'sum',
+                'lng_sum': 'sum',
+                'points': 'sum',
+                'geolocation_city': 'first',
+                'geolocation_state': 'first',
+            })
+        
+        if totals is None:
+            return pd.DataFrame(columns=[field.name for field in self.schemas['geolocation']])
+        
+        centroids = pd.DataFrame({
+            'geolocation_zip_code_prefix': totals.index.astype(str),
+            'geolocation_lat': (totals['lat_sum'] / totals['points']).to_numpy(),
+            'geolocation_lng': (totals['lng_sum'] / totals['points']).to_numpy(),
+            'geolocation_city': totals['geolocation_city'].to_numpy(),
+            'geolocation_state': totals['geolocation_state'].to_numpy(),
+            'geolocation_points': totals['points'].astype('int64').to_numpy(),
+        })
+        
+        logger.info(
+            f"✓ geolocation: {total_points:,} pontos -> {len(seen):,} distintos "
+            f"-> {len(centroids):,} CEPs ({dropped:,} fora do Brasil)"
+        )
+        
+        return centroids
+    
+    def load_geolocation_centroids(self, csv_file: str = 'olist_geolocation_dataset.csv',
+                                   chunksize: Optional[int] = None) -> pd.DataFrame:
+        """
+        Lê o CSV de geolocalização em blocos e retorna os centróides por CEP
+        
+        Se o CSV não estiver em data_path e houver zip_path, o membro é
+        lido em streaming direto do ZIP.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            chunksize: Linhas por bloco (default: self.chunksize ou 100.000)
+            
+        Returns:
+            DataFrame de centróides (schema 'geolocation')
+        """
+        chunksize = chunksize or self.chunksize or 100_000
+        csv_path = self.data_path / csv_file
+        
+        if csv_path.exists() or not self.zip_path:
+            return self._geolocation_centroids(self.iter_csv_chunks(csv_file, chunksize))
+        
+        with zipfile.ZipFile(self.zip_path) as zip_ref:
+            member = next(
+                (info for info in zip_ref.infolist() if Path(info.filename).name == csv_file),
+                None
+            )
+            if member is None:
+                raise FileNotFoundError(f"Arquivo não encontrado: {csv_path}")
+            
+            with zip_ref.open(member) as stream:
+                return self._geolocation_centroids(
+                    self.iter_csv_chunks(csv_file, chunksize, source=stream)
+                )
+    
+    # =========================================
+    # CARGA INCREMENTAL
+    # =========================================
+    
+    def get_high_water_mark(self, table_name: str) -> Optional[pd.Timestamp]:
+        """
+        Obtém o maior valor da coluna de watermark já carregado na tabela
+        
+        Args:
+            table_name: Nome da tabela (chave em INCREMENTAL_TABLES)
+            
+        Returns:
+            Timestamp (naive, UTC) ou None se a tabela não existe/está vazia
+        """
+        config = self.INCREMENTAL_TABLES[table_name]
+        table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        
+        if 'parent' in config:
+            parent_id = f"{self.project_id}.{self.dataset_id}.{config['parent']}"
+            query = f"""
+            SELECT MAX(p.{config['watermark']}) AS high_water_mark
+            FROM `{table_id}` t
+            INNER JOIN `{parent_id}` p USING ({config['parent_key']})
+            """
+        else:
+            query = f"""
+            SELECT MAX({config['watermark']}) AS high_water_mark
+            FROM `{table_id}`
+            """
+        
+        try:
+            result = self.client.query(query).to_dataframe()
+        except NotFound:
+            return None
+        
+        value = result.iloc[0, 0]
+        if pd.isna(value):
+            return None
+        
+        value = pd.Timestamp(value)
+        return value.tz_convert(None) if value.tzinfo else value
+    
+    def _watermark_series(self, df: pd.DataFrame, table_name: str) -> pd.Series:
+        """
+        Retorna o valor de watermark de cada linha do DataFrame
+        
+        Para tabelas filhas, o timestamp vem do CSV da tabela pai.
+        
+        Args:
+            df: DataFrame da tabela
+            table_name: Nome da tabela (chave em INCREMENTAL_TABLES)
+            
+        Returns:
+            Series de timestamps alinhada ao índice de df
+        """
+        config = self.INCREMENTAL_TABLES[table_name]
+        
+        if 'parent' not in config:
+            return pd.to_datetime(df[config['watermark']], errors='coerce')
+        
+        parent_csv = next(
+            csv for csv, table in self.table_mapping.items()
+            if table == config['parent']
+        )
+        key, watermark = config['parent_key'], config['watermark']
+        
+        parent = pd.read_csv(
+            self.data_path / parent_csv,
+            usecols=[key, watermark],
+            dtype={key: str},
+            encoding='utf-8',
+        )
+        parent_watermarks = pd.to_datetime(
+            parent.drop_duplicates(key).set_index(key)[watermark], errors='coerce'
+        )
+        
+        return df[key].astype(str).map(parent_watermarks)
+    
+    def _merge_into_table(self, df: pd.DataFrame, table_name: str) -> None:
+        """
+        Aplica atualizações via MERGE nas chaves primárias da tabela
+        
+        As linhas são carregadas numa tabela de staging temporária, que é
+        removida ao final.
+        
+        Args:
+            df: Linhas a reconciliar
+            table_name: Nome da tabela de destino
+        """
+        config = self.INCREMENTAL_TABLES[table_name]
+        table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        staging_id = f"{table_id}__staging"
+        
+        job_config = bigquery.LoadJobConfig(
+            schema=self.schemas.get(table_name),
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+        )
+        
+        columns = [field.name for field in self.schemas[table_name]]
+        keys = config['primary_key']
+        
+        on_clause = " AND ".join(f"T.{k} = S.{k}" for k in keys)
+        set_clause = ", ".join(f"{c} = S.{c}" for c in columns if c not in keys)
+        
+        merge_query = f"""
+        MERGE `{table_id}` T
+        USING `{staging_id}` S
+        ON {on_clause}
+        WHEN MATCHED THEN UPDATE SET {set_clause}
+        WHEN NOT MATCHED THEN INSERT ROW
+        """
+        
+        try:
+            job = self.client.load_table_from_dataframe(
+                df[columns], staging_id, job_config=job_config
+            )
+            self._wait_for_load_job(job, f"{table_name}__staging")
+            
+            self.client.query(merge_query).result()
+        finally:
+            self.client.delete_table(staging_id, not_found_ok=True)
+        
+        logger.success(f"✓ {table_name}: {len(df):,} linhas reconciliadas (MERGE)")
+    
+    def load_table_incremental(self, csv_file: str, table_name: str) -> Dict[str, int]:
+        """
+        Carrega apenas o delta de uma tabela desde o último high-water mark
+        
+        Linhas com watermark acima do high-water mark entram com WRITE_APPEND;
+        linhas dentro da janela `lookback_days` passam por MERGE para
+        capturar atualizações tardias. Linhas sem watermark (nulo ou pedido
+        pai ausente) não podem ser posicionadas e também passam por MERGE,
+        que é idempotente nas chaves. Sem high-water mark (tabela inexistente
+        ou vazia), faz a carga completa.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            table_name: Nome da tabela (chave em INCREMENTAL_TABLES)
+            
+        Returns:
+            Dict com linhas anexadas e reconciliadas
+        """
+        high_water_mark = self.get_high_water_mark(table_name)
+        df = self.load_csv_typed(csv_file)
+        
+        if high_water_mark is None:
+            logger.info(f"{table_name}: sem high-water mark, carga completa")
+            self.load_table_to_bigquery(df, table_name)
+            return {'appended': len(df), 'merged': 0}
+        
+        logger.info(f"{table_name}: high-water mark = {high_water_mark}")
+        
+        watermarks = self._watermark_series(df, table_name)
+        lookback_start = high_water_mark - pd.Timedelta(days=self.lookback_days)
+        
+        new_mask = (watermarks > high_water_mark).fillna(False)
+        missing_mask = watermarks.isna()
+        late_mask = ((watermarks > lookback_start).fillna(False) & ~new_mask) | missing_mask
+        
+        new_rows = df[new_mask.to_numpy(dtype=bool)]
+        late_rows = df[late_mask.to_numpy(dtype=bool)]
+        
+        if missing_mask.any():
+            logger.warning(
+                f"{table_name}: {int(missing_mask.sum()):,} linhas sem watermark "
+                f"incluídas no MERGE"
+            )
+        
+        if len(new_rows):
+            self.load_table_to_bigquery(
+                new_rows, table_name, bigquery.WriteDisposition.WRITE_APPEND
+            )
+        
+        if len(late_rows):
+            self._merge_into_table(late_rows, table_name)
+        
+        logger.info(
+            f"{table_name}: {len(new_rows):,} linhas novas, "
+            f"{len(late_rows):,} reconciliadas"
+        )
+        
+        return {'appended': len(new_rows), 'merged': len(late_rows)}
     
     def validate_data_quality(self, table_name: str) -> Dict:
         """
@@ -251,47 +1217,280 @@ class OlistBigQueryETL:
         
         return quality_metrics
     
-    def run_full_pipeline(self) -> None:
-        """Executa o pipeline completo de ETL"""
+    # =========================================
+    # MANIFESTO DE ARQUIVOS CARREGADOS
+    # =========================================
+    
+    def _load_manifest(self) -> Dict:
+        """Lê o manifesto de cargas anteriores (vazio se não existir)"""
+        if not self.manifest_path.exists():
+            return {}
         
-        logger.info("=" * 60)
-        logger.info("INICIANDO PIPELINE ETL - OLIST TO BIGQUERY")
-        logger.info("=" * 60)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifesto inválido, ignorando: {str(e)}")
+            return {}
+    
+    def _save_manifest(self) -> None:
+        """Grava o manifesto de forma atômica"""
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, indent=2, sort_keys=True)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        tmp_path.replace(self.manifest_path)
+    
+    def _file_signature(self, file_path: Path, previous: Optional[Dict] = None) -> Dict:
+        """
+        Calcula a assinatura (tamanho, mtime, hash BLAKE2b) de um arquivo
         
-        start_time = time.time()
+        Se tamanho e mtime batem com a assinatura anterior, o hash anterior
+        é reaproveitado sem reler o arquivo.
         
-        # 1. Criar dataset
-        self.create_dataset_if_not_exists()
+        Args:
+            file_path: Caminho do arquivo
+            previous: Assinatura registrada no manifesto (opcional)
+            
+        Returns:
+            Dict com size, mtime_ns e hash
+        """
+        stat = file_path.stat()
         
-        # 2. Carregar cada tabela
+        if (previous and previous.get('size') == stat.st_size
+                and previous.get('mtime_ns') == stat.st_mtime_ns):
+            content_hash = previous['hash']
+        else:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    hasher.update(block)
+            content_hash = hasher.hexdigest()
+        
+        return {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': content_hash,
+        }
+    
+    def _zip_member_signature(self, csv_file: str) -> Optional[Dict]:
+        """
+        Calcula a assinatura de um CSV dentro do ZIP sem descomprimi-lo
+        
+        O CRC-32 e o tamanho descomprimido do diretório do ZIP fazem o papel
+        do hash, como nos metadados dos Parquets gerados do ZIP.
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            
+        Returns:
+            Dict com size, crc e hash, ou None se o membro não existir
+        """
+        with zipfile.ZipFile(self.zip_path) as zip_ref:
+            member = next(
+                (info for info in zip_ref.infolist() if Path(info.filename).name == csv_file),
+                None
+            )
+        
+        if member is None:
+            return None
+        
+        return {
+            'size': member.file_size,
+            'crc': member.CRC,
+            'hash': f"crc32:{member.CRC:08x}:{member.file_size}",
+        }
+    
+    def _manifest_entry(self, csv_file: str) -> Optional[Dict]:
+        """Retorna a entrada do manifesto de um CSV (carregando se preciso)"""
+        with self._manifest_lock:
+            if self._manifest is None:
+                self._manifest = self._load_manifest()
+            return self._manifest.get(csv_file)
+    
+    def _update_manifest(self, csv_file: str, entry: Dict) -> None:
+        """Registra uma carga bem-sucedida no manifesto"""
+        with self._manifest_lock:
+            if self._manifest is None:
+                self._manifest = self._load_manifest()
+            self._manifest[csv_file] = entry
+            self._save_manifest()
+    
+    def _process_table(self, csv_file: str, table_name: str) -> Dict:
+        """
+        Executa o ciclo completo de uma tabela (leitura, upload, validação)
+        
+        Args:
+            csv_file: Nome do arquivo CSV
+            table_name: Nome da tabela de destino
+            
+        Returns:
+            Dict com métricas de qualidade da tabela
+            (com 'skipped': True se o CSV não mudou desde a última carga)
+        """
+        table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        signature = None
+        
+        if self.skip_unchanged and table_name not in self._staged_parquet:
+            csv_path = self.data_path / csv_file
+            previous = self._manifest_entry(csv_file)
+            
+            if csv_path.exists():
+                signature = self._file_signature(csv_path, previous)
+            elif self.zip_path:
+                # Modo ZIP: geolocation é lida direto do ZIP, sem CSV em disco
+                signature = self._zip_member_signature(csv_file)
+            
+            if signature is None:
+                raise FileNotFoundError(f"Arquivo não encontrado: {csv_path}")
+            
+            if (previous and previous.get('hash') == signature['hash']
+                    and previous.get('table_id') == table_id):
+                logger.info(f"↷ {table_name}: CSV sem alterações, carga ignorada")
+                return {
+                    'table': table_name,
+                    'skipped': True,
+                    'total_rows': previous.get('total_rows', 0),
+                }
+        
+        if table_name == 'geolocation':
+            # Alto volume: ~1M pontos reduzidos a um centróide por CEP
+            df = self.load_geolocation_centroids(csv_file)
+            self.load_table_to_bigquery(df, table_name)
+        elif table_name in self._staged_parquet:
+            # Modo ZIP: CSV convertido direto do ZIP em stage_zip_to_parquet
+            self.load_parquet_to_bigquery(self._staged_parquet[table_name], table_name)
+        elif self.incremental and table_name in self.INCREMENTAL_TABLES:
+            # Modo incremental: apenas o delta desde o high-water mark
+            self.load_table_incremental(csv_file, table_name)
+        elif self.parquet_staging:
+            # Modo Parquet: converte uma vez e carrega o arquivo direto
+            parquet_path = self.stage_csv_to_parquet(csv_file)
+            self.load_parquet_to_bigquery(parquet_path, table_name)
+        elif self.chunksize:
+            # Modo streaming: leitura e upload bloco a bloco
+            self.load_csv_in_chunks(csv_file, table_name, self.chunksize)
+        else:
+            # Carregar CSV
+            df = self.load_csv_to_dataframe(csv_file, typed=self.typed)
+            
+            # Upload para BigQuery
+            self.load_table_to_bigquery(df, table_name)
+        
+        # Validar qualidade
+        quality = self.validate_data_quality(table_name)
+        
+        if signature is not None:
+            self._update_manifest(csv_file, {
+                **signature,
+                'table_id': table_id,
+                'total_rows': quality['total_rows'],
+                'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            })
+        
+        return quality
+    
+    def _run_tables_sequential(self) -> List[Dict]:
+        """Processa as tabelas uma a uma, na ordem do table_mapping"""
         results = []
         
         for csv_file, table_name in self.table_mapping.items():
             try:
                 logger.info(f"\n--- Processando {table_name} ---")
-                
-                # Carregar CSV
-                df = self.load_csv_to_dataframe(csv_file)
-                
-                # Upload para BigQuery
-                self.load_table_to_bigquery(df, table_name)
-                
-                # Validar qualidade
-                quality = self.validate_data_quality(table_name)
-                results.append(quality)
+                results.append(self._process_table(csv_file, table_name))
                 
             except Exception as e:
                 logger.error(f"Erro ao processar {table_name}: {str(e)}")
                 continue
         
+        return results
+    
+    def _run_tables_parallel(self, max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Processa todas as tabelas concorrentemente em um pool limitado
+        
+        Cada worker lê o CSV, submete o load job e aguarda sua conclusão,
+        de forma que os jobs rodam juntos no BigQuery. Falhas continuam
+        isoladas por tabela.
+        
+        Args:
+            max_workers: Tamanho máximo do pool (default: nº de tabelas)
+            
+        Returns:
+            Lista de métricas na ordem do table_mapping
+        """
+        max_workers = max_workers or len(self.table_mapping)
+        results_by_table = {}
+        
+        logger.info(
+            f"Processando {len(self.table_mapping)} tabelas em paralelo "
+            f"({max_workers} workers)"
+        )
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._process_table, csv_file, table_name): table_name
+                for csv_file, table_name in self.table_mapping.items()
+            }
+            
+            for future in as_completed(futures):
+                table_name = futures[future]
+                try:
+                    results_by_table[table_name] = future.result()
+                except Exception as e:
+                    logger.error(f"Erro ao processar {table_name}: {str(e)}")
+        
+        # Manter a ordem do table_mapping no sumário
+        return [
+            results_by_table[table_name]
+            for table_name in self.table_mapping.values()
+            if table_name in results_by_table
+        ]
+    
+    def run_full_pipeline(self, parallel: bool = False,
+                          max_workers: Optional[int] = None) -> None:
+        """
+        Executa o pipeline completo de ETL
+        
+        Args:
+            parallel: Se True, processa todas as tabelas concorrentemente
+            max_workers: Nº máximo de tabelas simultâneas no modo paralelo
+        """
+        
+        logger.info("=" * 60)
+        logger.info("INICIANDO PIPELINE ETL - OLIST TO BIGQUERY")
+        logger.info("=" * 60)
+        
+        start_time = time.time()
+        
+        # 1. Criar dataset
+        self.create_dataset_if_not_exists()
+        
+        if self.zip_path:
+            self.stage_zip_to_parquet(self.zip_path)
+        
+        # 2. Carregar cada tabela
+        if parallel:
+            results = self._run_tables_parallel(max_workers)
+        else:
+            results = self._run_tables_sequential()
+        
         # 3. Sumário final
         elapsed_time = time.time() - start_time
         
         logger.info("\n" + "=" * 60)
         logger.info("PIPELINE CONCLUÍDO")
         logger.info("=" * 60)
+        skipped = [r for r in results if r.get('skipped')]
+        results = [r for r in results if not r.get('skipped')]
+        
         logger.info(f"Tempo total: {elapsed_time:.2f} segundos")
         logger.info(f"Tabelas processadas: {len(results)}")
+        if skipped:
+            logger.info(f"Tabelas sem alteração (ignoradas): {len(skipped)}")
         
         total_rows = sum(r['total_rows'] for r in results)
         logger.info(f"Total de linhas carregadas: {total_rows:,}")
@@ -299,6 +1498,8 @@ class OlistBigQueryETL:
         logger.info("\nResumo por tabela:")
         for r in results:
             logger.info(f"  - {r['table']}: {r['total_rows']:,} linhas")
+        for r in skipped:
+            logger.info(f"  - {r['table']}: ignorada (sem alterações)")
         
         logger.success("\n✓ ETL concluído com sucesso!")
 
@@ -313,13 +1514,22 @@ def main():
     project_id = os.getenv('GCP_PROJECT_ID')
     dataset_id = os.getenv('GCP_DATASET_ID', 'olist_ecommerce')
     data_path = os.getenv('DATA_RAW_PATH', './data/raw')
+    parallel = os.getenv('ETL_PARALLEL', 'false').lower() == 'true'
+    max_workers = int(os.getenv('ETL_MAX_WORKERS', '4'))
+    chunksize = int(os.getenv('ETL_CHUNKSIZE', '0')) or None
+    typed = os.getenv('ETL_TYPED_CSV', 'false').lower() == 'true'
+    parquet_staging = os.getenv('ETL_PARQUET_STAGING', 'false').lower() == 'true'
+    processed_path = os.getenv('DATA_PROCESSED_PATH', './data/processed')
+    skip_unchanged = os.getenv('ETL_SKIP_UNCHANGED', 'false').lower() == 'true'
+    incremental = os.getenv('ETL_INCREMENTAL', 'false').lower() == 'true'
+    zip_path = os.getenv('ETL_ZIP_PATH') or None
     
     # Validar configuração
     if not project_id:
         logger.error("GCP_PROJECT_ID não definido no .env")
         sys.exit(1)
     
-    if not Path(data_path).exists():
+    if not zip_path and not Path(data_path).exists():
         logger.error(f"Diretório de dados não encontrado: {data_path}")
         sys.exit(1)
     
@@ -327,10 +1537,17 @@ def main():
     etl = OlistBigQueryETL(
         project_id=project_id,
         dataset_id=dataset_id,
-        data_path=data_path
+        data_path=data_path,
+        chunksize=chunksize,
+        typed=typed,
+        parquet_staging=parquet_staging,
+        processed_path=processed_path,
+        skip_unchanged=skip_unchanged,
+        incremental=incremental,
+        zip_path=zip_path
     )
     
-    etl.run_full_pipeline()
+    etl.run_full_pipeline(parallel=parallel, max_workers=max_workers)
 
 
 if __name__ == "__main__":
@@ -8,12 +8,27 @@ Módulo de utilitários e helpers (BigQuery, logging, config).
 __version__ = "1.0.0"
 __author__ = "Andre Bomfim"
 
+from .bigquery_clients import get_client
 from .bigquery_helper import BigQueryHelper
+from .bigquery_jobs import wait_for_job, wait_for_jobs
+from .bigquery_results import iter_result_batches, results_to_dataframe, set_storage_api
+from .query_cache import QueryResultCache
+from .query_templates import QueryTemplate
+from .sql_runner import SQLDagRunner
 from .logger import setup_logger
 from .config import load_config
 
 __all__ = [
     "BigQueryHelper",
+    "get_client",
+    "wait_for_job",
+    "wait_for_jobs",
+    "results_to_dataframe",
+    "iter_result_batches",
+    "set_storage_api",
+    "QueryResultCache",
+    "QueryTemplate",
+    "SQLDagRunner",
     "setup_logger",
     "load_config",
 ]
\ No newline at end of file
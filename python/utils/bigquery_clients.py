@@ -0,0 +1,102 @@
+"""
+BigQuery Clients - Olist E-Commerce
+------------------------------------
+Registro de clients BigQuery compartilhados pelo processo.
+ETL, validação, helper e analytics usam o mesmo client por projeto:
+a descoberta de credenciais acontece uma vez e a sessão HTTP (com pool
+de conexões dimensionado para jobs concorrentes) é reaproveitada.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from google.cloud import bigquery
+from loguru import logger
+
+
+DEFAULT_POOL_SIZE = 32
+
+_clients: Dict[Tuple, bigquery.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def _authorized_session(pool_size: int) -> Tuple[Optional[Any], Optional[Any]]:
+    """
+    Credenciais padrão e sessão HTTP autenticada com pool dimensionado
+
+    O requests mantém só 10 conexões por host; com mais jobs concorrentes
+    as conexões excedentes são abertas e descartadas a cada chamada.
+
+    Args:
+        pool_size: Conexões mantidas por host
+
+    Returns:
+        (credentials, AuthorizedSession), ou (None, None) se as credenciais
+        padrão não forem encontradas (o client faz a própria descoberta)
+    """
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    try:
+        credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+    except Exception as e:
+        logger.debug(f"Pool HTTP padrão mantido: {str(e)}")
+        return None, None
+
+    session = AuthorizedSession(credentials)
+    session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+    return credentials, session
+
+
+def get_client(project_id: Optional[str] = None,
+               location: Optional[str] = None,
+               pool_size: Optional[int] = None) -> bigquery.Client:
+    """
+    Client BigQuery compartilhado para o projeto
+
+    Args:
+        project_id: ID do projeto GCP (None = projeto das credenciais)
+        location: Localização padrão dos jobs
+        pool_size: Conexões HTTP por host (default: BQ_HTTP_POOL_SIZE ou 32)
+
+    Returns:
+        bigquery.Client (a mesma instância para o mesmo projeto/localização)
+    """
+    key = (project_id, location)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            pool_size = pool_size or int(os.getenv('BQ_HTTP_POOL_SIZE', DEFAULT_POOL_SIZE))
+            credentials, session = _authorized_session(pool_size)
+
+            kwargs = {'project': project_id}
+            if location:
+                kwargs['location'] = location
+            if session is not None:
+                # Dependência deliberada de parâmetro privado: bigquery.Client só
+                # aceita uma sessão HTTP própria via `_http` (não há rota pública).
+                # Versão fixada em requirements.txt; revisar ao atualizar o pacote.
+                kwargs.update(credentials=credentials, _http=session)
+
+            client = bigquery.Client(**kwargs)
+
+            _clients[key] = client
+            logger.debug(f"Client BigQuery criado: {project_id} (pool HTTP: {pool_size})")
+
+        return client
+
+
+def clear_clients() -> None:
+    """Fecha e remove todos os clients compartilhados (ex: reset entre testes)"""
+    with _clients_lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
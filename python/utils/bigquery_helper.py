@@ -9,20 +9,35 @@ Data: Outubro 2025
 """
 
 import os
-from typing import Optional, List, Dict, Union
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Optional, List, Dict, Iterator, Union
 from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 from loguru import logger
 
+from .bigquery_clients import get_client
+from .bigquery_results import iter_result_batches, results_to_dataframe
+from .query_cache import QueryResultCache, is_deterministic, referenced_tables
+from .sql_parser import load_statements
+from .sql_runner import SQLDagRunner
+
 
 class BigQueryHelper:
     """Classe helper para operações BigQuery"""
     
     def __init__(self, project_id: Optional[str] = None, 
                  dataset_id: Optional[str] = None,
-                 credentials_path: Optional[str] = None):
+                 credentials_path: Optional[str] = None,
+                 cache_dir: Optional[str] = None,
+                 cache_ttl: Optional[float] = 24 * 3600,
+                 cache_max_mb: int = 1024):
         """
         Inicializa o helper
         
@@ -30,6 +45,10 @@ class BigQueryHelper:
             project_id: ID do projeto GCP
             dataset_id: ID do dataset BigQuery
             credentials_path: Caminho para arquivo de credenciais
+            cache_dir: Diretório do cache local de resultados
+                       (default: BQ_RESULT_CACHE_DIR; None = desativado)
+            cache_ttl: Validade dos resultados em cache, em segundos
+            cache_max_mb: Tamanho máximo do cache em MB (LRU)
         """
         # Configurar credenciais se fornecido
         if credentials_path:
@@ -42,31 +61,91 @@ class BigQueryHelper:
         if not self.project_id:
             raise ValueError("project_id não fornecido. Configure GCP_PROJECT_ID no .env")
         
-        self.client = bigquery.Client(project=self.project_id)
+        self.client = get_client(self.project_id)
+        
+        cache_dir = cache_dir or os.getenv('BQ_RESULT_CACHE_DIR')
+        self.result_cache = QueryResultCache(
+            cache_dir, ttl_seconds=cache_ttl, max_bytes=cache_max_mb * 1024 * 1024
+        ) if cache_dir else None
         
         logger.info(f"BigQuery Helper inicializado: {self.project_id}.{self.dataset_id}")
     
+    def _table_versions(self, query: str) -> Optional[Dict[str, str]]:
+        """
+        Data de última modificação de cada tabela referenciada na query
+        
+        Args:
+            query: Query SQL
+            
+        Returns:
+            Dict tabela -> modified (ISO), ou None se o resultado não deve
+            ir para o cache: query não determinística, sem tabelas
+            qualificadas, com views (modified não reflete as tabelas base)
+            ou com tabela que não pode ser consultada
+        """
+        if not is_deterministic(query):
+            logger.debug("Cache ignorado: query não determinística")
+            return None
+        
+        table_refs = referenced_tables(query)
+        if not table_refs:
+            logger.debug("Cache ignorado: nenhuma tabela `projeto.dataset.tabela` na query")
+            return None
+        
+        versions = {}
+        for table_ref in table_refs:
+            try:
+                table = self.client.get_table(table_ref)
+            except Exception as e:
+                logger.debug(f"Cache ignorado, tabela sem metadados ({table_ref}): {str(e)}")
+                return None
+            if table.table_type == 'VIEW':
+                logger.debug(f"Cache ignorado: {table_ref} é uma view")
+                return None
+            versions[table_ref] = table.modified.isoformat() if table.modified else None
+        return versions
+    
     def query_to_dataframe(self, query: str, 
                           use_cache: bool = True,
-                          max_results: Optional[int] = None) -> pd.DataFrame:
+                          max_results: Optional[int] = None,
+                          query_parameters: Optional[List] = None) -> pd.DataFrame:
         """
         Executa query e retorna DataFrame
         
+        Com o cache local ativo (cache_dir), resultados de queries sobre
+        tabelas não modificadas são lidos do disco sem executar job.
+        
         Args:
             query: Query SQL
-            use_cache: Usar cache do BigQuery
+            use_cache: Usar cache do BigQuery (e o cache local, se ativo)
             max_results: Limite de resultados
+            query_parameters: Parâmetros da query (ScalarQueryParameter...)
             
         Returns:
             DataFrame com resultados
         """
+        cache_key = None
+        if use_cache and self.result_cache is not None:
+            table_versions = self._table_versions(query)
+            if table_versions is not None:
+                cache_key = self.result_cache.make_key(
+                    query, query_parameters, table_versions,
+                    extra={'max_results': max_results}
+                )
+                df = self.result_cache.get(cache_key)
+                if df is not None:
+                    logger.success(f"✓ Query servida do cache local: {len(df):,} linhas")
+                    return df
+        
         job_config = bigquery.QueryJobConfig(use_query_cache=use_cache)
+        if query_parameters:
+            job_config.query_parameters = query_parameters
         
         try:
             logger.debug(f"Executando query...")
             
             query_job = self.client.query(query, job_config=job_config)
-            df = query_job.to_dataframe(max_results=max_results)
+            df = results_to_dataframe(query_job, max_results=max_results)
             
             # Estatísticas da query
             total_bytes = query_job.total_bytes_processed
@@ -77,6 +156,9 @@ class BigQueryHelper:
                 f"{total_mb:.2f} MB processados"
             )
             
+            if cache_key is not None:
+                self.result_cache.put(cache_key, df)
+            
             return df
             
         except Exception as e:
@@ -292,18 +374,75 @@ class BigQueryHelper:
             logger.error(f"Erro ao carregar dados: {str(e)}")
             raise
     
+    def _query_rows(self, query: str,
+                    page_size: int = 50_000,
+                    max_results: Optional[int] = None,
+                    query_parameters: Optional[List] = None):
+        """
+        Executa uma query e retorna o RowIterator paginado do resultado
+        
+        Args:
+            query: Query SQL
+            page_size: Linhas por página
+            max_results: Limite de resultados
+            query_parameters: Parâmetros da query
+            
+        Returns:
+            RowIterator (as páginas são baixadas sob demanda)
+        """
+        job_config = bigquery.QueryJobConfig()
+        if query_parameters:
+            job_config.query_parameters = query_parameters
+        
+        query_job = self.client.query(query, job_config=job_config)
+        return query_job.result(page_size=page_size, max_results=max_results)
+    
+    def iter_query_batches(self, query: str,
+                           page_size: int = 50_000,
+                           as_arrow: bool = False,
+                           max_results: Optional[int] = None,
+                           query_parameters: Optional[List] = None) -> Iterator:
+        """
+        Executa query e produz o resultado em blocos (página a página)
+        
+        Permite agregar ou gravar resultados grandes com memória constante.
+        
+        Args:
+            query: Query SQL
+            page_size: Linhas por página (REST)
+            as_arrow: Se True, produz pyarrow.RecordBatch em vez de DataFrame
+            max_results: Limite de resultados
+            query_parameters: Parâmetros da query
+            
+        Yields:
+            DataFrames (ou RecordBatches) com até `page_size` linhas
+            
+        Example:
+            >>> total = 0
+            >>> for batch in helper.iter_query_batches(query):
+            ...     total += batch['payment_value'].sum()
+        """
+        rows = self._query_rows(query, page_size, max_results, query_parameters)
+        yield from iter_result_batches(rows, as_arrow=as_arrow)
+    
     def export_table_to_csv(self, table_name: str,
                            output_path: str,
                            dataset_id: Optional[str] = None,
-                           max_rows: Optional[int] = None) -> str:
+                           max_rows: Optional[int] = None,
+                           page_size: int = 50_000) -> str:
         """
         Exporta tabela para CSV
         
+        Usa o mesmo caminho paginado de iter_query_batches (_query_rows):
+        cada página é gravada no arquivo aberto, então a memória usada não
+        depende do tamanho da tabela.
+        
         Args:
             table_name: Nome da tabela
             output_path: Caminho do arquivo CSV
             dataset_id: ID do dataset
             max_rows: Limite de linhas
+            page_size: Linhas por página baixada
             
         Returns:
             Caminho do arquivo criado
@@ -315,30 +454,167 @@ class BigQueryHelper:
         if max_rows:
             query += f" LIMIT {max_rows}"
         
-        df = self.query_to_dataframe(query, max_results=max_rows)
+        # RowIterator mantido para obter o schema quando o resultado é vazio
+        rows = self._query_rows(query, page_size, max_results=max_rows)
         
         # Criar diretório se não existir
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
         
-        df.to_csv(output_path, index=False)
+        total_rows = 0
+        header_written = False
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            for df in iter_result_batches(rows):
+                df.to_csv(f, index=False, header=not header_written)
+                header_written = True
+                total_rows += len(df)
+            
+            # Resultado vazio: apenas o header
+            if not header_written:
+                pd.DataFrame(columns=[field.name for field in rows.schema]).to_csv(f, index=False)
         
-        logger.success(f"✓ {len(df):,} linhas exportadas para {output_path}")
+        logger.success(f"✓ {total_rows:,} linhas exportadas para {output_path}")
         
         return output_path
     
-    def run_sql_file(self, sql_file_path: str,
-                    replace_vars: Optional[Dict[str, str]] = None) -> None:
+    EXPORT_FORMATS = {'parquet': '.parquet', 'csv': '.csv.gz'}
+    
+    @staticmethod
+    def _write_shard(table: pa.Table, path: Path, file_format: str) -> Dict:
         """
-        Executa queries de um arquivo SQL
+        Grava um shard do export (Parquet zstd ou CSV gzip)
         
         Args:
-            sql_file_path: Caminho do arquivo SQL
-            replace_vars: Dict para substituir variáveis (ex: ${PROJECT_ID})
+            table: Linhas do shard
+            path: Arquivo de destino
+            file_format: 'parquet' ou 'csv'
+            
+        Returns:
+            Entrada do manifesto (arquivo, linhas, bytes)
+        """
+        tmp_path = path.with_name(path.name + '.tmp')
+        
+        if file_format == 'parquet':
+            pq.write_table(table, tmp_path, compression='zstd')
+        else:
+            with pa.CompressedOutputStream(str(tmp_path), 'gzip') as stream:
+                pa_csv.write_csv(table, stream)
+        
+        tmp_path.replace(path)
+        
+        return {
+            'file': path.name,
+            'rows': table.num_rows,
+            'bytes': path.stat().st_size,
+        }
+    
+    def export_table(self, table_name: str,
+                     output_dir: str,
+                     file_format: str = 'parquet',
+                     dataset_id: Optional[str] = None,
+                     rows_per_shard: int = 1_000_000,
+                     max_workers: int = 4,
+                     page_size: int = 100_000) -> Dict:
         """
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
+        Exporta tabela em shards comprimidos, com manifesto
         
-        # Substituir variáveis
+        As linhas vêm de list_rows (ou da Storage Read API, se habilitada),
+        sem executar query; os shards são gravados em paralelo enquanto o
+        download continua. No máximo `max_workers` shards ficam em memória.
+        
+        Args:
+            table_name: Nome da tabela
+            output_dir: Diretório dos shards e do manifest.json
+            file_format: 'parquet' (zstd) ou 'csv' (gzip)
+            dataset_id: ID do dataset
+            rows_per_shard: Linhas por arquivo
+            max_workers: Shards gravados em paralelo
+            page_size: Linhas por página baixada
+            
+        Returns:
+            Manifesto (tabela, formato, total de linhas e shards)
+        """
+        if file_format not in self.EXPORT_FORMATS:
+            raise ValueError(f"Formato inválido: {file_format}. Use {list(self.EXPORT_FORMATS)}")
+        
+        dataset_id = dataset_id or self.dataset_id
+        table_ref = f"{self.project_id}.{dataset_id}.{table_name}"
+        suffix = self.EXPORT_FORMATS[file_format]
+        
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        rows = self.client.list_rows(table_ref, page_size=page_size)
+        
+        logger.info(f"Exportando {table_ref} ({file_format}, {rows_per_shard:,} linhas/shard)")
+        
+        shards = []
+        pending = set()
+        buffer: List[pa.RecordBatch] = []
+        buffered_rows = 0
+        
+        def submit(table: pa.Table) -> None:
+            # Limita os shards em memória aguardando uma gravação terminar
+            nonlocal pending
+            if len(pending) >= max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                shards.extend(future.result() for future in done)
+            
+            path = output_dir / f"{table_name}-{len(shards) + len(pending):05d}{suffix}"
+            pending.add(executor.submit(self._write_shard, table, path, file_format))
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch in iter_result_batches(rows, as_arrow=True):
+                buffer.append(batch)
+                buffered_rows += batch.num_rows
+                
+                while buffered_rows >= rows_per_shard:
+                    table = pa.Table.from_batches(buffer)
+                    submit(table.slice(0, rows_per_shard))
+                    
+                    remainder = table.slice(rows_per_shard)
+                    buffer = remainder.to_batches()
+                    buffered_rows = remainder.num_rows
+            
+            if buffered_rows:
+                submit(pa.Table.from_batches(buffer))
+            
+            shards.extend(future.result() for future in pending)
+        
+        shards.sort(key=lambda shard: shard['file'])
+        
+        manifest = {
+            'table': table_ref,
+            'format': file_format,
+            'compression': 'zstd' if file_format == 'parquet' else 'gzip',
+            'columns': [field.name for field in rows.schema],
+            'total_rows': sum(shard['rows'] for shard in shards),
+            'total_bytes': sum(shard['bytes'] for shard in shards),
+            'exported_at': datetime.now().isoformat(),
+            'shards': shards,
+        }
+        
+        with open(output_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        
+        logger.success(
+            f"✓ {manifest['total_rows']:,} linhas exportadas em {len(shards)} shards "
+            f"({manifest['total_bytes'] / 1024 / 1024:.2f} MB) → {output_dir}"
+        )
+        
+        return manifest
+    
+    def _render_sql(self, sql_content: str,
+                    replace_vars: Optional[Dict[str, str]] = None) -> str:
+        """
+        Substitui variáveis ${...} de um arquivo SQL
+        
+        Args:
+            sql_content: Conteúdo do arquivo
+            replace_vars: Dict para substituir variáveis (ex: ${PROJECT_ID})
+            
+        Returns:
+            SQL renderizado
+        """
         if replace_vars:
             for key, value in replace_vars.items():
                 sql_content = sql_content.replace(f"${{{key}}}", value)
@@ -347,16 +623,42 @@ class BigQueryHelper:
         sql_content = sql_content.replace("${GCP_PROJECT_ID}", self.project_id)
         sql_content = sql_content.replace("${GCP_DATASET_ID}", self.dataset_id)
         
-        # Split por ; (queries múltiplas)
-        queries = [q.strip() for q in sql_content.split(';') if q.strip()]
+        return sql_content
+    
+    def _load_sql_file(self, sql_file_path: Union[str, Path],
+                       replace_vars: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        Lê um arquivo SQL e retorna seus statements renderizados
+        
+        A divisão em statements (sql_parser) respeita strings, crases e
+        comentários e fica em cache pelo hash do arquivo.
+        
+        Args:
+            sql_file_path: Caminho do arquivo SQL
+            replace_vars: Dict para substituir variáveis (ex: ${PROJECT_ID})
+            
+        Returns:
+            Lista de statements prontos para execução
+        """
+        return [
+            self._render_sql(statement, replace_vars)
+            for statement in load_statements(sql_file_path)
+        ]
+    
+    def run_sql_file(self, sql_file_path: str,
+                    replace_vars: Optional[Dict[str, str]] = None) -> None:
+        """
+        Executa queries de um arquivo SQL
+        
+        Args:
+            sql_file_path: Caminho do arquivo SQL
+            replace_vars: Dict para substituir variáveis (ex: ${PROJECT_ID})
+        """
+        queries = self._load_sql_file(sql_file_path, replace_vars)
         
         logger.info(f"Executando {len(queries)} queries de {sql_file_path}...")
         
         for i, query in enumerate(queries, 1):
-            # Pular comentários
-            if query.startswith('--') or query.startswith('/*'):
-                continue
-            
             try:
                 logger.debug(f"Query {i}/{len(queries)}...")
                 self.execute_query(query)
@@ -366,6 +668,34 @@ class BigQueryHelper:
         
         logger.success(f"✓ {len(queries)} queries executadas com sucesso")
     
+    def run_sql_tree(self, paths: Union[str, List[str]] = ('sql/02_transformations', 'sql/03_analytics'),
+                     max_workers: int = 4,
+                     replace_vars: Optional[Dict[str, str]] = None,
+                     fail_fast: bool = True) -> Dict:
+        """
+        Executa arquivos SQL em paralelo, respeitando dependências entre tabelas
+        
+        Statements que não dependem uns dos outros (ex: stg_customers e
+        stg_orders) rodam ao mesmo tempo; os demais aguardam as tabelas
+        que leem. Ver SQLDagRunner.
+        
+        Args:
+            paths: Arquivo(s) ou diretório(s) SQL
+            max_workers: Statements executados ao mesmo tempo
+            replace_vars: Dict para substituir variáveis (ex: ${PROJECT_ID})
+            fail_fast: Parar de agendar statements ao primeiro erro
+            
+        Returns:
+            Relatório com tempos por statement e caminho crítico
+            
+        Example:
+            >>> report = helper.run_sql_tree(max_workers=8)
+            >>> report['critical_path']
+        """
+        runner = SQLDagRunner(self)
+        runner.build_graph(paths, replace_vars)
+        return runner.run(max_workers=max_workers, fail_fast=fail_fast)
+    
     def get_query_cost_estimate(self, query: str) -> Dict[str, float]:
         """
         Estima custo de uma query (dry run)
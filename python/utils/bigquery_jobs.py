@@ -0,0 +1,135 @@
+"""
+BigQuery Jobs - Olist E-Commerce
+---------------------------------
+Espera de jobs BigQuery (load, query, extract) sem polling fixo.
+Usa job.result(timeout) com backoff exponencial e permite aguardar
+vários jobs ao mesmo tempo, reportando linhas/bytes reais dos jobs.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from tqdm import tqdm
+
+
+def wait_for_job(job: Any,
+                 timeout: Optional[float] = None,
+                 initial_wait: float = 0.5,
+                 max_wait: float = 10.0,
+                 multiplier: float = 2.0) -> Any:
+    """
+    Aguarda a conclusão de um job BigQuery
+
+    Cada fatia de espera bloqueia em job.result(timeout=...), que retorna
+    assim que o job termina; as fatias crescem exponencialmente até
+    `max_wait`. Jobs rápidos terminam sem nenhum atraso artificial.
+
+    Args:
+        job: Job BigQuery (LoadJob, QueryJob, ExtractJob...)
+        timeout: Tempo máximo total em segundos (None = sem limite)
+        initial_wait: Primeira fatia de espera em segundos
+        max_wait: Fatia máxima de espera em segundos
+        multiplier: Fator de crescimento das fatias
+
+    Returns:
+        Resultado de job.result()
+
+    Raises:
+        TimeoutError: Se o job não terminar dentro de `timeout`
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    wait = initial_wait
+
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Job {getattr(job, 'job_id', '?')} excedeu {timeout}s")
+            wait = min(wait, remaining)
+
+        try:
+            return job.result(timeout=wait)
+        except FuturesTimeoutError:
+            wait = min(wait * multiplier, max_wait)
+
+
+def job_stats(job: Any) -> Tuple[int, int]:
+    """
+    Extrai linhas e bytes reais de um job concluído
+
+    Load jobs expõem output_rows/output_bytes; query jobs expõem
+    total_bytes_processed. Valores ausentes contam como zero.
+
+    Args:
+        job: Job BigQuery
+
+    Returns:
+        Tuple (linhas, bytes)
+    """
+    def _as_int(value) -> int:
+        return int(value) if isinstance(value, (int, float)) else 0
+
+    rows = _as_int(getattr(job, 'output_rows', None))
+    num_bytes = _as_int(getattr(job, 'output_bytes', None)) or \
+        _as_int(getattr(job, 'total_bytes_processed', None))
+
+    return rows, num_bytes
+
+
+def wait_for_jobs(jobs: Dict[str, Any],
+                  timeout: Optional[float] = None,
+                  max_workers: Optional[int] = None,
+                  desc: str = "Jobs BigQuery") -> Dict[str, Optional[BaseException]]:
+    """
+    Aguarda vários jobs BigQuery simultaneamente
+
+    Cada job é aguardado em uma thread própria (wait_for_job), e o
+    progresso avança à medida que os jobs terminam, com o total de
+    linhas e bytes reportado pelos próprios jobs.
+
+    Args:
+        jobs: Dict nome -> job
+        timeout: Tempo máximo por job em segundos
+        max_workers: Threads de espera (default: um por job)
+        desc: Descrição da barra de progresso
+
+    Returns:
+        Dict nome -> exceção do job (None se concluiu sem erro)
+    """
+    if not jobs:
+        return {}
+
+    errors: Dict[str, Optional[BaseException]] = {}
+    total_rows = 0
+    total_bytes = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as executor, \
+            tqdm(total=len(jobs), desc=desc, unit="job") as pbar:
+        futures = {
+            executor.submit(wait_for_job, job, timeout): name
+            for name, job in jobs.items()
+        }
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                errors[name] = None
+            except Exception as e:
+                logger.error(f"Job {name} falhou: {str(e)}")
+                errors[name] = e
+
+            rows, num_bytes = job_stats(jobs[name])
+            total_rows += rows
+            total_bytes += num_bytes
+
+            pbar.set_postfix(rows=f"{total_rows:,}", mb=f"{total_bytes / (1024 * 1024):.1f}")
+            pbar.update(1)
+
+    # Manter a ordem de entrada
+    return {name: errors[name] for name in jobs}
@@ -0,0 +1,158 @@
+"""
+BigQuery Results - Olist E-Commerce
+------------------------------------
+Download de resultados de queries BigQuery.
+Com a BigQuery Storage Read API os resultados chegam como record batches
+Arrow lidos em streams paralelos; sem ela (pacote ausente, permissão
+negada), o download volta automaticamente para a API REST paginada.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import os
+import threading
+from typing import Any, Iterator, Optional, Union
+import pandas as pd
+from loguru import logger
+
+
+_storage_api_enabled: Optional[bool] = None
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
+
+def set_storage_api(enabled: Optional[bool]) -> None:
+    """
+    Liga ou desliga a Storage Read API para todo o processo
+
+    Args:
+        enabled: True (Arrow/Storage API), False (REST) ou None (usa a
+                 variável BQ_STORAGE_API / default da biblioteca)
+    """
+    global _storage_api_enabled
+    _storage_api_enabled = enabled
+
+
+def storage_api_enabled() -> Optional[bool]:
+    """
+    Modo de download configurado
+
+    Returns:
+        True/False se definido via set_storage_api ou BQ_STORAGE_API;
+        None para manter o comportamento padrão da biblioteca
+    """
+    if _storage_api_enabled is not None:
+        return _storage_api_enabled
+
+    value = os.getenv('BQ_STORAGE_API', '').strip().lower()
+    if not value:
+        return None
+    return value == 'true'
+
+
+def get_storage_client() -> Optional[Any]:
+    """
+    BigQueryReadClient compartilhado pelo processo
+
+    Criar o client abre um canal gRPC; reaproveitá-lo evita esse custo a
+    cada query.
+
+    Returns:
+        BigQueryReadClient, ou None se google-cloud-bigquery-storage não
+        estiver instalado
+    """
+    global _storage_client
+
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+
+    with _storage_client_lock:
+        if _storage_client is None:
+            _storage_client = bigquery_storage.BigQueryReadClient()
+        return _storage_client
+
+
+def results_to_dataframe(job: Any,
+                         use_storage_api: Optional[bool] = None,
+                         max_results: Optional[int] = None) -> pd.DataFrame:
+    """
+    Baixa o resultado de um query job como DataFrame
+
+    Args:
+        job: QueryJob (ou RowIterator) com to_dataframe()
+        use_storage_api: Sobrepõe a configuração global (storage_api_enabled)
+        max_results: Limite de linhas (a Storage API não suporta limite;
+                     nesse caso o download é feito via REST)
+
+    Returns:
+        DataFrame com o resultado
+    """
+    if use_storage_api is None:
+        use_storage_api = storage_api_enabled()
+
+    # Sem configuração: comportamento padrão da biblioteca
+    if use_storage_api is None:
+        return job.to_dataframe(max_results=max_results) if max_results else job.to_dataframe()
+
+    if use_storage_api and max_results is None:
+        storage_client = get_storage_client()
+
+        if storage_client is None:
+            logger.warning("google-cloud-bigquery-storage não instalado; download via REST")
+        else:
+            try:
+                return job.to_dataframe(bqstorage_client=storage_client)
+            except Exception as e:
+                logger.warning(f"Storage Read API indisponível, download via REST: {str(e)}")
+
+    return job.to_dataframe(max_results=max_results, create_bqstorage_client=False)
+
+
+def iter_result_batches(rows: Any,
+                        as_arrow: bool = False,
+                        use_storage_api: Optional[bool] = None) -> Iterator[Union[pd.DataFrame, Any]]:
+    """
+    Itera sobre um resultado bloco a bloco, sem materializá-lo inteiro
+
+    Via REST cada bloco é uma página do RowIterator; via Storage Read API,
+    uma mensagem de um dos streams de leitura. Se a sessão de leitura não
+    puder ser criada (permissão, quota), o download volta para REST, como
+    em results_to_dataframe; um erro após o primeiro bloco é propagado.
+
+    Args:
+        rows: RowIterator (job.result(page_size=...) ou client.list_rows)
+        as_arrow: Se True, produz pyarrow.RecordBatch em vez de DataFrame
+        use_storage_api: Sobrepõe a configuração global (storage_api_enabled)
+
+    Yields:
+        DataFrames (ou RecordBatches), na ordem do resultado
+    """
+    if use_storage_api is None:
+        use_storage_api = storage_api_enabled()
+
+    def batches(storage_client):
+        if as_arrow:
+            return rows.to_arrow_iterable(bqstorage_client=storage_client)
+        return rows.to_dataframe_iterable(bqstorage_client=storage_client)
+
+    storage_client = get_storage_client() if use_storage_api else None
+
+    if use_storage_api and storage_client is None:
+        logger.warning("google-cloud-bigquery-storage não instalado; download via REST")
+
+    if storage_client is not None:
+        started = False
+        try:
+            for batch in batches(storage_client):
+                started = True
+                yield batch
+            return
+        except Exception as e:
+            if started:
+                raise
+            logger.warning(f"Storage Read API indisponível, download via REST: {str(e)}")
+
+    yield from batches(None)
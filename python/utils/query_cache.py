@@ -0,0 +1,256 @@
+"""
+Query Cache - Olist E-Commerce
+-------------------------------
+Cache local de resultados de queries BigQuery em Parquet.
+A chave combina SQL normalizado, parâmetros e a data de modificação
+das tabelas referenciadas, então qualquer carga nova invalida o cache.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from loguru import logger
+
+
+# Referências totalmente qualificadas: `projeto.dataset.tabela`
+TABLE_REF_PATTERN = re.compile(r"`([\w-]+\.[\w-]+\.[\w$-]+)`")
+
+# Funções e fontes cujo resultado muda sem modificação de tabela
+NONDETERMINISTIC_PATTERN = re.compile(
+    r"\bCURRENT_(?:DATE|DATETIME|TIME|TIMESTAMP)\b|\bINFORMATION_SCHEMA\b"
+    r"|\b(?:RAND|GENERATE_UUID|SESSION_USER|NOW)\s*\(",
+    re.IGNORECASE
+)
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normaliza uma query para uso em chave de cache
+
+    Remove comentários, colapsa espaços e descarta o ';' final, sem alterar
+    o conteúdo de strings e identificadores entre crases.
+
+    Args:
+        query: Query SQL
+
+    Returns:
+        Query normalizada
+    """
+    out = []
+    i = 0
+    n = len(query)
+    pending_space = False
+
+    while i < n:
+        char = query[i]
+
+        # Strings e identificadores: copiados literalmente
+        if char in ("'", '"', '`'):
+            end = i + 1
+            while end < n and query[end] != char:
+                end += 2 if query[end] == '\\' else 1
+            token = query[i:end + 1]
+            i = end + 1
+        elif query.startswith('--', i) or char == '#':
+            end = query.find('\n', i)
+            i = n if end == -1 else end
+            pending_space = True
+            continue
+        elif query.startswith('/*', i):
+            end = query.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = True
+            continue
+        elif char.isspace():
+            pending_space = True
+            i += 1
+            continue
+        else:
+            token = char
+            i += 1
+
+        if pending_space and out:
+            out.append(' ')
+        pending_space = False
+        out.append(token)
+
+    return ''.join(out).rstrip(';').strip()
+
+
+def referenced_tables(query: str) -> List[str]:
+    """Tabelas `projeto.dataset.tabela` citadas na query, sem repetição"""
+    return sorted(set(TABLE_REF_PATTERN.findall(query)))
+
+
+def is_deterministic(query: str) -> bool:
+    """Se a query não usa funções de data/aleatórias nem INFORMATION_SCHEMA"""
+    return not NONDETERMINISTIC_PATTERN.search(normalize_sql(query))
+
+
+class QueryResultCache:
+    """
+    Cache de resultados em disco, endereçado por conteúdo
+
+    Cada resultado é um arquivo <chave>.parquet. O mtime do arquivo marca a
+    criação (TTL) e o atime é atualizado a cada leitura, servindo de ordem
+    LRU para a remoção quando o diretório passa de `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str,
+                 ttl_seconds: Optional[float] = 24 * 3600,
+                 max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Inicializa o cache
+
+        Args:
+            cache_dir: Diretório dos arquivos de cache
+            ttl_seconds: Validade de um resultado (None = sem expiração)
+            max_bytes: Tamanho máximo do diretório de cache
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(query: str,
+                 params: Optional[Iterable] = None,
+                 table_versions: Optional[Dict[str, str]] = None,
+                 extra: Optional[Dict] = None) -> str:
+        """
+        Calcula a chave de cache de uma query
+
+        Args:
+            query: Query SQL
+            params: Parâmetros da query (objetos com to_api_repr() ou valores)
+            table_versions: Dict tabela -> versão (ex: data de modificação)
+            extra: Outras opções que alteram o resultado (ex: max_results)
+
+        Returns:
+            Hash hexadecimal (sha256)
+        """
+        payload = {
+            'sql': normalize_sql(query),
+            'params': [
+                p.to_api_repr() if hasattr(p, 'to_api_repr') else p
+                for p in (params or [])
+            ],
+            'tables': table_versions or {},
+            'extra': extra or {},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        Lê um resultado do cache
+
+        Args:
+            key: Chave (make_key)
+
+        Returns:
+            DataFrame, ou None se ausente, expirado ou ilegível
+        """
+        path = self._path(key)
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        now = time.time()
+        if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+            logger.debug(f"Cache expirado: {key[:12]}")
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            logger.warning(f"Cache ilegível, descartando {key[:12]}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # atime = último acesso (LRU); mtime preservado (TTL)
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> bool:
+        """
+        Grava um resultado no cache e aplica o limite de tamanho
+
+        Args:
+            key: Chave (make_key)
+            df: Resultado da query
+
+        Returns:
+            True se o resultado foi gravado
+        """
+        path = self._path(key)
+        tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+
+        try:
+            df.to_parquet(tmp_path, index=False, compression='zstd')
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.warning(f"Resultado não armazenado em cache: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """
+        Remove os resultados menos usados até respeitar `max_bytes`
+
+        Returns:
+            Número de arquivos removidos
+        """
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob('*.parquet'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+            if removed:
+                logger.debug(f"Cache: {removed} resultados removidos (LRU)")
+
+            return removed
+
+    def clear(self) -> None:
+        """Remove todos os resultados do cache"""
+        with self._lock:
+            for path in self.cache_dir.glob('*.parquet'):
+                path.unlink(missing_ok=True)
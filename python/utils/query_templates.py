@@ -0,0 +1,93 @@
+"""
+Query Templates - Olist E-Commerce
+-----------------------------------
+Queries parametrizadas para as análises.
+O texto SQL depende só de projeto/dataset (renderizado uma vez e
+memoizado); datas e filtros vão como ScalarQueryParameter, então
+execuções repetidas reaproveitam o cache de resultados do BigQuery.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List
+import pandas as pd
+from google.cloud import bigquery
+
+
+@lru_cache(maxsize=128)
+def render_template(sql: str, project_id: str, dataset_id: str) -> str:
+    """
+    Substitui ${GCP_PROJECT_ID} e ${GCP_DATASET_ID} (resultado memoizado)
+
+    Args:
+        sql: Template SQL
+        project_id: ID do projeto GCP
+        dataset_id: ID do dataset BigQuery
+
+    Returns:
+        SQL pronto para execução
+    """
+    return sql.replace("${GCP_PROJECT_ID}", project_id).replace("${GCP_DATASET_ID}", dataset_id)
+
+
+class QueryTemplate:
+    """Template SQL com parâmetros nomeados (@nome) e tipos BigQuery"""
+
+    def __init__(self, sql: str, parameters: Dict[str, str] = None):
+        """
+        Inicializa o template
+
+        Args:
+            sql: SQL com ${GCP_PROJECT_ID}/${GCP_DATASET_ID} e @parâmetros
+            parameters: Dict nome -> tipo BigQuery (DATE, TIMESTAMP, STRING...)
+        """
+        self.sql = sql
+        self.parameters = parameters or {}
+
+    def render(self, project_id: str, dataset_id: str) -> str:
+        """SQL renderizado para o projeto/dataset (memoizado)"""
+        return render_template(self.sql, project_id, dataset_id)
+
+    @staticmethod
+    def _coerce(param_type: str, value: Any) -> Any:
+        """Converte valores (ex: '2018-08-01', pd.Timestamp) para o tipo do parâmetro"""
+        if value is None:
+            return None
+        if param_type in ('TIMESTAMP', 'DATETIME'):
+            return pd.Timestamp(value).to_pydatetime()
+        if param_type == 'DATE':
+            return pd.Timestamp(value).date()
+        return value
+
+    def query_parameters(self, **values) -> List[bigquery.ScalarQueryParameter]:
+        """
+        Monta os parâmetros da query
+
+        Args:
+            **values: Valor de cada parâmetro declarado (None = NULL)
+
+        Returns:
+            Lista de ScalarQueryParameter
+        """
+        unknown = set(values) - set(self.parameters)
+        if unknown:
+            raise ValueError(f"Parâmetros não declarados no template: {sorted(unknown)}")
+
+        return [
+            bigquery.ScalarQueryParameter(name, param_type, self._coerce(param_type, values.get(name)))
+            for name, param_type in self.parameters.items()
+        ]
+
+    def job_config(self, **values) -> bigquery.QueryJobConfig:
+        """
+        QueryJobConfig com os parâmetros preenchidos
+
+        Args:
+            **values: Valor de cada parâmetro declarado (None = NULL)
+
+        Returns:
+            QueryJobConfig
+        """
+        return bigquery.QueryJobConfig(query_parameters=self.query_parameters(**values))
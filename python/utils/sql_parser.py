@@ -0,0 +1,108 @@
+"""
+SQL Parser - Olist E-Commerce
+------------------------------
+Divisão de arquivos SQL em statements.
+Um tokenizer reconhece strings, identificadores entre crases e
+comentários, então ';' dentro deles não quebra o statement e um
+comentário no início não o descarta. O resultado é guardado em cache
+pelo hash do arquivo.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Tuple, Union
+
+
+# Ordem importa: comentários e strings antes do código comum
+TOKEN_PATTERN = re.compile(
+    r"(?P<comment>--[^\n]*|#[^\n]*|/\*.*?(?:\*/|\Z))"
+    r"|(?P<string>'''.*?(?:'''|\Z)|\"\"\".*?(?:\"\"\"|\Z)"
+    r"|'(?:\\.|[^'\\\n])*'?|\"(?:\\.|[^\"\\\n])*\"?)"
+    r"|(?P<identifier>`(?:\\.|[^`\\])*`?)"
+    r"|(?P<semicolon>;)"
+    r"|(?P<code>[^'\"`;#/\-]+|.)",
+    re.DOTALL
+)
+
+STATEMENT_CACHE_SIZE = 256
+
+_statement_cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+_statement_cache_lock = threading.Lock()
+
+
+def split_statements(sql_content: str) -> List[str]:
+    """
+    Divide um script SQL em statements
+
+    Args:
+        sql_content: Conteúdo SQL (um ou mais statements separados por ';')
+
+    Returns:
+        Statements sem o ';' final; trechos só com comentários são ignorados
+    """
+    statements = []
+    parts = []
+    has_code = False
+
+    for match in TOKEN_PATTERN.finditer(sql_content):
+        kind = match.lastgroup
+
+        if kind == 'semicolon':
+            if has_code:
+                statements.append(''.join(parts).strip())
+            parts = []
+            has_code = False
+            continue
+
+        parts.append(match.group())
+        if kind != 'comment' and not (kind == 'code' and match.group().isspace()):
+            has_code = True
+
+    if has_code:
+        statements.append(''.join(parts).strip())
+
+    return statements
+
+
+def load_statements(sql_file_path: Union[str, Path]) -> List[str]:
+    """
+    Lê e divide um arquivo SQL, com cache pelo hash do conteúdo
+
+    Arquivos inalterados não são tokenizados de novo; qualquer edição
+    muda o hash e gera uma nova entrada.
+
+    Args:
+        sql_file_path: Caminho do arquivo SQL
+
+    Returns:
+        Statements do arquivo (variáveis ${...} ainda não substituídas)
+    """
+    content = Path(sql_file_path).read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+
+    with _statement_cache_lock:
+        cached = _statement_cache.get(digest)
+        if cached is not None:
+            _statement_cache.move_to_end(digest)
+            return list(cached)
+
+    statements = tuple(split_statements(content.decode('utf-8')))
+
+    with _statement_cache_lock:
+        _statement_cache[digest] = statements
+        while len(_statement_cache) > STATEMENT_CACHE_SIZE:
+            _statement_cache.popitem(last=False)
+
+    return list(statements)
+
+
+def clear_statement_cache() -> None:
+    """Esvazia o cache de statements"""
+    with _statement_cache_lock:
+        _statement_cache.clear()
@@ -0,0 +1,392 @@
+"""
+SQL Runner - Olist E-Commerce
+------------------------------
+Execução paralela dos arquivos SQL respeitando dependências.
+Cada statement vira um nó; as tabelas `projeto.dataset.tabela` que ele
+lê e escreve definem as arestas. Nós independentes rodam em paralelo,
+então um rebuild completo leva o tempo do caminho crítico.
+
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+from loguru import logger
+
+from .query_cache import normalize_sql, referenced_tables
+
+
+# Tabela escrita por um statement (DDL/DML), após remover comentários
+WRITE_PATTERN = re.compile(
+    r"^(?:CREATE(?:\s+OR\s+REPLACE)?(?:\s+TEMP(?:ORARY)?)?\s+(?:TABLE|VIEW|MATERIALIZED\s+VIEW)"
+    r"(?:\s+IF\s+NOT\s+EXISTS)?|INSERT(?:\s+INTO)?|MERGE(?:\s+INTO)?|DELETE(?:\s+FROM)?"
+    r"|UPDATE|TRUNCATE\s+TABLE|DROP\s+(?:TABLE|VIEW)(?:\s+IF\s+EXISTS)?)"
+    r"\s+`?([\w$.-]+)`?",
+    re.IGNORECASE
+)
+
+# Tabelas lidas: alvo de FROM/JOIN (com ou sem crases), exceto subqueries e funções
+SOURCE_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN)\s+(`[^`]+`|[A-Za-z_][\w$.-]*)(?![\w$.-])(?!\s*\()",
+    re.IGNORECASE
+)
+
+# Nomes definidos em WITH (não são tabelas)
+CTE_PATTERN = re.compile(r"(?:\bWITH(?:\s+RECURSIVE)?|,)\s*(\w+)\s+AS\s*\(", re.IGNORECASE)
+
+# FROM que não introduz tabela: strings, EXTRACT(... FROM col), IS DISTINCT FROM
+NOT_SOURCE_PATTERN = re.compile(
+    r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\""
+    r"|\bEXTRACT\s*\(\s*\w+(?:\s*\(\s*\w+\s*\))?\s+FROM\b|\bDISTINCT\s+FROM\b",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class SQLNode:
+    """Statement SQL e suas dependências no grafo"""
+    node_id: str
+    path: str
+    sql: str
+    writes: Optional[str] = None
+    reads: Set[str] = field(default_factory=set)
+    deps: Set[str] = field(default_factory=set)
+
+
+class SQLDagRunner:
+    """Executa statements SQL em paralelo na ordem do grafo de dependências"""
+
+    def __init__(self, helper: Any):
+        """
+        Inicializa o runner
+
+        Args:
+            helper: BigQueryHelper (lê, renderiza e executa o SQL)
+        """
+        self.helper = helper
+        self.nodes: Dict[str, SQLNode] = {}
+
+    @staticmethod
+    def collect_files(paths: Union[str, Iterable[str]]) -> List[Path]:
+        """
+        Lista os arquivos .sql (diretórios são percorridos recursivamente)
+
+        Args:
+            paths: Arquivo(s) ou diretório(s)
+
+        Returns:
+            Arquivos na ordem informada (ordem alfabética dentro de diretórios)
+        """
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+
+        files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files.extend(sorted(path.rglob('*.sql')))
+            elif path.exists():
+                files.append(path)
+            else:
+                raise FileNotFoundError(f"Arquivo SQL não encontrado: {path}")
+        return files
+
+    @staticmethod
+    def resolve_table(name: str, default_dataset: Optional[str] = None) -> Optional[str]:
+        """
+        Qualifica um nome de tabela com o projeto/dataset padrão
+
+        Args:
+            name: 'tabela', 'dataset.tabela' ou 'projeto.dataset.tabela'
+            default_dataset: 'projeto.dataset' usado nos nomes incompletos
+
+        Returns:
+            'projeto.dataset.tabela', ou None se não houver como completar
+        """
+        name = name.strip('`')
+        parts = name.split('.')
+
+        if len(parts) >= 3:
+            return name
+        if not default_dataset:
+            return None
+        if len(parts) == 2:
+            return f"{default_dataset.split('.')[0]}.{name}"
+        return f"{default_dataset}.{name}"
+
+    @classmethod
+    def parse_statement(cls, node_id: str, path: str, sql: str,
+                        default_dataset: Optional[str] = None) -> SQLNode:
+        """
+        Identifica a tabela escrita e as tabelas lidas por um statement
+
+        A tabela escrita é removida do texto antes da busca por leituras,
+        então só leituras explícitas dela (ex: rebuild particionado a
+        partir da versão anterior) viram dependência.
+
+        Args:
+            node_id: Identificador do nó (arquivo#posição)
+            path: Arquivo de origem
+            sql: Statement já renderizado
+            default_dataset: 'projeto.dataset' para nomes não qualificados
+
+        Returns:
+            SQLNode sem dependências resolvidas
+
+        Raises:
+            ValueError: Se alguma tabela não puder ser qualificada, ou se o
+                        statement não citar nenhuma tabela
+        """
+        body = normalize_sql(sql)
+        unresolved = []
+        writes = None
+
+        match = WRITE_PATTERN.match(body)
+        if match:
+            writes = cls.resolve_table(match.group(1), default_dataset)
+            if writes is None:
+                unresolved.append(match.group(1))
+            body = body[match.end():]
+
+        reads = set(referenced_tables(body))
+
+        sources = NOT_SOURCE_PATTERN.sub(' ', body)
+        ctes = {name.lower() for name in CTE_PATTERN.findall(sources)}
+
+        for name in SOURCE_PATTERN.findall(sources):
+            if name.lower() in ctes:
+                continue
+            table = cls.resolve_table(name, default_dataset)
+            if table is None:
+                unresolved.append(name)
+            else:
+                reads.add(table)
+
+        if unresolved:
+            raise ValueError(f"{node_id}: tabelas sem projeto/dataset: {sorted(set(unresolved))}")
+        if writes is None and not reads:
+            raise ValueError(f"{node_id}: nenhuma tabela identificada no statement")
+
+        return SQLNode(node_id=node_id, path=path, sql=sql, writes=writes, reads=reads)
+
+    def build_graph(self, paths: Union[str, Iterable[str]],
+                    replace_vars: Optional[Dict[str, str]] = None) -> Dict[str, SQLNode]:
+        """
+        Monta o grafo de dependências dos statements
+
+        Dentro de um arquivo a ordem dos statements que tocam a mesma tabela
+        é mantida; entre arquivos, quem lê uma tabela depende do último
+        statement que a escreve.
+
+        Args:
+            paths: Arquivo(s) ou diretório(s) SQL
+            replace_vars: Variáveis extras (ex: {'START_DATE': '2018-01-01'})
+
+        Returns:
+            Dict node_id -> SQLNode
+
+        Raises:
+            ValueError: Se houver dependência circular ou statement sem
+                        tabelas identificáveis (parse_statement)
+        """
+        ordered: List[SQLNode] = []
+        default_dataset = f"{self.helper.project_id}.{self.helper.dataset_id}" \
+            if self.helper.project_id and self.helper.dataset_id else None
+
+        for file_path in self.collect_files(paths):
+            statements = self.helper._load_sql_file(file_path, replace_vars)
+
+            for i, statement in enumerate(statements, 1):
+                node_id = f"{file_path.as_posix()}#{i}"
+                ordered.append(self.parse_statement(
+                    node_id, file_path.as_posix(), statement, default_dataset
+                ))
+
+        final_writer: Dict[str, SQLNode] = {}
+        for node in ordered:
+            if node.writes:
+                final_writer[node.writes] = node
+
+        last_writer: Dict[str, SQLNode] = {}
+        file_writer: Dict[tuple, SQLNode] = {}
+        file_readers: Dict[tuple, List[SQLNode]] = {}
+
+        for node in ordered:
+            for table in node.reads:
+                key = (node.path, table)
+                if key in file_writer:
+                    node.deps.add(file_writer[key].node_id)
+                elif table in final_writer and final_writer[table].path != node.path:
+                    node.deps.add(final_writer[table].node_id)
+                file_readers.setdefault(key, []).append(node)
+
+            if node.writes:
+                key = (node.path, node.writes)
+                if node.writes in last_writer:
+                    node.deps.add(last_writer[node.writes].node_id)
+                node.deps.update(
+                    reader.node_id for reader in file_readers.pop(key, []) if reader is not node
+                )
+                last_writer[node.writes] = node
+                file_writer[key] = node
+
+        self.nodes = {node.node_id: node for node in ordered}
+        self._check_acyclic()
+
+        logger.info(
+            f"Grafo SQL: {len(self.nodes)} statements, "
+            f"{sum(len(n.deps) for n in self.nodes.values())} dependências"
+        )
+
+        return self.nodes
+
+    def _check_acyclic(self) -> None:
+        """Valida o grafo (ordenação topológica de Kahn)"""
+        pending = {node_id: len(node.deps) for node_id, node in self.nodes.items()}
+        dependents = self._dependents()
+        ready = [node_id for node_id, count in pending.items() if count == 0]
+        visited = 0
+
+        while ready:
+            node_id = ready.pop()
+            visited += 1
+            for child in dependents[node_id]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+
+        if visited != len(self.nodes):
+            cycle = sorted(node_id for node_id, count in pending.items() if count > 0)
+            raise ValueError(f"Dependência circular entre statements SQL: {cycle}")
+
+    def _dependents(self) -> Dict[str, List[str]]:
+        dependents = {node_id: [] for node_id in self.nodes}
+        for node in self.nodes.values():
+            for dep in node.deps:
+                dependents[dep].append(node.node_id)
+        return dependents
+
+    def _execute_node(self, node: SQLNode) -> float:
+        start = time.perf_counter()
+        self.helper.execute_query(node.sql)
+        return time.perf_counter() - start
+
+    def critical_path(self, timings: Dict[str, float]) -> List[str]:
+        """
+        Caminho de maior duração no grafo
+
+        Args:
+            timings: Dict node_id -> segundos
+
+        Returns:
+            Lista de node_ids, do primeiro ao último
+        """
+        best: Dict[str, tuple] = {}
+
+        def longest(node_id: str) -> tuple:
+            if node_id not in best:
+                parent = max(
+                    (longest(dep) + (dep,) for dep in self.nodes[node_id].deps),
+                    default=(0.0, None, None)
+                )
+                best[node_id] = (parent[0] + timings.get(node_id, 0.0), parent[2])
+            return best[node_id]
+
+        if not self.nodes:
+            return []
+
+        for node_id in self.nodes:
+            longest(node_id)
+
+        node_id = max(best, key=lambda key: best[key][0])
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = best[node_id][1]
+        return path[::-1]
+
+    def run(self, max_workers: int = 4, fail_fast: bool = True) -> Dict:
+        """
+        Executa o grafo montado por build_graph
+
+        Args:
+            max_workers: Statements executados ao mesmo tempo
+            fail_fast: Se True, para de agendar nós ao primeiro erro
+                       (os já em execução terminam); se False, só os
+                       dependentes do nó com erro são pulados
+
+        Returns:
+            Relatório: tempos por nó, tempo total, soma serial e caminho crítico
+
+        Raises:
+            Exception: O primeiro erro encontrado, após encerrar a execução
+        """
+        dependents = self._dependents()
+        pending = {node_id: len(node.deps) for node_id, node in self.nodes.items()}
+        ready = [node_id for node_id in self.nodes if pending[node_id] == 0]
+        running = {}
+        timings: Dict[str, float] = {}
+        status: Dict[str, str] = {}
+        first_error = None
+
+        logger.info(f"Executando {len(self.nodes)} statements SQL ({max_workers} em paralelo)...")
+        wall_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while ready or running:
+                while ready and len(running) < max_workers and not (fail_fast and first_error):
+                    node_id = ready.pop(0)
+                    running[executor.submit(self._execute_node, self.nodes[node_id])] = node_id
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    node_id = running.pop(future)
+                    try:
+                        timings[node_id] = future.result()
+                    except Exception as e:
+                        status[node_id] = 'failed'
+                        logger.error(f"Erro em {node_id}: {str(e)}")
+                        first_error = first_error or e
+                        continue
+
+                    status[node_id] = 'success'
+                    logger.debug(f"✓ {node_id} ({timings[node_id]:.2f}s)")
+
+                    for child in dependents[node_id]:
+                        pending[child] -= 1
+                        if pending[child] == 0:
+                            ready.append(child)
+
+        for node_id in self.nodes:
+            status.setdefault(node_id, 'skipped')
+
+        report = {
+            'nodes': {
+                node_id: {'status': status[node_id], 'seconds': timings.get(node_id)}
+                for node_id in self.nodes
+            },
+            'wall_seconds': time.perf_counter() - wall_start,
+            'serial_seconds': sum(timings.values()),
+            'critical_path': self.critical_path(timings),
+        }
+
+        if first_error is not None:
+            skipped = sum(1 for s in status.values() if s == 'skipped')
+            logger.error(f"Execução SQL interrompida: {skipped} statements não executados")
+            raise first_error
+
+        logger.success(
+            f"✓ {len(timings)} statements em {report['wall_seconds']:.1f}s "
+            f"(serial: {report['serial_seconds']:.1f}s, "
+            f"caminho crítico: {len(report['critical_path'])} nós)"
+        )
+
+        return report
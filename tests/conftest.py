@@ -0,0 +1,21 @@
+"""
+Tests: conftest
+Fixtures aplicadas a todos os testes.
+Autor: Andre Bomfim
+Data: Outubro 2025
+"""
+
+import pytest
+from unittest.mock import patch
+from google.auth.exceptions import DefaultCredentialsError
+
+from python.utils.bigquery_clients import clear_clients
+
+
+@pytest.fixture(autouse=True)
+def shared_bigquery_clients():
+    """Fixture: registro de clients vazio e sem descoberta de credenciais"""
+    clear_clients()
+    with patch('google.auth.default', side_effect=DefaultCredentialsError("sem credenciais nos testes")):
+        yield
+    clear_clients()
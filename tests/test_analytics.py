@@ -11,12 +11,23 @@ import numpy as np
 from unittest.mock import Mock, patch, MagicMock, call
 from datetime import datetime, timedelta
 import sys
+import time
+import json
+import gzip
 from pathlib import Path
 
 # Adicionar path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from python.analytics.rfm_segmentation import RFMAnalyzer
+from python.analytics.segment_rules import SegmentRuleSet, assign_segments, load_segment_rules
+from python.utils.bigquery_clients import clear_clients, get_client
+from python.utils.bigquery_helper import BigQueryHelper
+from python.utils.bigquery_results import iter_result_batches, results_to_dataframe, set_storage_api
+from python.utils.query_cache import QueryResultCache, normalize_sql, referenced_tables
+from python.utils.query_templates import QueryTemplate, render_template
+from python.utils.sql_parser import clear_statement_cache, load_statements, split_statements
+from python.utils.sql_runner import SQLDagRunner
 
 
 
@@ -27,7 +38,7 @@ class TestRFMAnalyzer:
     @pytest.fixture
     def analyzer(self, project_id, dataset_id):
         """Fixture: RFMAnalyzer instance com mock"""
-        with patch('python.analytics.rfm_segmentation.bigquery.Client'):
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
             analyzer = RFMAnalyzer(project_id, dataset_id)
             analyzer.client = Mock()
             return analyzer
@@ -105,7 +116,8 @@ class TestRFMAnalyzer:
         assert 'R_score' in df.columns
         assert 'F_score' in df.columns
         assert 'M_score' in df.columns
-        assert 'RFM_score' in df.columns
+        assert 'RFM_code' in df.columns
+        assert 'RFM_score' not in df.columns  # texto só na exportação
         assert 'RFM_score_numeric' in df.columns
         
         # Verificar ranges (1-5)
@@ -114,19 +126,21 @@ class TestRFMAnalyzer:
         assert df['M_score'].between(1, 5).all()
         
         # Verificar tipos
-        assert df['R_score'].dtype == int
-        assert df['F_score'].dtype == int
-        assert df['M_score'].dtype == int
-        assert df['RFM_score'].dtype == object  # string
+        assert df['R_score'].dtype == np.int8
+        assert df['F_score'].dtype == np.int8
+        assert df['M_score'].dtype == np.int8
+        assert pd.api.types.is_integer_dtype(df['RFM_code'])  # código (ex: 545)
         assert pd.api.types.is_float_dtype(df['RFM_score_numeric'])
     
     def test_calculate_rfm_scores_string_format(self, analyzer, sample_rfm_df):
         """Testa formato do RFM_score como string"""
-        df = analyzer.calculate_rfm_scores(sample_rfm_df)
+        df = analyzer.calculate_rfm_scores(sample_rfm_df, with_labels=True)
         
         # RFM_score deve ser string de 3 dígitos
+        assert df['RFM_score'].dtype == object  # string
         assert df['RFM_score'].str.len().eq(3).all()
         assert df['RFM_score'].str.isnumeric().all()
+        assert (df['RFM_score'].astype(int) == df['RFM_code']).all()
     
     def test_calculate_rfm_scores_numeric_formula(self, analyzer):
         """Testa fórmula do RFM_score_numeric"""
@@ -1118,5 +1132,1091 @@ class TestRFMRegression:
         assert abs(df.loc[0, 'RFM_score_numeric'] - expected) < 0.01
 
 
+class TestQueryResultCache:
+    """Testes do cache local de resultados do BigQueryHelper"""
+
+    QUERY = "SELECT customer_id, SUM(payment_value) AS total FROM `project.dataset.payments` GROUP BY 1"
+
+    @pytest.fixture
+    def helper(self, tmp_path):
+        """Fixture: BigQueryHelper com cache local e client mockado"""
+        with patch('python.utils.bigquery_helper.bigquery.Client'):
+            helper = BigQueryHelper('project', 'dataset', cache_dir=str(tmp_path / 'cache'))
+        helper.client = Mock()
+
+        table = Mock()
+        table.modified = datetime(2025, 10, 1, 12, 0)
+        helper.client.get_table.return_value = table
+
+        job = Mock()
+        job.total_bytes_processed = 1024
+        job.to_dataframe.return_value = pd.DataFrame({'customer_id': ['c1', 'c2'], 'total': [10.0, 20.5]})
+        helper.client.query.return_value = job
+        return helper
+
+    def test_normalize_sql_ignores_layout_and_comments(self):
+        """Testa que espaços e comentários não mudam a chave"""
+        a = "SELECT  a,\n  b -- colunas\nFROM `p.d.t` /* tabela */ WHERE c = 'x  y';"
+        b = "select a, b FROM `p.d.t` WHERE c = 'x  y'"
+
+        assert normalize_sql(a) == "SELECT a, b FROM `p.d.t` WHERE c = 'x  y'"
+        assert QueryResultCache.make_key(a) != QueryResultCache.make_key(b)
+        assert QueryResultCache.make_key(a) == QueryResultCache.make_key(normalize_sql(a))
+
+    def test_referenced_tables(self):
+        """Testa a extração das tabelas qualificadas"""
+        query = "SELECT * FROM `p.d.orders` o JOIN `p.d.customers` c USING (id) JOIN `p.d.orders` x USING (id)"
+
+        assert referenced_tables(query) == ['p.d.customers', 'p.d.orders']
+
+    def test_second_query_served_from_cache(self, helper):
+        """Testa que a repetição da query não executa job"""
+        first = helper.query_to_dataframe(self.QUERY)
+        second = helper.query_to_dataframe(self.QUERY)
+
+        assert helper.client.query.call_count == 1
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_table_modification_invalidates(self, helper):
+        """Testa que uma carga nova na tabela invalida o resultado"""
+        helper.query_to_dataframe(self.QUERY)
+        helper.client.get_table.return_value.modified = datetime(2025, 10, 2, 12, 0)
+
+        helper.query_to_dataframe(self.QUERY)
+
+        assert helper.client.query.call_count == 2
+
+    def test_parameters_are_part_of_key(self, helper):
+        """Testa que parâmetros diferentes geram entradas diferentes"""
+        from google.cloud import bigquery
+
+        for value in ['2018-01-01', '2018-06-01', '2018-01-01']:
+            helper.query_to_dataframe(
+                self.QUERY,
+                query_parameters=[bigquery.ScalarQueryParameter('start', 'DATE', value)]
+            )
+
+        assert helper.client.query.call_count == 2
+
+    def test_use_cache_false_bypasses(self, helper):
+        """Testa que use_cache=False sempre executa a query"""
+        helper.query_to_dataframe(self.QUERY)
+        helper.query_to_dataframe(self.QUERY, use_cache=False)
+
+        assert helper.client.query.call_count == 2
+
+    def test_unknown_table_is_not_cached(self, helper):
+        """Testa que sem metadados da tabela o resultado não é armazenado"""
+        helper.client.get_table.side_effect = Exception("403 Forbidden")
+
+        helper.query_to_dataframe(self.QUERY)
+        helper.query_to_dataframe(self.QUERY)
+
+        assert helper.client.query.call_count == 2
+        assert not list(helper.result_cache.cache_dir.glob('*.parquet'))
+
+    @pytest.mark.parametrize('query', [
+        "SELECT COUNT(*) FROM orders",
+        "SELECT * FROM `project.dataset.orders` WHERE DATE(ts) = CURRENT_DATE()",
+        "SELECT * FROM `project.dataset.orders` WHERE RAND() < 0.1",
+        "SELECT * FROM `project.dataset.INFORMATION_SCHEMA.TABLES`",
+    ])
+    def test_unversionable_queries_are_not_cached(self, helper, query):
+        """Testa queries sem tabelas qualificadas ou não determinísticas"""
+        helper.query_to_dataframe(query)
+        helper.query_to_dataframe(query)
+
+        assert helper.client.query.call_count == 2
+        assert not list(helper.result_cache.cache_dir.glob('*.parquet'))
+
+    def test_view_is_not_cached(self, helper):
+        """Testa que views (modified da própria view) não vão para o cache"""
+        helper.client.get_table.return_value.table_type = 'VIEW'
+
+        helper.query_to_dataframe(self.QUERY)
+        helper.query_to_dataframe(self.QUERY)
+
+        assert helper.client.query.call_count == 2
+
+    def test_ttl_expiration(self, tmp_path):
+        """Testa a expiração por TTL"""
+        import os
+
+        cache = QueryResultCache(str(tmp_path), ttl_seconds=60)
+        cache.put('k', pd.DataFrame({'a': [1]}))
+        old = time.time() - 120
+        os.utime(tmp_path / 'k.parquet', (old, old))
+
+        assert cache.get('k') is None
+        assert not (tmp_path / 'k.parquet').exists()
+
+    def test_lru_eviction_keeps_recently_used(self, tmp_path):
+        """Testa a remoção LRU ao exceder o tamanho máximo"""
+        import os
+
+        df = pd.DataFrame({'a': np.arange(1000)})
+        probe = QueryResultCache(str(tmp_path / 'probe'))
+        probe.put('x', df)
+        size = (tmp_path / 'probe' / 'x.parquet').stat().st_size
+
+        cache = QueryResultCache(str(tmp_path / 'lru'), max_bytes=int(size * 2.5))
+        for i, key in enumerate(['a', 'b']):
+            cache.put(key, df)
+            os.utime(cache.cache_dir / f'{key}.parquet', (1000 + i, time.time()))
+
+        cache.get('a')
+        cache.put('c', df)
+
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+        assert cache.get('c') is not None
+
+
+class TestBigQueryResultsDownload:
+    """Testes do download via Storage Read API com fallback REST"""
+
+    @pytest.fixture(autouse=True)
+    def reset_option(self, monkeypatch):
+        """Fixture: isola a configuração global entre testes"""
+        monkeypatch.delenv('BQ_STORAGE_API', raising=False)
+        set_storage_api(None)
+        yield
+        set_storage_api(None)
+
+    @pytest.fixture
+    def job(self):
+        """Fixture: query job mockado"""
+        job = Mock()
+        job.to_dataframe.return_value = pd.DataFrame({'a': [1, 2]})
+        return job
+
+    def test_default_keeps_library_behaviour(self, job):
+        """Testa que sem configuração a chamada não muda"""
+        results_to_dataframe(job)
+
+        job.to_dataframe.assert_called_once_with()
+
+    def test_env_enables_storage_api(self, job, monkeypatch):
+        """Testa BQ_STORAGE_API=true com client compartilhado"""
+        monkeypatch.setenv('BQ_STORAGE_API', 'true')
+        storage_client = Mock()
+
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=storage_client):
+            df = results_to_dataframe(job)
+
+        job.to_dataframe.assert_called_once_with(bqstorage_client=storage_client)
+        assert len(df) == 2
+
+    def test_falls_back_to_rest_on_error(self, job):
+        """Testa o fallback para REST quando a Storage API falha"""
+        set_storage_api(True)
+        job.to_dataframe.side_effect = [Exception("403 readsessions.create"), pd.DataFrame({'a': [1]})]
+
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=Mock()):
+            df = results_to_dataframe(job)
+
+        assert len(df) == 1
+        assert job.to_dataframe.call_args == call(max_results=None, create_bqstorage_client=False)
+
+    def test_falls_back_when_package_missing(self, job):
+        """Testa o fallback quando google-cloud-bigquery-storage não existe"""
+        set_storage_api(True)
+
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=None):
+            results_to_dataframe(job)
+
+        job.to_dataframe.assert_called_once_with(max_results=None, create_bqstorage_client=False)
+
+    def test_disabled_and_max_results_use_rest(self, job):
+        """Testa que REST é usado se desligado ou com limite de linhas"""
+        set_storage_api(False)
+        results_to_dataframe(job)
+        set_storage_api(True)
+        results_to_dataframe(job, max_results=10)
+
+        assert job.to_dataframe.call_args_list == [
+            call(max_results=None, create_bqstorage_client=False),
+            call(max_results=10, create_bqstorage_client=False),
+        ]
+
+    def test_analyzers_use_shared_option(self):
+        """Testa que as classes de analytics respeitam a opção global"""
+        set_storage_api(True)
+        storage_client = Mock()
+
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            analyzer = RFMAnalyzer('project', 'dataset')
+        analyzer.client = Mock()
+        analyzer.client.query.return_value.to_dataframe.return_value = pd.DataFrame({'customer_unique_id': ['u1']})
+
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=storage_client):
+            analyzer.extract_rfm_data(reference_date='2018-08-01')
+
+        analyzer.client.query.return_value.to_dataframe.assert_called_once_with(bqstorage_client=storage_client)
+
+
+class TestBigQueryHelperStreaming:
+    """Testes da leitura de resultados em blocos (iter_query_batches)"""
+    
+    @pytest.fixture(autouse=True)
+    def reset_option(self, monkeypatch):
+        """Fixture: isola a configuração global entre testes"""
+        monkeypatch.delenv('BQ_STORAGE_API', raising=False)
+        set_storage_api(None)
+        yield
+        set_storage_api(None)
+    
+    @pytest.fixture
+    def helper(self):
+        """Fixture: helper com client mockado"""
+        with patch('python.utils.bigquery_helper.bigquery.Client'):
+            helper = BigQueryHelper('project', 'dataset')
+        helper.client = Mock()
+        return helper
+    
+    @staticmethod
+    def paged_rows(pages, columns=('a', 'b')):
+        """RowIterator mockado com uma página por DataFrame"""
+        rows = Mock()
+        rows.to_dataframe_iterable.side_effect = lambda bqstorage_client=None: iter(pages)
+        rows.schema = [Mock() for _ in columns]
+        for field, name in zip(rows.schema, columns):
+            field.name = name
+        return rows
+    
+    def test_iter_query_batches_yields_pages(self, helper):
+        """Testa que cada página é produzida separadamente"""
+        pages = [pd.DataFrame({'a': [1, 2]}), pd.DataFrame({'a': [3]})]
+        helper.client.query.return_value.result.return_value = self.paged_rows(pages)
+        
+        batches = list(helper.iter_query_batches("SELECT a FROM t", page_size=2))
+        
+        assert [len(b) for b in batches] == [2, 1]
+        helper.client.query.return_value.result.assert_called_once_with(page_size=2, max_results=None)
+    
+    def test_iter_query_batches_arrow(self, helper):
+        """Testa o modo Arrow com a Storage API ligada"""
+        set_storage_api(True)
+        storage_client = Mock()
+        rows = Mock()
+        rows.to_arrow_iterable.return_value = iter(['batch'])
+        helper.client.query.return_value.result.return_value = rows
+        
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=storage_client):
+            batches = list(helper.iter_query_batches("SELECT 1", as_arrow=True))
+        
+        assert batches == ['batch']
+        rows.to_arrow_iterable.assert_called_once_with(bqstorage_client=storage_client)
+    
+    def test_iter_result_batches_rest_by_default(self):
+        """Testa que sem configuração nenhum client da Storage API é criado"""
+        rows = self.paged_rows([pd.DataFrame({'a': [1]})])
+        
+        with patch('python.utils.bigquery_results.get_storage_client') as get_client:
+            list(iter_result_batches(rows))
+        
+        get_client.assert_not_called()
+    
+    def test_iter_result_batches_falls_back_to_rest(self):
+        """Testa o fallback REST quando a sessão da Storage API falha"""
+        def storage_pages():
+            raise PermissionError("403 readsessions.create")
+            yield
+        
+        rows = Mock()
+        rows.to_dataframe_iterable.side_effect = [storage_pages(), iter([pd.DataFrame({'a': [1]})])]
+        
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=Mock()):
+            batches = list(iter_result_batches(rows, use_storage_api=True))
+        
+        assert len(batches) == 1
+        assert rows.to_dataframe_iterable.call_args_list[-1] == call(bqstorage_client=None)
+    
+    def test_iter_result_batches_error_after_first_batch_propagates(self):
+        """Testa que falhas no meio do download não duplicam blocos"""
+        def storage_pages():
+            yield pd.DataFrame({'a': [1]})
+            raise RuntimeError("stream interrompido")
+        
+        rows = Mock()
+        rows.to_dataframe_iterable.return_value = storage_pages()
+        
+        with patch('python.utils.bigquery_results.get_storage_client', return_value=Mock()):
+            with pytest.raises(RuntimeError):
+                list(iter_result_batches(rows, use_storage_api=True))
+        
+        rows.to_dataframe_iterable.assert_called_once()
+    
+    def test_export_table_to_csv_streams_pages(self, helper, tmp_path):
+        """Testa que o CSV recebe todas as páginas com um único header"""
+        pages = [
+            pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}),
+            pd.DataFrame({'a': [3], 'b': ['z']}),
+        ]
+        helper.client.query.return_value.result.return_value = self.paged_rows(pages)
+        output = tmp_path / 'out' / 'table.csv'
+        
+        path = helper.export_table_to_csv('orders', str(output), max_rows=3)
+        
+        df = pd.read_csv(path)
+        assert df['a'].tolist() == [1, 2, 3]
+        assert output.read_text().count('a,b') == 1
+        query = helper.client.query.call_args[0][0]
+        assert query == "SELECT * FROM `project.dataset.orders` LIMIT 3"
+        helper.client.query.return_value.result.assert_called_once_with(
+            page_size=50_000, max_results=3
+        )
+    
+    def test_export_table_to_csv_empty_result(self, helper, tmp_path):
+        """Testa que um resultado vazio ainda gera o header"""
+        helper.client.query.return_value.result.return_value = self.paged_rows([])
+        output = tmp_path / 'empty.csv'
+        
+        helper.export_table_to_csv('orders', str(output))
+        
+        assert output.read_text().strip() == 'a,b'
+    
+    def test_export_table_to_csv_empty_first_page(self, helper, tmp_path):
+        """Testa que uma primeira página vazia não duplica o header"""
+        pages = [
+            pd.DataFrame({'a': pd.Series([], dtype=int), 'b': pd.Series([], dtype=str)}),
+            pd.DataFrame({'a': [1], 'b': ['x']}),
+        ]
+        helper.client.query.return_value.result.return_value = self.paged_rows(pages)
+        output = tmp_path / 'table.csv'
+        
+        helper.export_table_to_csv('orders', str(output))
+        
+        assert output.read_text().splitlines() == ['a,b', '1,x']
+
+
+class TestBigQueryHelperExport:
+    """Testes do export em shards comprimidos (export_table)"""
+    
+    @pytest.fixture
+    def helper(self):
+        """Fixture: helper com list_rows produzindo 2.500 linhas em páginas"""
+        import pyarrow as pa
+        
+        with patch('python.utils.bigquery_helper.bigquery.Client'):
+            helper = BigQueryHelper('project', 'dataset')
+        helper.client = Mock()
+        
+        values = np.arange(2500)
+        batches = [
+            pa.RecordBatch.from_pydict({'id': values[i:i + 700], 'city': ['sp'] * len(values[i:i + 700])})
+            for i in range(0, 2500, 700)
+        ]
+        rows = Mock()
+        rows.to_arrow_iterable.return_value = iter(batches)
+        rows.schema = [Mock(), Mock()]
+        rows.schema[0].name, rows.schema[1].name = 'id', 'city'
+        helper.client.list_rows.return_value = rows
+        return helper
+    
+    def test_parquet_shards_and_manifest(self, helper, tmp_path):
+        """Testa shards Parquet, contagens e manifesto"""
+        manifest = helper.export_table('orders', str(tmp_path), rows_per_shard=1000, max_workers=2)
+        
+        assert [s['rows'] for s in manifest['shards']] == [1000, 1000, 500]
+        assert manifest['total_rows'] == 2500
+        assert manifest['columns'] == ['id', 'city']
+        
+        df = pd.concat(pd.read_parquet(tmp_path / s['file']) for s in manifest['shards'])
+        assert df['id'].tolist() == list(range(2500))
+        
+        on_disk = json.loads((tmp_path / 'manifest.json').read_text())
+        assert on_disk['shards'] == manifest['shards']
+    
+    def test_csv_gzip_shards(self, helper, tmp_path):
+        """Testa shards CSV comprimidos com gzip"""
+        manifest = helper.export_table('orders', str(tmp_path), file_format='csv', rows_per_shard=2000)
+        
+        assert [s['file'] for s in manifest['shards']] == ['orders-00000.csv.gz', 'orders-00001.csv.gz']
+        with gzip.open(tmp_path / 'orders-00001.csv.gz', 'rt') as f:
+            df = pd.read_csv(f)
+        assert len(df) == 500
+        assert df['id'].iloc[0] == 2000
+    
+    def test_export_does_not_run_query(self, helper, tmp_path):
+        """Testa que o export lê a tabela sem job de query (sem custo)"""
+        helper.export_table('orders', str(tmp_path))
+        
+        helper.client.query.assert_not_called()
+        assert helper.client.list_rows.call_args[0][0] == 'project.dataset.orders'
+    
+    def test_invalid_format(self, helper, tmp_path):
+        """Testa formato não suportado"""
+        with pytest.raises(ValueError):
+            helper.export_table('orders', str(tmp_path), file_format='avro')
+
+
+class TestSQLDagRunner:
+    """Testes da execução paralela de SQL por dependências"""
+    
+    @pytest.fixture
+    def helper(self):
+        """Fixture: helper com execute_query mockado"""
+        with patch('python.utils.bigquery_helper.bigquery.Client'):
+            helper = BigQueryHelper('project', 'dataset')
+        helper.execute_query = Mock()
+        return helper
+    
+    @pytest.fixture
+    def sql_dir(self, tmp_path):
+        """Fixture: dois staging independentes e um mart que depende de ambos"""
+        ref = "`${GCP_PROJECT_ID}.${GCP_DATASET_ID}.%s`"
+        (tmp_path / 'a_mart.sql').write_text(
+            f"-- Mart\nCREATE OR REPLACE TABLE {ref % 'mart'} AS\n"
+            f"SELECT * FROM {ref % 'stg_a'} JOIN {ref % 'stg_b'} USING (id);\n"
+            f"SELECT COUNT(*) FROM {ref % 'mart'};\n"
+        )
+        (tmp_path / 'b_stg_a.sql').write_text(
+            f"CREATE OR REPLACE TABLE {ref % 'stg_a'} AS SELECT * FROM {ref % 'orders'};\n"
+        )
+        (tmp_path / 'c_stg_b.sql').write_text(
+            f"/* staging b */\nCREATE OR REPLACE TABLE {ref % 'stg_b'} AS SELECT * FROM {ref % 'customers'};\n"
+        )
+        return tmp_path
+    
+    def test_build_graph_dependencies(self, helper, sql_dir):
+        """Testa arestas entre arquivos, independentemente da ordem alfabética"""
+        nodes = SQLDagRunner(helper).build_graph(str(sql_dir))
+        
+        by_table = {n.writes.split('.')[-1]: n for n in nodes.values() if n.writes}
+        assert by_table['stg_a'].deps == set()
+        assert by_table['stg_b'].deps == set()
+        assert by_table['mart'].deps == {by_table['stg_a'].node_id, by_table['stg_b'].node_id}
+        
+        check = next(n for n in nodes.values() if n.writes is None)
+        assert check.deps == {by_table['mart'].node_id}
+    
+    def test_statements_with_leading_comments_are_kept(self, helper, sql_dir):
+        """Testa que comentários no início não descartam o statement"""
+        nodes = SQLDagRunner(helper).build_graph(str(sql_dir))
+        
+        assert len(nodes) == 4
+    
+    def test_independent_nodes_run_concurrently(self, helper, sql_dir):
+        """Testa que o tempo total segue o caminho crítico"""
+        order = []
+        
+        def slow_query(sql):
+            time.sleep(0.2)
+            order.append(referenced_tables(sql)[0].split('.')[-1])
+        
+        helper.execute_query.side_effect = slow_query
+        
+        report = helper.run_sql_tree(str(sql_dir), max_workers=4)
+        
+        assert set(order[:2]) == {'customers', 'orders'}
+        assert report['wall_seconds'] < report['serial_seconds'] - 0.15
+        assert len(report['critical_path']) == 3
+        assert all(n['status'] == 'success' for n in report['nodes'].values())
+    
+    def test_fail_fast_skips_remaining(self, helper, sql_dir):
+        """Testa que um erro interrompe o agendamento e é propagado"""
+        helper.execute_query.side_effect = RuntimeError("falha no staging")
+        runner = SQLDagRunner(helper)
+        runner.build_graph(str(sql_dir))
+        
+        with pytest.raises(RuntimeError):
+            runner.run(max_workers=1)
+        
+        assert helper.execute_query.call_count == 1
+    
+    def test_circular_dependency(self, helper, tmp_path):
+        """Testa a detecção de dependência circular entre arquivos"""
+        ref = "`project.dataset.%s`"
+        (tmp_path / 'x.sql').write_text(f"CREATE TABLE {ref % 'x'} AS SELECT * FROM {ref % 'y'};")
+        (tmp_path / 'y.sql').write_text(f"CREATE TABLE {ref % 'y'} AS SELECT * FROM {ref % 'x'};")
+        
+        with pytest.raises(ValueError, match="circular"):
+            SQLDagRunner(helper).build_graph(str(tmp_path))
+    
+    def test_unqualified_tables_resolve_to_default_dataset(self, helper, tmp_path):
+        """Testa nomes sem projeto/dataset: o leitor depende do produtor"""
+        (tmp_path / 'a_report.sql').write_text(
+            "WITH base AS (SELECT * FROM stg_orders WHERE EXTRACT(YEAR FROM order_date) = 2018)\n"
+            "SELECT * FROM base JOIN dataset.customers USING (customer_id);"
+        )
+        (tmp_path / 'b_stg.sql').write_text("CREATE OR REPLACE TABLE stg_orders AS SELECT * FROM orders;")
+        
+        nodes = SQLDagRunner(helper).build_graph(str(tmp_path))
+        report = nodes[f"{(tmp_path / 'a_report.sql').as_posix()}#1"]
+        stg = nodes[f"{(tmp_path / 'b_stg.sql').as_posix()}#1"]
+        
+        assert stg.writes == 'project.dataset.stg_orders'
+        assert report.reads == {'project.dataset.stg_orders', 'project.dataset.customers'}
+        assert report.deps == {stg.node_id}
+    
+    def test_rebuild_reads_previous_version(self):
+        """Testa leitura explícita da própria tabela (sem heurística de contagem)"""
+        create = SQLDagRunner.parse_statement('f#1', 'f', "CREATE TABLE `p.d.t` AS SELECT * FROM `p.d.src`")
+        rebuild = SQLDagRunner.parse_statement('f#2', 'f', "CREATE OR REPLACE TABLE `p.d.t` PARTITION BY d AS SELECT * FROM `p.d.t`")
+        
+        assert create.reads == {'p.d.src'}
+        assert rebuild.reads == {'p.d.t'}
+    
+    def test_statement_without_resolvable_tables_fails(self):
+        """Testa erro para statements sem tabelas identificáveis"""
+        with pytest.raises(ValueError, match="sem projeto/dataset"):
+            SQLDagRunner.parse_statement('f#1', 'f', "SELECT * FROM orders")
+        with pytest.raises(ValueError, match="nenhuma tabela"):
+            SQLDagRunner.parse_statement('f#1', 'f', "SELECT 1", 'project.dataset')
+
+
+class TestSQLParser:
+    """Testes da divisão de arquivos SQL em statements"""
+    
+    def test_leading_comments_keep_statement(self):
+        """Testa que comentários no início não descartam o statement"""
+        statements = split_statements("-- cabeçalho\n/* bloco */\nSELECT 1;\n-- só comentário;\n")
+        
+        assert len(statements) == 1
+        assert statements[0].endswith('SELECT 1')
+    
+    def test_semicolons_inside_strings_and_comments(self):
+        """Testa ';' em strings, crases e comentários"""
+        sql = (
+            "SELECT 'a;b', \"c;d\", '''e\n;f''' FROM `p.d.t;x` -- fim;\n"
+            "WHERE x = 'it\\'s;'; /* ; */ SELECT 2"
+        )
+        
+        statements = split_statements(sql)
+        
+        assert len(statements) == 2
+        assert "'it\\'s;'" in statements[0]
+        assert statements[1].endswith('SELECT 2')
+    
+    def test_repo_files_split_on_every_statement(self):
+        """Testa os arquivos do projeto (1 statement por ';')"""
+        sql_file = Path(__file__).resolve().parents[1] / 'sql' / '02_transformations' / 'staging_orders.sql'
+        
+        statements = load_statements(sql_file)
+        
+        assert len(statements) == 3
+        assert 'CREATE OR REPLACE TABLE' in statements[0]
+    
+    def test_cache_by_file_hash(self, tmp_path):
+        """Testa que arquivos inalterados não são tokenizados de novo"""
+        clear_statement_cache()
+        sql_file = tmp_path / 'q.sql'
+        sql_file.write_text("SELECT 1; SELECT 2;")
+        
+        with patch('python.utils.sql_parser.split_statements', wraps=split_statements) as spy:
+            load_statements(sql_file)
+            load_statements(sql_file)
+            assert spy.call_count == 1
+            
+            sql_file.write_text("SELECT 1; SELECT 2; SELECT 3;")
+            assert len(load_statements(sql_file)) == 3
+            assert spy.call_count == 2
+    
+    def test_run_sql_file_renders_variables(self, tmp_path):
+        """Testa run_sql_file com variáveis e comentário inicial"""
+        with patch('python.utils.bigquery_helper.bigquery.Client'):
+            helper = BigQueryHelper('project', 'dataset')
+        helper.execute_query = Mock()
+        sql_file = tmp_path / 'q.sql'
+        sql_file.write_text("-- staging\nSELECT * FROM `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.t` WHERE d > '${START}';")
+        
+        helper.run_sql_file(str(sql_file), replace_vars={'START': '2018-01-01'})
+        
+        executed = helper.execute_query.call_args[0][0]
+        assert '`project.dataset.t`' in executed
+        assert "'2018-01-01'" in executed
+
+
+class TestQueryTemplates:
+    """Testes das queries parametrizadas das análises"""
+    
+    @pytest.fixture
+    def analyzer(self):
+        """Fixture: RFMAnalyzer com client mockado"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            analyzer = RFMAnalyzer('project', 'dataset')
+        analyzer.client = Mock()
+        analyzer.client.query.return_value.to_dataframe.return_value = pd.DataFrame({'customer_unique_id': ['u1']})
+        return analyzer
+    
+    def test_sql_text_is_stable_across_dates(self, analyzer):
+        """Testa que datas diferentes geram o mesmo SQL e parâmetros diferentes"""
+        analyzer.extract_rfm_data(reference_date='2018-08-01')
+        analyzer.extract_rfm_data(reference_date='2018-09-01')
+        
+        (first_sql,), first_kwargs = analyzer.client.query.call_args_list[0]
+        (second_sql,), second_kwargs = analyzer.client.query.call_args_list[1]
+        
+        assert first_sql == second_sql
+        assert '2018' not in first_sql
+        assert '`project.dataset.orders`' in first_sql
+        
+        params = {p.name: p.value for p in second_kwargs['job_config'].query_parameters}
+        assert params == {'reference_date': pd.Timestamp('2018-09-01', tz='UTC'), 'order_status': 'delivered'}
+    
+    def test_render_is_memoized(self):
+        """Testa que o template é renderizado uma vez por projeto/dataset"""
+        render_template.cache_clear()
+        template = QueryTemplate("SELECT * FROM `${GCP_PROJECT_ID}.${GCP_DATASET_ID}.t` WHERE d = @d", {'d': 'DATE'})
+        
+        for _ in range(3):
+            template.render('project', 'dataset')
+        
+        info = render_template.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
+    
+    def test_parameter_types_and_nulls(self):
+        """Testa conversão de tipos e parâmetros NULL"""
+        template = QueryTemplate("SELECT @d, @ts, @s", {'d': 'DATE', 'ts': 'TIMESTAMP', 's': 'STRING'})
+        
+        params = template.query_parameters(d='2018-01-31', ts=pd.Timestamp('2018-01-31 10:00'))
+        
+        values = {p.name: (p.type_, p.value) for p in params}
+        assert values['d'] == ('DATE', datetime(2018, 1, 31).date())
+        assert values['ts'] == ('TIMESTAMP', datetime(2018, 1, 31, 10))
+        assert values['s'] == ('STRING', None)
+    
+    def test_unknown_parameter(self):
+        """Testa erro para parâmetro não declarado"""
+        template = QueryTemplate("SELECT @d", {'d': 'DATE'})
+        
+        with pytest.raises(ValueError):
+            template.job_config(x=1)
+    
+    def test_cohort_query_uses_parameters(self):
+        """Testa o filtro de período do cohort via parâmetros"""
+        from python.analytics.cohort_analysis import CohortAnalyzer
+        
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            cohort = CohortAnalyzer('project', 'dataset')
+        cohort.client = Mock()
+        cohort.client.query.return_value.to_dataframe.return_value = pd.DataFrame({
+            'cohort_month': [pd.Timestamp('2018-01-01')]
+        })
+        
+        cohort.extract_cohort_data(start_date='2018-01-01')
+        
+        (sql,), kwargs = cohort.client.query.call_args
+        params = {p.name: p.value for p in kwargs['job_config'].query_parameters}
+        assert '@start_date IS NULL' in sql
+        assert params['start_date'] == pd.Timestamp('2018-01-01', tz='UTC')
+        assert params['end_date'] is None
+
+
+class TestBigQueryClients:
+    """Testes do registro de clients BigQuery compartilhados"""
+    
+    def test_same_client_for_same_project(self):
+        """Testa que as classes do projeto compartilham um único client"""
+        from python.analytics.cohort_analysis import CohortAnalyzer
+        
+        with patch('python.utils.bigquery_clients.bigquery.Client', side_effect=lambda **kwargs: Mock()) as client_cls:
+            helper = BigQueryHelper('project', 'dataset')
+            rfm = RFMAnalyzer('project', 'dataset')
+            cohort = CohortAnalyzer('project', 'dataset')
+            other = get_client('other-project')
+        
+        assert helper.client is rfm.client is cohort.client
+        assert other is not helper.client
+        assert client_cls.call_count == 2
+    
+    def test_http_pool_is_tuned(self, monkeypatch):
+        """Testa o pool de conexões HTTP (BQ_HTTP_POOL_SIZE) via _http"""
+        monkeypatch.setenv('BQ_HTTP_POOL_SIZE', '64')
+        credentials = Mock()
+        
+        with patch('google.auth.default', return_value=(credentials, 'project')), \
+                patch('python.utils.bigquery_clients.bigquery.Client') as client_cls:
+            get_client('project')
+        
+        kwargs = client_cls.call_args[1]
+        assert kwargs['credentials'] is credentials
+        assert kwargs['_http'].get_adapter('https://bigquery.googleapis.com')._pool_maxsize == 64
+    
+    def test_without_default_credentials_client_discovers_its_own(self):
+        """Testa o client sem sessão própria quando não há credenciais padrão"""
+        with patch('python.utils.bigquery_clients.bigquery.Client') as client_cls:
+            get_client('project')
+        
+        client_cls.assert_called_once_with(project='project')
+    
+    def test_creation_error_is_not_cached(self):
+        """Testa que falhas de credenciais não ficam no registro"""
+        with patch('python.utils.bigquery_clients.bigquery.Client') as client_cls:
+            client_cls.side_effect = [Exception("Connection failed"), Mock()]
+            
+            with pytest.raises(Exception, match="Connection failed"):
+                get_client('project')
+            
+            assert get_client('project') is not None
+    
+    def test_clear_clients_closes_sessions(self):
+        """Testa que clear_clients fecha as sessões abertas"""
+        with patch('python.utils.bigquery_clients.bigquery.Client', side_effect=lambda **kwargs: Mock()):
+            client = get_client('project')
+            clear_clients()
+            
+            assert get_client('project') is not client
+        
+        client.close.assert_called_once()
+
+
+def reference_segment(r, f, m):
+    """Cadeia if/elif original de segment_customers (referência de regressão)"""
+    if r >= 4 and f >= 4 and m >= 4:
+        return 'Champions'
+    elif f >= 4:
+        return 'Loyal Customers'
+    elif r >= 4 and f >= 2 and m >= 2:
+        return 'Potential Loyalist'
+    elif r >= 4 and f == 1:
+        return 'New Customers'
+    elif r >= 3 and f == 1 and m >= 2:
+        return 'Promising'
+    elif r >= 2 and f >= 2 and m >= 2:
+        return 'Need Attention'
+    elif r >= 2 and f <= 2 and m <= 2:
+        return 'About To Sleep'
+    elif r <= 2 and f >= 3 and m >= 3:
+        return 'At Risk'
+    elif r <= 2 and f >= 4 and m >= 4:
+        return 'Cannot Lose Them'
+    elif r <= 2 and f <= 2 and m <= 2:
+        return 'Hibernating'
+    elif r == 1:
+        return 'Lost'
+    else:
+        return 'Others'
+
+
+REFERENCE_PRIORITY = {
+    'Champions': 1, 'Loyal Customers': 2, 'Cannot Lose Them': 1, 'At Risk': 2,
+    'Potential Loyalist': 3, 'Need Attention': 3, 'Promising': 4, 'New Customers': 4,
+    'About To Sleep': 3, 'Hibernating': 5, 'Lost': 6, 'Others': 5
+}
+
+
+class TestRFMSegmentLookup:
+    """Testes da segmentação vetorizada (tabela R x F x M)"""
+    
+    @pytest.fixture
+    def analyzer(self):
+        """Fixture: RFMAnalyzer com client mockado"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            return RFMAnalyzer('project', 'dataset')
+    
+    def test_lookup_matches_rule_chain(self, analyzer):
+        """Testa que a tabela reproduz a primeira regra que casa em todas as combinações"""
+        combos = pd.DataFrame(
+            [(r, f, m) for r in range(1, 6) for f in range(1, 6) for m in range(1, 6)],
+            columns=['R_score', 'F_score', 'M_score']
+        )
+        
+        df = analyzer.segment_customers(combos)
+        
+        expected = [reference_segment(r, f, m) for r, f, m in combos.to_numpy()]
+        assert df['segment'].tolist() == expected
+        assert df['priority'].tolist() == [REFERENCE_PRIORITY[s] for s in expected]
+    
+    def test_large_frame(self, analyzer):
+        """Testa segmentação de muitos clientes sem apply por linha"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'R_score': rng.integers(1, 6, 200_000),
+            'F_score': rng.integers(1, 6, 200_000),
+            'M_score': rng.integers(1, 6, 200_000),
+        })
+        
+        start = time.perf_counter()
+        result = analyzer.segment_customers(df)
+        elapsed = time.perf_counter() - start
+        
+        sample = result.sample(500, random_state=0)
+        assert all(
+            row.segment == reference_segment(row.R_score, row.F_score, row.M_score)
+            for row in sample.itertuples()
+        )
+        assert elapsed < 2
+    
+    def test_scores_above_five(self, analyzer):
+        """Testa tabela maior quando n_quantiles > 5"""
+        df = pd.DataFrame({'R_score': [10, 1], 'F_score': [8, 1], 'M_score': [7, 1]})
+        
+        result = analyzer.segment_customers(df)
+        
+        assert result['segment'].tolist() == ['Champions', 'Hibernating']
+    
+    def test_empty_frame(self, analyzer):
+        """Testa DataFrame vazio"""
+        df = pd.DataFrame({'R_score': [], 'F_score': [], 'M_score': []}, dtype=int)
+        
+        result = analyzer.segment_customers(df)
+        
+        assert len(result) == 0
+        assert 'segment' in result.columns
+
+
+class TestSegmentRules:
+    """Testes do motor declarativo de regras de segmentação"""
+    
+    @pytest.fixture
+    def variant_file(self, tmp_path):
+        """Fixture: arquivo JSON com uma variante de regras"""
+        path = tmp_path / 'segments.json'
+        path.write_text(json.dumps({
+            'variant_b': {
+                'scale': 5,
+                'fallback': 'Regular',
+                'rules': [
+                    {'segment': 'VIP', 'when': {'M': ['>=', 5]}},
+                    {'segment': 'Active', 'when': {'R': ['>=', 3]}},
+                ],
+                'priority': {'VIP': 1, 'Active': 2, 'Regular': 3},
+            }
+        }))
+        return path
+    
+    def test_first_match_order(self):
+        """Testa que a primeira regra que casa vence"""
+        rule_set = SegmentRuleSet('t', [
+            {'segment': 'A', 'when': {'R': ['>=', 3]}},
+            {'segment': 'B', 'when': {'R': ['>=', 1]}},
+        ], priority={'A': 1, 'B': 2}, fallback='C')
+        
+        assert rule_set.segment_for(5, 1, 1) == 'A'
+        assert rule_set.segment_for(2, 1, 1) == 'B'
+    
+    def test_compile_other_quantiles(self):
+        """Testa a conversão de escala para n_quantiles != 5"""
+        rule_set = load_segment_rules()['default']
+        
+        cube = rule_set.compile(10)
+        
+        assert cube.shape == (11, 11, 11)
+        assert rule_set.segment_for(10, 10, 10, n_quantiles=10) == 'Champions'
+        assert rule_set.segment_for(1, 1, 1, n_quantiles=3) == 'Hibernating'
+        assert rule_set.segment_for(3, 3, 3, n_quantiles=3) == 'Champions'
+    
+    def test_rescaling_is_logged_once(self):
+        """Testa o aviso da conversão de escala (uma vez por n_quantiles)"""
+        rule_set = load_segment_rules()['default']
+        
+        with patch('python.analytics.segment_rules.logger') as mock_logger:
+            rule_set.compile(5)
+            rule_set.compile(3)
+            rule_set.compile(3)
+        
+        assert mock_logger.warning.call_count == 1
+        assert 'scale=3' in mock_logger.warning.call_args[0][0]
+    
+    def test_multiple_rule_sets_in_one_pass(self, variant_file):
+        """Testa variantes lado a lado (colunas segment_<nome>)"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            analyzer = RFMAnalyzer('project', 'dataset', segment_rules=str(variant_file))
+        df = pd.DataFrame({'R_score': [5, 3, 1], 'F_score': [5, 1, 1], 'M_score': [5, 2, 1]})
+        
+        result = analyzer.segment_customers(df, rule_sets=['default', 'variant_b'])
+        
+        assert result['segment'].tolist() == ['Champions', 'Promising', 'Hibernating']
+        assert result['segment_variant_b'].tolist() == ['VIP', 'Active', 'Regular']
+        assert result['priority_variant_b'].tolist() == [1, 2, 3]
+    
+    def test_assign_segments_matches_single_sets(self, variant_file):
+        """Testa que a passada única equivale a avaliar cada conjunto"""
+        rule_sets = load_segment_rules(variant_file)
+        rng = np.random.default_rng(1)
+        r, f, m = (rng.integers(1, 6, 1000) for _ in range(3))
+        
+        both = assign_segments(r, f, m, [rule_sets['default'], rule_sets['variant_b']])
+        
+        for rule_set, (segments, _) in zip(rule_sets.values(), both):
+            expected = [rule_set.segment_for(*scores) for scores in zip(r, f, m)]
+            assert segments.tolist() == expected
+    
+    def test_invalid_rules(self, tmp_path):
+        """Testa regras inválidas e conjunto inexistente"""
+        with pytest.raises(ValueError):
+            SegmentRuleSet('t', [{'segment': 'A', 'when': {'X': ['>=', 1]}}], priority={})
+        with pytest.raises(ValueError):
+            SegmentRuleSet('t', [{'segment': 'A', 'when': {'R': ['~', 1]}}], priority={})
+        
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            analyzer = RFMAnalyzer('project', 'dataset')
+        with pytest.raises(ValueError):
+            analyzer.segment_customers(pd.DataFrame({'R_score': [1], 'F_score': [1], 'M_score': [1]}), rule_sets=['nope'])
+
+
+class TestRFMIntegerScoring:
+    """Testes do cálculo de scores com limites de quantis e searchsorted"""
+    
+    @pytest.fixture
+    def analyzer(self):
+        """Fixture: RFMAnalyzer com client mockado"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            return RFMAnalyzer('project', 'dataset')
+    
+    def test_matches_qcut_on_distinct_values(self, analyzer):
+        """Testa equivalência com pd.qcut quando não há limites repetidos"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'recency': rng.permutation(1000),
+            'frequency': rng.random(1000),
+            'monetary': rng.lognormal(5, 1, 1000),
+        })
+        
+        result = analyzer.calculate_rfm_scores(df)
+        
+        assert (result['R_score'] == pd.qcut(df['recency'], 5, labels=[5, 4, 3, 2, 1]).astype(int)).all()
+        assert (result['F_score'] == pd.qcut(df['frequency'], 5, labels=[1, 2, 3, 4, 5]).astype(int)).all()
+        assert (result['M_score'] == pd.qcut(df['monetary'], 5, labels=[1, 2, 3, 4, 5]).astype(int)).all()
+    
+    def test_repeated_values(self, analyzer):
+        """Testa frequência concentrada em 1 (limites repetidos)"""
+        df = pd.DataFrame({
+            'recency': np.arange(100),
+            'frequency': [1] * 95 + [2, 2, 3, 4, 6],
+            'monetary': np.linspace(10, 1000, 100),
+        })
+        
+        result = analyzer.calculate_rfm_scores(df)
+        
+        assert (result.loc[df['frequency'] == 1, 'F_score'] == 1).all()
+        assert result['F_score'].iloc[-1] == 5
+    
+    def test_input_not_modified(self, analyzer):
+        """Testa que o DataFrame original não recebe colunas"""
+        df = pd.DataFrame({
+            'customer_unique_id': ['u1', 'u2', 'u3', 'u4', 'u5', 'u6'],
+            'recency': [10, 30, 90, 180, 365, 500],
+            'frequency': [5, 3, 2, 1, 1, 1],
+            'monetary': [1000.0, 500.0, 200.0, 100.0, 50.0, 30.0],
+        })
+        columns = list(df.columns)
+        
+        analyzer.calculate_rfm_scores(df)
+        
+        assert list(df.columns) == columns
+    
+    def test_rfm_score_labels_only_on_export(self, analyzer):
+        """Testa que o RFM_score em texto é gerado só no CSV exportado"""
+        analyzer.client.query.return_value.to_dataframe.return_value = pd.DataFrame({
+            'customer_unique_id': ['u1', 'u2', 'u3', 'u4', 'u5', 'u6'],
+            'recency': [10, 30, 90, 180, 365, 500],
+            'frequency': [5, 3, 2, 1, 1, 1],
+            'monetary': [1000.0, 500.0, 200.0, 100.0, 50.0, 30.0],
+            'avg_order_value': [200.0, 166.67, 100.0, 100.0, 50.0, 30.0],
+        })
+        
+        with patch('pandas.DataFrame.to_csv', autospec=True) as mock_csv:
+            rfm_data, _ = analyzer.run_full_analysis(reference_date='2018-10-01', save_results=True)
+        
+        exported = mock_csv.call_args_list[0][0][0]
+        assert 'RFM_score' not in rfm_data.columns
+        assert (exported['RFM_score'] == analyzer.rfm_score_labels(rfm_data)).all()
+        assert exported['RFM_score'].str.len().eq(3).all()
+    
+    def test_code_and_labels_with_ten_quantiles(self, analyzer):
+        """Testa código combinado com dois dígitos por score"""
+        df = pd.DataFrame({
+            'recency': np.arange(100),
+            'frequency': np.arange(100),
+            'monetary': np.arange(100),
+        })
+        
+        result = analyzer.calculate_rfm_scores(df, n_quantiles=10, with_labels=True)
+        
+        assert result['RFM_code'].iloc[0] == 100101  # R=10, F=1, M=1
+        assert result['RFM_score'].iloc[0] == '1011'
+        assert result['RFM_code'].iloc[-1] == 11010  # R=1, F=10, M=10
+        assert result['RFM_score'].iloc[-1] == '11010'
+
+
+class TestRFMStreamingQuantiles:
+    """Testes do sketch KLL e do RFM em streaming"""
+    
+    @pytest.fixture
+    def analyzer(self):
+        """Fixture: RFMAnalyzer com client mockado"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            return RFMAnalyzer('project', 'dataset')
+    
+    @pytest.fixture
+    def rfm_data(self):
+        """Fixture: dados RFM sintéticos"""
+        rng = np.random.default_rng(7)
+        n = 20_000
+        return pd.DataFrame({
+            'customer_unique_id': [f'c{i}' for i in range(n)],
+            'recency': rng.integers(0, 700, n),
+            'frequency': rng.integers(1, 20, n),
+            'monetary': rng.lognormal(5, 1, n),
+        })
+    
+    def test_sketch_rank_error_within_bound(self):
+        """Testa erro de rank dos quantis abaixo do limite documentado"""
+        from python.analytics.quantile_sketch import KLLSketch
+        
+        values = np.random.default_rng(1).lognormal(5, 1, 200_000)
+        sketch = KLLSketch(k=200, seed=1)
+        for chunk in np.array_split(values, 20):
+            sketch.update(chunk)
+        
+        qs = np.array([0.2, 0.4, 0.6, 0.8])
+        estimates = sketch.quantiles(qs)
+        ranks = np.searchsorted(np.sort(values), estimates) / len(values)
+        
+        assert sketch.n == len(values)
+        assert sketch.num_retained < 1000
+        assert np.abs(ranks - qs).max() < 0.017
+    
+    def test_sketch_merge_and_nan(self):
+        """Testa merge de sketches e NaN ignorados"""
+        from python.analytics.quantile_sketch import KLLSketch
+        
+        left, right = KLLSketch(k=100, seed=0), KLLSketch(k=100, seed=0)
+        left.update(np.r_[np.arange(0, 5000, dtype=float), np.nan])
+        right.update(np.arange(5000, 10000, dtype=float))
+        left.merge(right)
+        
+        assert left.n == 10000
+        assert abs(left.quantiles([0.5])[0] - 5000) < 300
+    
+    def test_empty_sketch_raises(self):
+        """Testa quantis de sketch vazio"""
+        from python.analytics.quantile_sketch import KLLSketch
+        
+        with pytest.raises(ValueError):
+            KLLSketch().quantiles([0.5])
+    
+    def test_streaming_scores_close_to_exact(self, analyzer, rfm_data):
+        """Testa scores com limites do sketch contra o cálculo exato"""
+        exact = analyzer.calculate_rfm_scores(rfm_data)
+        
+        batches = [rfm_data.iloc[i:i + 2000] for i in range(0, len(rfm_data), 2000)]
+        
+        edges = analyzer.sketch_rfm_edges(batches, seed=3)
+        streamed = pd.concat([analyzer.calculate_rfm_scores(batch, edges=edges) for batch in batches])
+        
+        for score in ('R_score', 'F_score', 'M_score'):
+            assert streamed[score].between(1, 5).all()
+            assert (streamed[score].to_numpy() == exact[score].to_numpy()).mean() > 0.95
+    
+    def test_iter_rfm_scores_reads_result_twice(self, analyzer, rfm_data):
+        """Testa as duas passadas sobre o resultado da query"""
+        batches = [rfm_data.iloc[i:i + 5000] for i in range(0, len(rfm_data), 5000)]
+        
+        rows = Mock()
+        rows.to_dataframe_iterable.side_effect = lambda **kwargs: iter(batches)
+        analyzer.client.list_rows.return_value = rows
+        
+        result = pd.concat(analyzer.iter_rfm_scores(reference_date='2018-09-01', page_size=5000))
+        
+        assert analyzer.client.query.call_count == 1
+        assert analyzer.client.list_rows.call_count == 2
+        assert len(result) == len(rfm_data)
+        assert {'R_score', 'F_score', 'M_score', 'segment', 'priority'} <= set(result.columns)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -16,7 +16,7 @@ from datetime import datetime, timedelta
 # Adicionar path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from python.etl.data_validation import DataValidator
+from python.etl.data_validation import DataValidator, LocalDataValidator
 
 # TESTES DA CLASSE DataValidator
 class TestDataValidator:
@@ -25,7 +25,7 @@ class TestDataValidator:
     @pytest.fixture
     def validator(self, project_id, dataset_id):
         """Fixture: DataValidator instance com mock"""
-        with patch('python.etl.data_validation.bigquery.Client'):
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
             validator = DataValidator(project_id, dataset_id)
             validator.client = Mock()
             return validator
@@ -1059,5 +1059,339 @@ class TestAdditionalCoverage:
         assert not result['passed']
 
 
+# TESTES DO MODO BATCH (UM SCAN POR TABELA)
+class TestDataValidatorBatch:
+    """Testes da execução de checks agrupados por tabela"""
+    
+    @pytest.fixture
+    def validator(self):
+        """Fixture: DataValidator com client mockado"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            validator = DataValidator('project', 'dataset')
+        validator.client = Mock()
+        return validator
+    
+    @staticmethod
+    def _answer(values_by_table, standalone_value=0):
+        """Helper: responde queries batch (check_i) e isoladas"""
+        def query(sql, *args, **kwargs):
+            job = Mock()
+            for table, values in values_by_table.items():
+                if 'check_0' in sql and f"dataset.{table}`" in sql:
+                    job.to_dataframe.return_value = pd.DataFrame(
+                        {f'check_{i}': [v] for i, v in enumerate(values)}
+                    )
+                    return job
+            job.to_dataframe.return_value = pd.DataFrame({'result': [standalone_value]})
+            return job
+        return query
+    
+    def test_all_single_table_checks_are_batchable(self, validator):
+        """Testa que cada check tem expression+table ou query"""
+        for check in validator._all_checks():
+            assert ('query' in check) != ('expression' in check and 'table' in check)
+    
+    def test_batch_query_has_one_column_per_check(self, validator):
+        """Testa a montagem da query agrupada"""
+        checks = [c for c in validator._all_checks() if c.get('table') == 'orders']
+        
+        query = validator._build_batch_query('orders', checks)
+        
+        assert query.count(' AS check_') == len(checks)
+        assert query.count('FROM') == 1
+        assert '`project.dataset.orders`' in query
+    
+    def test_batch_scans_each_table_once(self, validator):
+        """Testa que o modo batch faz uma query por tabela + checks com join"""
+        checks = validator._all_checks()
+        tables = {c['table'] for c in checks if 'table' in c}
+        standalone = [c for c in checks if 'query' in c]
+        
+        validator.client.query.side_effect = self._answer({})
+        validator._run_checks(checks, batch=True)
+        
+        assert validator.client.query.call_count == len(tables) + len(standalone)
+        assert len(validator.client.query.call_args_list) < len(checks)
+    
+    def test_batch_matches_check_order_and_values(self, validator):
+        """Testa que os resultados seguem a ordem e os valores de cada check"""
+        checks = validator._primary_key_checks()
+        validator.client.query.side_effect = self._answer({
+            'customers': [0, 0], 'orders': [3, 0], 'order_items': [0],
+        })
+        
+        results = validator._run_checks(checks, batch=True)
+        
+        assert [r['test_name'] for r in results] == [c['name'] for c in checks]
+        assert [r['passed'] for r in results] == [True, True, False, True, True]
+        assert results[2]['actual'] == 3
+    
+    def test_batch_query_error_marks_table_checks(self, validator):
+        """Testa que a falha da query de uma tabela vira ERROR nos seus checks"""
+        def query(sql, *args, **kwargs):
+            if 'dataset.orders`' in sql:
+                raise Exception("Quota exceeded")
+            return self._answer({'customers': [0, 0], 'order_items': [0]})(sql)
+        
+        validator.client.query.side_effect = query
+        
+        results = validator._run_checks(validator._primary_key_checks(), batch=True)
+        
+        statuses = [r['status'] for r in results]
+        assert statuses == ["✅ PASS", "✅ PASS", "⚠️ ERROR", "⚠️ ERROR", "✅ PASS"]
+    
+    def test_run_all_validations_batch(self, validator):
+        """Testa run_all_validations no modo batch"""
+        validator.client.query.side_effect = self._answer({
+            'customers': [0, 0, 0, 95000],
+            'orders': [0, 0, 0, 99.9, 97.0, 0, 0, 95000, 97.0],
+            'order_items': [0, 0, 0],
+            'payments': [0],
+            'reviews': [0],
+            'products': [98.0],
+        }, standalone_value=1)
+        
+        with patch('pandas.DataFrame.to_csv'):
+            results_df = validator.run_all_validations(batch=True)
+        
+        assert len(results_df) == len(validator._all_checks())
+        assert list(results_df['test_name']) == [c['name'] for c in validator._all_checks()]
+
+
+# TESTES DO MODO CONCORRENTE
+class TestDataValidatorConcurrent:
+    """Testes da execução concorrente das queries de validação"""
+    
+    @pytest.fixture
+    def validator(self):
+        """Fixture: DataValidator com client mockado"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            validator = DataValidator('project', 'dataset')
+        validator.client = Mock()
+        return validator
+    
+    def test_all_queries_submitted_before_results(self, validator):
+        """Testa que todos os jobs são submetidos antes de ler qualquer resultado"""
+        events = []
+        
+        def fetch():
+            events.append('fetch')
+            return pd.DataFrame({'r': [0]})
+        
+        def query(sql, *args, **kwargs):
+            events.append('submit')
+            job = Mock()
+            job.to_dataframe.side_effect = fetch
+            return job
+        
+        validator.client.query.side_effect = query
+        checks = validator._primary_key_checks()
+        
+        validator._run_checks(checks, concurrent=True)
+        
+        assert events == ['submit'] * len(checks) + ['fetch'] * len(checks)
+    
+    def test_order_and_semantics_preserved(self, validator):
+        """Testa ordem dos resultados e PASS/FAIL/ERROR no modo concorrente"""
+        def query(sql, *args, **kwargs):
+            job = Mock()
+            if 'COUNTIF(customer_id IS NULL)' in sql:
+                job.result.side_effect = RuntimeError("job failed")
+            elif 'DISTINCT order_id' in sql:
+                job.to_dataframe.return_value = pd.DataFrame({'r': [7]})
+            else:
+                job.to_dataframe.return_value = pd.DataFrame({'r': [0]})
+            return job
+        
+        validator.client.query.side_effect = query
+        checks = validator._primary_key_checks()
+        
+        results = validator._run_checks(checks, concurrent=True)
+        
+        assert [r['test_name'] for r in results] == [c['name'] for c in checks]
+        assert [r['status'] for r in results] == [
+            "✅ PASS", "⚠️ ERROR", "❌ FAIL", "✅ PASS", "✅ PASS"
+        ]
+        # ERROR não entra em validation_results (mesmo comportamento sequencial)
+        assert len(validator.validation_results) == 4
+    
+    def test_submit_error_is_isolated(self, validator):
+        """Testa que erro ao submeter uma query não afeta as outras"""
+        def query(sql, *args, **kwargs):
+            if 'order_items' in sql:
+                raise Exception("invalid query")
+            job = Mock()
+            job.to_dataframe.return_value = pd.DataFrame({'r': [0]})
+            return job
+        
+        validator.client.query.side_effect = query
+        
+        results = validator._run_checks(validator._primary_key_checks(), concurrent=True)
+        
+        assert [r['passed'] for r in results] == [True, True, True, True, False]
+    
+    def test_concurrent_batch(self, validator):
+        """Testa a combinação batch + concorrente"""
+        def query(sql, *args, **kwargs):
+            job = Mock()
+            n = sql.count(' AS check_')
+            job.to_dataframe.return_value = pd.DataFrame(
+                {f'check_{i}': [0] for i in range(n)} if n else {'r': [0]}
+            )
+            return job
+        
+        validator.client.query.side_effect = query
+        
+        results = validator._run_checks(validator._primary_key_checks(), batch=True, concurrent=True)
+        
+        assert validator.client.query.call_count == 3
+        assert all(r['passed'] for r in results)
+
+
+class TestLocalDataValidator:
+    """Testes do backend local (pandas) com as regras compartilhadas"""
+
+    @pytest.fixture
+    def tables(self):
+        """Fixture: tabelas pequenas e consistentes"""
+        return {
+            'customers': pd.DataFrame({
+                'customer_id': ['c1', 'c2', 'c3'],
+                'customer_state': ['SP', 'RJ', 'MG'],
+            }),
+            'orders': pd.DataFrame({
+                'order_id': ['o1', 'o2', 'o3'],
+                'customer_id': ['c1', 'c2', 'c3'],
+                'order_status': ['delivered', 'delivered', 'delivered'],
+                'order_purchase_timestamp': pd.to_datetime(['2018-01-01'] * 3),
+                'order_delivered_customer_date': pd.to_datetime(['2018-01-05'] * 3),
+                'order_estimated_delivery_date': pd.to_datetime(['2018-01-10'] * 3),
+            }),
+            'order_items': pd.DataFrame({
+                'order_id': ['o1', 'o1', 'o2', 'o3'],
+                'order_item_id': [1, 2, 1, 1],
+                'product_id': ['p1', 'p2', 'p1', 'p2'],
+                'price': [10.0, 20.0, 30.0, 40.0],
+                'freight_value': [5.0, 5.0, 5.0, 5.0],
+            }),
+            'products': pd.DataFrame({
+                'product_id': ['p1', 'p2'],
+                'product_category_name': ['a', 'b'],
+            }),
+            'payments': pd.DataFrame({
+                'order_id': ['o1', 'o2', 'o3'],
+                'payment_value': [40.0, 35.0, 45.0],
+            }),
+            'reviews': pd.DataFrame({
+                'review_score': [5, 4, 1],
+            }),
+        }
+
+    @staticmethod
+    def _results_by_name(validator):
+        """Helper: executa todos os checks e indexa por nome"""
+        results = validator._run_checks(validator._all_checks())
+        return {r['test_name']: r for r in results}
+
+    def test_shares_rules_with_bigquery_backend(self, tables):
+        """Testa que os dois backends avaliam os mesmos checks"""
+        with patch('python.utils.bigquery_clients.bigquery.Client'):
+            remote = DataValidator('project', 'dataset')
+        local = LocalDataValidator(tables)
+
+        remote_checks = remote._all_checks()
+        local_checks = local._all_checks()
+
+        assert [c['name'] for c in local_checks] == [c['name'] for c in remote_checks]
+        assert [c['rule'] for c in local_checks] == [c['rule'] for c in remote_checks]
+        assert all('query' not in c and 'expression' not in c for c in local_checks)
+
+    def test_clean_data_passes_integrity_rules(self, tables):
+        """Testa que dados consistentes passam (exceto volumetria)"""
+        results = self._results_by_name(LocalDataValidator(tables))
+
+        volumetry = {s['name'] for s in DataValidator.VOLUMETRY_RULES}
+        failed = [name for name, r in results.items() if not r['passed']]
+
+        assert set(failed) <= volumetry
+        assert results['orders delivered: >90% do total']['actual'] == 100.0
+        assert results['order_items: tem mais itens que orders']['actual'] == 1
+
+    def test_composite_key_duplicates(self, tables):
+        """Testa a unicidade por hash de chave composta"""
+        tables['order_items'].loc[1, 'order_item_id'] = 1
+
+        results = self._results_by_name(LocalDataValidator(tables))
+
+        assert results['order_items: (order_id, order_item_id) único']['actual'] == 1
+
+    def test_orphans_include_null_keys(self, tables):
+        """Testa o anti-join: chave inexistente ou nula não encontra pai"""
+        tables['orders'].loc[0, 'customer_id'] = 'c999'
+        tables['orders'].loc[1, 'customer_id'] = None
+
+        results = self._results_by_name(LocalDataValidator(tables))
+
+        assert results['orders.customer_id existe em customers']['actual'] == 2
+
+    def test_null_comparisons_are_not_counted(self, tables):
+        """Testa que NULL não conta em comparações (semântica SQL)"""
+        tables['reviews'] = pd.DataFrame({'review_score': [5, np.nan, 7]})
+        tables['orders'].loc[0, 'order_delivered_customer_date'] = pd.NaT
+        tables['customers'].loc[0, 'customer_state'] = None
+
+        results = self._results_by_name(LocalDataValidator(tables))
+
+        assert results['reviews: review_score entre 1 e 5']['actual'] == 1
+        assert results['orders: data de compra < data de entrega']['actual'] == 0
+        assert results['customers: customer_state válido (27 estados)']['actual'] == 0
+        assert results['orders delivered: tem data de entrega (>95%)']['actual'] == pytest.approx(200 / 3)
+
+    def test_payment_totals_mismatch(self, tables):
+        """Testa a comparação de totais por pedido entre tabelas"""
+        tables['payments'].loc[2, 'payment_value'] = 100.0
+
+        results = self._results_by_name(LocalDataValidator(tables))
+
+        assert results['payments: soma por pedido = order_value (diferença <1%)']['actual'] == 1
+
+    def test_missing_table_is_error(self, tables):
+        """Testa que tabela ausente vira ERROR nos checks que dependem dela"""
+        del tables['products']
+
+        results = self._results_by_name(LocalDataValidator(tables))
+
+        assert results['products: product_category_name não nulo (>95%)']['status'] == "⚠️ ERROR"
+        assert results['order_items.product_id existe em products']['status'] == "⚠️ ERROR"
+        assert results['customers: customer_id único']['passed']
+
+    def test_from_parquet(self, tables, tmp_path):
+        """Testa a leitura dos Parquet de staging"""
+        for name, df in tables.items():
+            df.to_parquet(tmp_path / f"{name}.parquet", index=False)
+
+        validator = LocalDataValidator.from_parquet(str(tmp_path))
+
+        assert set(validator.tables) == set(tables)
+        assert validator.tables['order_items'].equals(tables['order_items'])
+
+    def test_from_etl_reads_required_tables(self, tables):
+        """Testa que apenas as tabelas usadas pelas regras são lidas"""
+        etl = Mock()
+        etl.data_path = Path('data/raw')
+        etl.table_mapping = {
+            'olist_customers_dataset.csv': 'customers',
+            'olist_sellers_dataset.csv': 'sellers',
+        }
+        etl.load_csv_to_dataframe.return_value = tables['customers']
+
+        validator = LocalDataValidator.from_etl(etl)
+
+        assert list(validator.tables) == ['customers']
+        etl.load_csv_to_dataframe.assert_called_once_with(
+            'olist_customers_dataset.csv', typed=True
+        )
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
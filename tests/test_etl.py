@@ -17,6 +17,7 @@ import time
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from python.etl.load_to_bigquery import OlistBigQueryETL
+from python.etl.extract_kaggle import KaggleExtractor
 
 
 
@@ -213,13 +214,15 @@ class TestOlistBigQueryETL:
         """Testa upload de DataFrame para BigQuery"""
         # Mock job
         mock_job = Mock()
-        mock_job.done.side_effect = [False, False, True]  # Simular progresso
         mock_job.errors = None
         etl.client.load_table_from_dataframe.return_value = mock_job
         
         # Executar
         etl.load_table_to_bigquery(sample_customers_df, 'customers')
         
+        # Espera via job.result (sem polling de done())
+        mock_job.result.assert_called()
+        
         # Verificar chamada
         etl.client.load_table_from_dataframe.assert_called_once()
         args = etl.client.load_table_from_dataframe.call_args
@@ -306,6 +309,15 @@ class TestOlistBigQueryETL:
             csv_path = Path(etl.data_path) / csv_file
             sample_customers_df.to_csv(csv_path, index=False)
         
+        # geolocation é agregada por CEP e precisa das colunas próprias
+        pd.DataFrame({
+            'geolocation_zip_code_prefix': ['01001'],
+            'geolocation_lat': [-23.55],
+            'geolocation_lng': [-46.63],
+            'geolocation_city': ['sao paulo'],
+            'geolocation_state': ['SP'],
+        }).to_csv(Path(etl.data_path) / 'olist_geolocation_dataset.csv', index=False)
+        
         # Mock dataset já existe
         etl.client.get_dataset.return_value = Mock()
         
@@ -882,15 +894,17 @@ class TestETLErrorHandling:
     
     def test_upload_timeout_handling(self, etl, sample_customers_df):
         """Testa timeout no upload"""
+        from concurrent.futures import TimeoutError as FuturesTimeoutError
+        
         mock_job = Mock()
-        mock_job.done.side_effect = [False] * 200 + [True]  # Simula demora
+        mock_job.result.side_effect = [FuturesTimeoutError()] * 3 + [None]  # Simula demora
         mock_job.errors = None
         etl.client.load_table_from_dataframe.return_value = mock_job
         
-        # Não deve travar indefinidamente (tqdm ajuda)
+        # Não deve travar indefinidamente (backoff em job.result)
         etl.load_table_to_bigquery(sample_customers_df, 'customers')
         
-        assert mock_job.done.call_count > 0
+        assert mock_job.result.call_count == 4
 
 
 
@@ -1119,5 +1133,878 @@ class TestAdditionalCoverage:
         assert job_config.create_disposition == bigquery.CreateDisposition.CREATE_IF_NEEDED
 
 
+# TESTES DO PIPELINE PARALELO
+class TestETLParallelPipeline:
+    """Testes do modo paralelo de run_full_pipeline"""
+    
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL com CSVs de exemplo e client mockado"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path))
+        etl.client = Mock()
+        
+        df = pd.DataFrame({'customer_id': ['c1', 'c2'], 'customer_state': ['SP', 'RJ']})
+        for csv_file in etl.table_mapping:
+            df.to_csv(tmp_path / csv_file, index=False)
+        pd.DataFrame({
+            'geolocation_zip_code_prefix': ['01001'],
+            'geolocation_lat': [-23.55],
+            'geolocation_lng': [-46.63],
+            'geolocation_city': ['sao paulo'],
+            'geolocation_state': ['SP'],
+        }).to_csv(tmp_path / 'olist_geolocation_dataset.csv', index=False)
+        
+        mock_job = Mock()
+        mock_job.done.return_value = True
+        mock_job.errors = None
+        etl.client.load_table_from_dataframe.return_value = mock_job
+        etl.client.query.return_value.to_dataframe.return_value = pd.DataFrame({
+            'total_rows': [2], 'unique_rows': [2], 'null_count': [0]
+        })
+        return etl
+    
+    def test_parallel_loads_all_tables(self, etl):
+        """Testa que o modo paralelo carrega todas as tabelas"""
+        etl.run_full_pipeline(parallel=True, max_workers=4)
+        
+        assert etl.client.load_table_from_dataframe.call_count == len(etl.table_mapping)
+    
+    def test_parallel_results_keep_mapping_order(self, etl):
+        """Testa que os resultados seguem a ordem do table_mapping"""
+        results = etl._run_tables_parallel(max_workers=8)
+        
+        assert [r['table'] for r in results] == list(etl.table_mapping.values())
+    
+    def test_parallel_isolates_failures(self, etl):
+        """Testa que a falha de uma tabela não interrompe as demais"""
+        (etl.data_path / 'olist_orders_dataset.csv').unlink()
+        
+        results = etl._run_tables_parallel(max_workers=4)
+        
+        tables = [r['table'] for r in results]
+        assert 'orders' not in tables
+        assert len(tables) == len(etl.table_mapping) - 1
+
+
+# TESTES DE INGESTÃO EM BLOCOS (STREAMING)
+class TestETLChunkedIngestion:
+    """Testes da leitura/carga de CSVs em blocos"""
+    
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL em modo streaming com client mockado"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path), chunksize=2)
+        etl.client = Mock()
+        
+        mock_job = Mock()
+        mock_job.done.return_value = True
+        mock_job.errors = None
+        etl.client.load_table_from_dataframe.return_value = mock_job
+        etl.client.copy_table.return_value = mock_job
+        
+        pd.DataFrame({
+            'order_id': ['o1', 'o1', 'o2', 'o3', 'o4'],
+            'order_item_id': [1, 2, 1, 1, None],
+            'product_id': ['p1', 'p2', 'p1', 'p3', 'p4'],
+            'seller_id': ['s1', 's1', 's2', 's2', 's3'],
+            'shipping_limit_date': ['2018-01-01 10:00:00'] * 4 + ['invalid'],
+            'price': [10.0, 20.5, 30.0, 40.0, 50.0],
+            'freight_value': [1.0, 2.0, 3.0, 4.0, 5.0],
+        }).to_csv(tmp_path / 'olist_order_items_dataset.csv', index=False)
+        return etl
+    
+    def test_chunks_bounded_by_chunksize(self, etl):
+        """Testa que nenhum bloco excede chunksize"""
+        chunks = list(etl.iter_csv_chunks('olist_order_items_dataset.csv', chunksize=2))
+        
+        assert [len(c) for c in chunks] == [2, 2, 1]
+    
+    def test_chunks_typed_by_schema(self, etl):
+        """Testa que os tipos vêm do schema e não do nome da coluna"""
+        chunk = pd.concat(etl.iter_csv_chunks('olist_order_items_dataset.csv', chunksize=2))
+        
+        assert str(chunk['order_item_id'].dtype) == 'Int64'
+        assert pd.api.types.is_datetime64_any_dtype(chunk['shipping_limit_date'])
+        assert chunk['shipping_limit_date'].isna().sum() == 1
+        assert chunk['price'].dtype == np.float64
+    
+    def test_string_columns_keep_leading_zeros(self, tmp_path):
+        """Testa que colunas STRING preservam zeros à esquerda"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path))
+        
+        pd.DataFrame({
+            'customer_id': ['c1'], 'customer_unique_id': ['u1'],
+            'customer_zip_code_prefix': ['01310'],
+            'customer_city': ['sao paulo'], 'customer_state': ['SP'],
+        }).to_csv(tmp_path / 'olist_customers_dataset.csv', index=False)
+        
+        chunk = next(etl.iter_csv_chunks('olist_customers_dataset.csv'))
+        
+        assert chunk['customer_zip_code_prefix'].iloc[0] == '01310'
+    
+    def test_first_chunk_truncates_then_appends(self, etl):
+        """Testa WRITE_TRUNCATE no primeiro bloco e WRITE_APPEND nos demais (staging)"""
+        from google.cloud import bigquery
+        
+        total = etl.load_csv_in_chunks('olist_order_items_dataset.csv', 'order_items', chunksize=2)
+        
+        calls = etl.client.load_table_from_dataframe.call_args_list
+        dispositions = [c[1]['job_config'].write_disposition for c in calls]
+        
+        assert total == 5
+        assert {c[0][1] for c in calls} == {'project.dataset.order_items__staging'}
+        assert dispositions == [
+            bigquery.WriteDisposition.WRITE_TRUNCATE,
+            bigquery.WriteDisposition.WRITE_APPEND,
+            bigquery.WriteDisposition.WRITE_APPEND,
+        ]
+        
+        source, destination = etl.client.copy_table.call_args[0]
+        assert (source, destination) == ('project.dataset.order_items__staging', 'project.dataset.order_items')
+        assert etl.client.copy_table.call_args[1]['job_config'].write_disposition == \
+            bigquery.WriteDisposition.WRITE_TRUNCATE
+        etl.client.delete_table.assert_called_with('project.dataset.order_items__staging', not_found_ok=True)
+    
+    def test_failed_chunk_keeps_destination(self, etl):
+        """Testa que uma falha no meio do arquivo não altera o destino"""
+        ok_job = Mock(errors=None)
+        bad_job = Mock(errors=None)
+        bad_job.result.side_effect = RuntimeError("quota")
+        etl.client.load_table_from_dataframe.side_effect = [ok_job, bad_job]
+        
+        with pytest.raises(Exception, match="quota"):
+            etl.load_csv_in_chunks('olist_order_items_dataset.csv', 'order_items', chunksize=2)
+        
+        etl.client.copy_table.assert_not_called()
+        etl.client.delete_table.assert_called_once_with('project.dataset.order_items__staging', not_found_ok=True)
+    
+    def test_no_chunks_empties_destination(self, etl):
+        """Testa que um CSV sem blocos ainda substitui o destino (tabela vazia)"""
+        with patch.object(etl, 'iter_csv_chunks', return_value=iter([])):
+            total = etl.load_csv_in_chunks('olist_order_items_dataset.csv', 'order_items')
+        
+        assert total == 0
+        etl.client.load_table_from_dataframe.assert_not_called()
+        assert etl.client.create_table.call_args[0][0].table_id == 'order_items__staging'
+        etl.client.copy_table.assert_called_once()
+
+
+# TESTES DE LEITURA TIPADA (SCHEMA + PYARROW)
+class TestETLTypedReader:
+    """Testes da leitura de CSV tipada pelo schema"""
+    
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL com CSV de reviews"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path), typed=True)
+        
+        pd.DataFrame({
+            'review_id': ['r1', 'r2', 'r3'],
+            'order_id': ['o1', 'o2', 'o3'],
+            'review_score': [5, None, 3],
+            'review_comment_title': [None, 'ok', None],
+            'review_comment_message': ['ótimo, recomendo', None, 'chegou\nrápido'],
+            'review_creation_date': ['2018-01-01 00:00:00', '2018-01-02 00:00:00', ''],
+            'review_answer_timestamp': ['2018-01-02 10:00:00', 'invalid', '2018-01-04 09:00:00'],
+        }).to_csv(tmp_path / 'olist_order_reviews_dataset.csv', index=False)
+        return etl
+    
+    def test_schema_to_dtypes(self, etl):
+        """Testa a tradução do schema BigQuery para dtypes"""
+        dtypes, timestamp_cols = etl._schema_to_dtypes('orders')
+        
+        assert dtypes['order_id'] == 'string[pyarrow]'
+        assert dtypes['order_status'] == 'category'
+        assert 'order_purchase_timestamp' in timestamp_cols
+        assert 'order_purchase_timestamp' not in dtypes
+        
+        dtypes, _ = etl._schema_to_dtypes('order_items')
+        assert dtypes['order_item_id'] == 'Int64'
+        assert dtypes['price'] == 'float64'
+    
+    def test_typed_reader_dtypes(self, etl):
+        """Testa que o DataFrame segue o schema da tabela"""
+        df = etl.load_csv_to_dataframe('olist_order_reviews_dataset.csv', typed=True)
+        
+        assert str(df['review_score'].dtype) == 'Int64'
+        assert df['review_score'].isna().sum() == 1
+        assert pd.api.types.is_string_dtype(df['review_id'])
+        assert pd.api.types.is_datetime64_any_dtype(df['review_creation_date'])
+        assert pd.api.types.is_datetime64_any_dtype(df['review_answer_timestamp'])
+        assert df['review_answer_timestamp'].isna().sum() == 1
+        assert df['review_comment_message'].iloc[2] == 'chegou\nrápido'
+    
+    def test_typed_reader_file_not_found(self, etl):
+        """Testa erro para arquivo inexistente"""
+        with pytest.raises(FileNotFoundError):
+            etl.load_csv_typed('olist_orders_dataset.csv')
+
+
+# TESTES DO STAGING EM PARQUET
+class TestETLParquetStaging:
+    """Testes da conversão CSV -> Parquet e carga direta do arquivo"""
+    
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL com staging Parquet e client mockado"""
+        raw_path = tmp_path / "raw"
+        raw_path.mkdir()
+        
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL(
+                'project', 'dataset', str(raw_path),
+                parquet_staging=True, processed_path=str(tmp_path / "processed")
+            )
+        etl.client = Mock()
+        
+        mock_job = Mock()
+        mock_job.done.return_value = True
+        mock_job.errors = None
+        etl.client.load_table_from_file.return_value = mock_job
+        
+        pd.DataFrame({
+            'review_id': ['r1', 'r2'],
+            'order_id': ['o1', 'o2'],
+            'review_score': pd.array([5, None], dtype='Int64'),
+            'review_comment_title': [None, 'ok'],
+            'review_comment_message': ['linha 1\nlinha 2', None],
+            'review_creation_date': ['2018-01-01 00:00:00', ''],
+            'review_answer_timestamp': ['2018-01-02 10:00:00', '2018-01-03 10:00:00'],
+        }).to_csv(raw_path / 'olist_order_reviews_dataset.csv', index=False)
+        return etl
+    
+    def test_stage_csv_to_parquet(self, etl):
+        """Testa a conversão tipada para Parquet"""
+        import pyarrow.parquet as pq
+        
+        parquet_path = etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv')
+        table = pq.read_table(parquet_path)
+        
+        assert parquet_path == etl.processed_path / 'reviews.parquet'
+        assert table.num_rows == 2
+        assert str(table.schema.field('review_score').type) == 'int64'
+        assert str(table.schema.field('review_creation_date').type) == 'timestamp[us]'
+        assert table.column('review_comment_message')[0].as_py() == 'linha 1\nlinha 2'
+    
+    def test_malformed_values_become_null(self, etl):
+        """Testa que valores inválidos viram nulos em vez de abortar a conversão"""
+        import pyarrow.parquet as pq
+        
+        csv_path = etl.data_path / 'olist_order_reviews_dataset.csv'
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            f.write('r3,o3,cinco,,,31/02/2018 25:00,2018-01-06 00:00:00\n')
+        
+        table = pq.read_table(etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv'))
+        
+        assert table.num_rows == 3
+        assert str(table.schema.field('review_creation_date').type) == 'timestamp[us]'
+        assert str(table.column('review_creation_date')[0].as_py()) == '2018-01-01 00:00:00'
+        assert table.column('review_creation_date')[2].as_py() is None
+        assert table.column('review_score').to_pylist() == [5, None, None]
+    
+    def test_failed_conversion_removes_tmp_file(self, etl):
+        """Testa que uma falha na escrita não deixa .parquet.tmp para trás"""
+        with patch('pyarrow.parquet.ParquetWriter.write_batch',
+                   side_effect=OSError('No space left on device')):
+            with pytest.raises(OSError):
+                etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv')
+        
+        assert list(etl.processed_path.glob('*.tmp')) == []
+        assert list(etl.processed_path.glob('*.parquet')) == []
+    
+    def test_parquet_reused_when_csv_unchanged(self, etl):
+        """Testa que o Parquet é reutilizado se o CSV não mudou"""
+        first = etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv')
+        mtime = first.stat().st_mtime_ns
+        
+        second = etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv')
+        
+        assert second.stat().st_mtime_ns == mtime
+    
+    def test_parquet_rebuilt_when_csv_changes(self, etl):
+        """Testa que o Parquet é regerado se o CSV mudou"""
+        import pyarrow.parquet as pq
+        
+        etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv')
+        
+        csv_path = etl.data_path / 'olist_order_reviews_dataset.csv'
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            f.write('r3,o3,4,,,2018-01-05 00:00:00,2018-01-06 00:00:00\n')
+        
+        parquet_path = etl.stage_csv_to_parquet('olist_order_reviews_dataset.csv')
+        
+        assert pq.read_metadata(parquet_path).num_rows == 3
+    
+    def test_process_table_loads_parquet_file(self, etl):
+        """Testa que o modo staging usa load_table_from_file com PARQUET"""
+        from google.cloud import bigquery
+        
+        etl.client.query.return_value.to_dataframe.return_value = pd.DataFrame({
+            'total_rows': [2], 'unique_rows': [2], 'null_count': [0]
+        })
+        
+        etl._process_table('olist_order_reviews_dataset.csv', 'reviews')
+        
+        job_config = etl.client.load_table_from_file.call_args[1]['job_config']
+        assert job_config.source_format == bigquery.SourceFormat.PARQUET
+        etl.client.load_table_from_dataframe.assert_not_called()
+
+
+# TESTES DO MANIFESTO (SKIP DE TABELAS SEM ALTERAÇÃO)
+class TestETLSkipUnchanged:
+    """Testes do skip de tabelas cujo CSV não mudou"""
+    
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL com skip_unchanged e client mockado"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path), skip_unchanged=True)
+        etl.client = Mock()
+        
+        mock_job = Mock()
+        mock_job.done.return_value = True
+        mock_job.errors = None
+        etl.client.load_table_from_dataframe.return_value = mock_job
+        etl.client.query.return_value.to_dataframe.return_value = pd.DataFrame({
+            'total_rows': [2], 'unique_rows': [2], 'null_count': [0]
+        })
+        
+        pd.DataFrame({
+            'seller_id': ['s1', 's2'], 'seller_zip_code_prefix': ['01310', '02010'],
+            'seller_city': ['sp', 'rj'], 'seller_state': ['SP', 'RJ'],
+        }).to_csv(tmp_path / 'olist_sellers_dataset.csv', index=False)
+        return etl
+    
+    def test_first_run_loads_and_writes_manifest(self, etl):
+        """Testa que a primeira carga registra o arquivo no manifesto"""
+        result = etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        assert not result.get('skipped')
+        assert etl.manifest_path.exists()
+        entry = etl._load_manifest()['olist_sellers_dataset.csv']
+        assert entry['table_id'] == 'project.dataset.sellers'
+        assert entry['total_rows'] == 2
+    
+    def test_unchanged_file_is_skipped(self, etl):
+        """Testa que um CSV idêntico não é recarregado"""
+        etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        result = etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        assert result['skipped'] is True
+        assert etl.client.load_table_from_dataframe.call_count == 1
+    
+    def test_touched_file_with_same_content_is_skipped(self, etl):
+        """Testa que só mudar o mtime não força recarga (hash igual)"""
+        import os
+        
+        etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        csv_path = etl.data_path / 'olist_sellers_dataset.csv'
+        stat = csv_path.stat()
+        os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        
+        result = etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        assert result['skipped'] is True
+    
+    def test_modified_file_is_reloaded(self, etl):
+        """Testa que um CSV alterado é recarregado"""
+        etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        with open(etl.data_path / 'olist_sellers_dataset.csv', 'a', encoding='utf-8') as f:
+            f.write('s3,03030,bh,MG\n')
+        
+        result = etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        assert not result.get('skipped')
+        assert etl.client.load_table_from_dataframe.call_count == 2
+    
+    def test_other_dataset_is_not_skipped(self, etl):
+        """Testa que o skip vale apenas para o mesmo destino"""
+        etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        etl.dataset_id = 'other_dataset'
+        
+        result = etl._process_table('olist_sellers_dataset.csv', 'sellers')
+        
+        assert not result.get('skipped')
+    
+    def test_failed_manifest_write_removes_tmp_file(self, etl):
+        """Testa que uma falha ao gravar o manifesto não deixa .json.tmp"""
+        with patch('python.etl.load_to_bigquery.json.dump', side_effect=OSError('disco cheio')):
+            with pytest.raises(OSError):
+                etl._update_manifest('olist_sellers_dataset.csv', {'sha256': 'x'})
+        
+        assert list(etl.data_path.glob('*.tmp')) == []
+        assert not etl.manifest_path.exists()
+
+
+# TESTES DE CARGA INCREMENTAL
+class TestETLIncrementalLoad:
+    """Testes da carga incremental por high-water mark"""
+    
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL incremental com orders/payments de exemplo"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path),
+                                   incremental=True, lookback_days=7)
+        etl.client = Mock()
+        
+        mock_job = Mock()
+        mock_job.done.return_value = True
+        mock_job.errors = None
+        etl.client.load_table_from_dataframe.return_value = mock_job
+        
+        pd.DataFrame({
+            'order_id': ['o1', 'o2', 'o3', 'o4'],
+            'customer_id': ['c1', 'c2', 'c3', 'c4'],
+            'order_status': ['delivered', 'delivered', 'shipped', 'created'],
+            'order_purchase_timestamp': [
+                '2018-01-01 10:00:00', '2018-01-28 10:00:00',
+                '2018-02-02 10:00:00', '2018-02-03 10:00:00',
+            ],
+            'order_approved_at': [None] * 4,
+            'order_delivered_carrier_date': [None] * 4,
+            'order_delivered_customer_date': [None] * 4,
+            'order_estimated_delivery_date': [None] * 4,
+        }).to_csv(tmp_path / 'olist_orders_dataset.csv', index=False)
+        
+        pd.DataFrame({
+            'order_id': ['o1', 'o2', 'o3', 'o4'],
+            'payment_sequential': [1, 1, 1, 1],
+            'payment_type': ['boleto'] * 4,
+            'payment_installments': [1, 1, 2, 3],
+            'payment_value': [10.0, 20.0, 30.0, 40.0],
+        }).to_csv(tmp_path / 'olist_order_payments_dataset.csv', index=False)
+        return etl
+    
+    def _set_high_water_mark(self, etl, value):
+        """Helper: mocka o resultado da query de high-water mark"""
+        etl.client.query.return_value.to_dataframe.return_value = pd.DataFrame({
+            'high_water_mark': [pd.Timestamp(value, tz='UTC') if value else pd.NaT]
+        })
+    
+    def test_high_water_mark_is_naive(self, etl):
+        """Testa que o high-water mark é convertido para timestamp naive"""
+        self._set_high_water_mark(etl, '2018-01-31 00:00:00')
+        
+        hwm = etl.get_high_water_mark('orders')
+        
+        assert hwm == pd.Timestamp('2018-01-31 00:00:00')
+        assert hwm.tzinfo is None
+    
+    def test_child_table_watermark_query_joins_parent(self, etl):
+        """Testa que payments usa o timestamp do pedido pai"""
+        self._set_high_water_mark(etl, '2018-01-31 00:00:00')
+        
+        etl.get_high_water_mark('payments')
+        
+        query = etl.client.query.call_args[0][0]
+        assert 'JOIN' in query and 'USING (order_id)' in query
+    
+    def test_full_load_without_high_water_mark(self, etl):
+        """Testa carga completa quando a tabela ainda não tem dados"""
+        self._set_high_water_mark(etl, None)
+        
+        counts = etl.load_table_incremental('olist_orders_dataset.csv', 'orders')
+        
+        assert counts == {'appended': 4, 'merged': 0}
+    
+    def test_appends_new_rows_and_merges_late_rows(self, etl):
+        """Testa WRITE_APPEND para linhas novas e MERGE na janela de lookback"""
+        from google.cloud import bigquery
+        
+        self._set_high_water_mark(etl, '2018-01-31 00:00:00')
+        
+        counts = etl.load_table_incremental('olist_orders_dataset.csv', 'orders')
+        
+        assert counts == {'appended': 2, 'merged': 1}
+        
+        append_call, staging_call = etl.client.load_table_from_dataframe.call_args_list
+        assert list(append_call[0][0]['order_id']) == ['o3', 'o4']
+        assert append_call[1]['job_config'].write_disposition == bigquery.WriteDisposition.WRITE_APPEND
+        assert staging_call[0][1].endswith('orders__staging')
+        
+        merge_query = etl.client.query.call_args[0][0]
+        assert 'MERGE' in merge_query and 'T.order_id = S.order_id' in merge_query
+        etl.client.delete_table.assert_called_once()
+    
+    def test_child_table_delta_uses_parent_timestamp(self, etl):
+        """Testa que o delta de payments segue o timestamp dos pedidos"""
+        self._set_high_water_mark(etl, '2018-01-31 00:00:00')
+        
+        counts = etl.load_table_incremental('olist_order_payments_dataset.csv', 'payments')
+        
+        assert counts == {'appended': 2, 'merged': 1}
+    
+    def test_rows_without_watermark_are_merged(self, etl, tmp_path):
+        """Testa que linhas sem watermark vão para o MERGE em vez de sumir"""
+        orders = pd.read_csv(tmp_path / 'olist_orders_dataset.csv')
+        orders.loc[0, 'order_purchase_timestamp'] = None
+        orders.to_csv(tmp_path / 'olist_orders_dataset.csv', index=False)
+        self._set_high_water_mark(etl, '2018-01-31 00:00:00')
+        
+        counts = etl.load_table_incremental('olist_orders_dataset.csv', 'orders')
+        
+        assert counts == {'appended': 2, 'merged': 2}
+        staging_call = etl.client.load_table_from_dataframe.call_args_list[1]
+        assert sorted(staging_call[0][0]['order_id']) == ['o1', 'o2']
+
+
+# TESTES DA ESPERA DE JOBS (SEM POLLING FIXO)
+class TestBigQueryJobWaiting:
+    """Testes de wait_for_job / wait_for_jobs"""
+    
+    def test_fast_job_has_no_artificial_delay(self):
+        """Testa que um job já concluído retorna imediatamente"""
+        from python.utils.bigquery_jobs import wait_for_job
+        
+        job = Mock()
+        job.result.return_value = 'ok'
+        
+        start = time.time()
+        assert wait_for_job(job) == 'ok'
+        assert time.time() - start < 0.5
+        job.result.assert_called_once_with(timeout=0.5)
+    
+    def test_backoff_grows_wait_slices(self):
+        """Testa que as fatias de espera crescem até o máximo"""
+        from concurrent.futures import TimeoutError as FuturesTimeoutError
+        from python.utils.bigquery_jobs import wait_for_job
+        
+        job = Mock()
+        job.result.side_effect = [FuturesTimeoutError()] * 4 + ['ok']
+        
+        wait_for_job(job, initial_wait=1, max_wait=4, multiplier=2)
+        
+        timeouts = [c[1]['timeout'] for c in job.result.call_args_list]
+        assert timeouts == [1, 2, 4, 4, 4]
+    
+    def test_total_timeout(self):
+        """Testa que o timeout total é respeitado"""
+        from concurrent.futures import TimeoutError as FuturesTimeoutError
+        from python.utils.bigquery_jobs import wait_for_job
+        
+        def slow_result(timeout):
+            time.sleep(timeout)
+            raise FuturesTimeoutError()
+        
+        job = Mock()
+        job.result.side_effect = slow_result
+        
+        with pytest.raises(TimeoutError):
+            wait_for_job(job, timeout=0.05, initial_wait=0.01)
+    
+    def test_wait_for_jobs_isolates_errors(self):
+        """Testa que a falha de um job não afeta os demais"""
+        from python.utils.bigquery_jobs import wait_for_jobs
+        
+        ok_job = Mock(output_rows=10, output_bytes=1024)
+        bad_job = Mock(output_rows=None, output_bytes=None)
+        bad_job.result.side_effect = RuntimeError("boom")
+        
+        errors = wait_for_jobs({'customers': ok_job, 'orders': bad_job})
+        
+        assert list(errors) == ['customers', 'orders']
+        assert errors['customers'] is None
+        assert isinstance(errors['orders'], RuntimeError)
+    
+    def test_job_stats(self):
+        """Testa extração de linhas/bytes dos jobs"""
+        from python.utils.bigquery_jobs import job_stats
+        
+        assert job_stats(Mock(output_rows=5, output_bytes=100)) == (5, 100)
+        assert job_stats(Mock(spec=['total_bytes_processed'], total_bytes_processed=42)) == (0, 42)
+    
+    def test_single_load_job_waits_directly(self, tmp_path):
+        """Testa que um load job é aguardado sem pool de threads/barra"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path))
+        
+        job = Mock(errors=None, output_rows=10, output_bytes=1024)
+        job.result.return_value = job
+        
+        with patch('python.utils.bigquery_jobs.ThreadPoolExecutor') as pool:
+            etl._wait_for_load_job(job, 'orders')
+        
+        pool.assert_not_called()
+        job.result.assert_called_once()
+        
+        job.result.side_effect = RuntimeError("quota")
+        with pytest.raises(Exception, match="Job falhou: quota"):
+            etl._wait_for_load_job(job, 'orders')
+
+
+class TestKaggleRowCount:
+    """Testes da contagem rápida de linhas dos CSVs baixados"""
+
+    @pytest.fixture
+    def extractor(self, tmp_path):
+        """Fixture: extrator apontando para diretório temporário"""
+        return KaggleExtractor(output_dir=str(tmp_path))
+
+    def test_count_matches_pandas_with_quoted_newlines(self, extractor, tmp_path):
+        """Testa quebras de linha e aspas escapadas dentro de campos"""
+        df = pd.DataFrame({
+            'review_id': [f'r{i}' for i in range(50)],
+            'review_comment_message': [
+                'linha 1\nlinha 2' if i % 3 == 0 else ('diz "ótimo"' if i % 5 == 0 else 'ok')
+                for i in range(50)
+            ],
+        })
+        csv_path = tmp_path / "reviews.csv"
+        df.to_csv(csv_path, index=False)
+
+        # Buffers pequenos forçam aspas e quebras a cruzar os limites dos blocos
+        for buffer_size in (7, 64, 1024 * 1024):
+            assert extractor.count_csv_rows(csv_path, buffer_size=buffer_size) == len(pd.read_csv(csv_path))
+
+    def test_count_without_trailing_newline(self, extractor, tmp_path):
+        """Testa último registro sem quebra de linha final"""
+        csv_path = tmp_path / "sem_final.csv"
+        csv_path.write_bytes(b"a,b\n1,2\n3,4")
+
+        assert extractor.count_csv_rows(csv_path) == 2
+
+    def test_count_ignores_trailing_blank_lines(self, extractor, tmp_path):
+        """Testa que linhas em branco no fim não contam como registros"""
+        for content in (b"a,b\n1,2\n3,4\n\n", b"a,b\r\n1,2\r\n3,4\r\n\r\n\r\n"):
+            csv_path = tmp_path / "linhas_em_branco.csv"
+            csv_path.write_bytes(content)
+
+            for buffer_size in (1, 5, 1024):
+                assert extractor.count_csv_rows(csv_path, buffer_size=buffer_size) == 2
+            assert len(pd.read_csv(csv_path)) == 2
+
+    def test_count_empty_and_header_only(self, extractor, tmp_path):
+        """Testa arquivo vazio e arquivo só com header"""
+        empty = tmp_path / "vazio.csv"
+        empty.write_bytes(b"")
+        header = tmp_path / "header.csv"
+        header.write_bytes(b"a,b\n")
+
+        assert extractor.count_csv_rows(empty) == 0
+        assert extractor.count_csv_rows(header) == 0
+
+    def test_validate_downloaded_files(self, extractor, tmp_path):
+        """Testa a validação paralela com arquivos presentes e faltantes"""
+        (tmp_path / 'product_category_name_translation.csv').write_bytes(
+            b"product_category_name,product_category_name_english\n" + b"a,b\n" * 71
+        )
+
+        assert extractor.validate_downloaded_files() is False
+
+        with patch.object(KaggleExtractor, 'count_csv_rows', return_value=100000) as count:
+            for filename in ['olist_customers_dataset.csv', 'olist_orders_dataset.csv',
+                             'olist_order_items_dataset.csv', 'olist_products_dataset.csv',
+                             'olist_sellers_dataset.csv', 'olist_order_payments_dataset.csv',
+                             'olist_order_reviews_dataset.csv', 'olist_geolocation_dataset.csv']:
+                (tmp_path / filename).write_bytes(b"id\n")
+
+            assert extractor.validate_downloaded_files(max_workers=2) is True
+            assert count.call_count == 9
+
+    def test_validate_reports_count_errors(self, extractor, tmp_path):
+        """Testa que erro na contagem invalida o arquivo"""
+        (tmp_path / 'olist_sellers_dataset.csv').write_bytes(b"id\n")
+
+        with patch.object(KaggleExtractor, 'count_csv_rows', side_effect=OSError("disco")):
+            assert extractor.validate_downloaded_files() is False
+
+
+class TestETLZipStaging:
+    """Testes da conversão ZIP -> Parquet sem extração dos CSVs"""
+
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL com client mockado e ZIP com dois CSVs"""
+        import zipfile
+
+        raw_path = tmp_path / "raw"
+        raw_path.mkdir()
+        zip_path = raw_path / "brazilian-ecommerce.zip"
+
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('olist_customers_dataset.csv', pd.DataFrame({
+                'customer_id': ['c1', 'c2'],
+                'customer_unique_id': ['u1', 'u2'],
+                'customer_zip_code_prefix': [1001, 2002],
+                'customer_city': ['sao paulo', 'rio de janeiro'],
+                'customer_state': ['SP', 'RJ'],
+            }).to_csv(index=False))
+            zf.writestr('olist_order_reviews_dataset.csv', pd.DataFrame({
+                'review_id': ['r1'],
+                'order_id': ['o1'],
+                'review_score': [5],
+                'review_comment_title': [None],
+                'review_comment_message': ['linha 1\nlinha 2'],
+                'review_creation_date': ['2018-01-01 00:00:00'],
+                'review_answer_timestamp': ['2018-01-02 10:00:00'],
+            }).to_csv(index=False))
+            zf.writestr('LEIAME.txt', 'não é CSV do dataset')
+
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL(
+                'project', 'dataset', str(raw_path),
+                processed_path=str(tmp_path / "processed"), zip_path=str(zip_path)
+            )
+        etl.client = Mock()
+
+        mock_job = Mock()
+        mock_job.errors = None
+        etl.client.load_table_from_file.return_value = mock_job
+        return etl
+
+    def test_stage_zip_to_parquet(self, etl):
+        """Testa a conversão tipada dos membros conhecidos do ZIP"""
+        import pyarrow.parquet as pq
+
+        staged = etl.stage_zip_to_parquet(etl.zip_path)
+
+        assert list(staged) == ['customers', 'reviews']
+        assert not list(etl.data_path.glob('*.csv'))
+
+        customers = pq.read_table(staged['customers'])
+        reviews = pq.read_table(staged['reviews'])
+        assert customers.num_rows == 2
+        assert str(reviews.schema.field('review_score').type) == 'int64'
+        assert reviews.column('review_comment_message')[0].as_py() == 'linha 1\nlinha 2'
+        assert str(reviews.schema.field('review_answer_timestamp').type) == 'timestamp[us]'
+
+    def test_unchanged_member_is_reused(self, etl):
+        """Testa que membros com mesmo CRC não são convertidos de novo"""
+        etl.stage_zip_to_parquet(etl.zip_path)
+
+        with patch.object(etl, '_write_csv_to_parquet') as write:
+            etl.stage_zip_to_parquet(etl.zip_path)
+
+        write.assert_not_called()
+
+    def test_staged_table_loads_from_parquet(self, etl):
+        """Testa que tabelas vindas do ZIP são carregadas do Parquet"""
+        staged = etl.stage_zip_to_parquet(etl.zip_path)
+
+        with patch.object(etl, 'load_parquet_to_bigquery') as load_parquet, \
+                patch.object(etl, 'validate_data_quality', return_value={'total_rows': 2}):
+            etl._process_table('olist_customers_dataset.csv', 'customers')
+
+        load_parquet.assert_called_once_with(staged['customers'], 'customers')
+
+    def test_extractor_streams_zip_to_etl(self, etl, tmp_path):
+        """Testa o modo de extração em Parquet do KaggleExtractor"""
+        extractor = KaggleExtractor(output_dir=str(etl.data_path))
+
+        assert extractor.extract_zip(str(etl.zip_path), etl=etl) is True
+
+        assert etl.zip_path.exists()
+        assert not list(etl.data_path.glob('*.csv'))
+        assert (etl.processed_path / 'customers.parquet').exists()
+
+    def test_pipeline_skips_unchanged_geolocation_from_zip(self, etl):
+        """Testa ZIP + skip_unchanged: geolocation usa o CRC do membro do ZIP"""
+        import zipfile
+
+        with zipfile.ZipFile(etl.zip_path, 'a') as zf:
+            zf.writestr('olist_geolocation_dataset.csv', pd.DataFrame({
+                'geolocation_zip_code_prefix': ['01001'],
+                'geolocation_lat': [-23.0],
+                'geolocation_lng': [-46.0],
+                'geolocation_city': ['sao paulo'],
+                'geolocation_state': ['SP'],
+            }).to_csv(index=False))
+        etl.skip_unchanged = True
+
+        with patch.object(etl, 'load_table_to_bigquery') as load_df, \
+                patch.object(etl, 'load_parquet_to_bigquery'), \
+                patch.object(etl, 'validate_data_quality',
+                             side_effect=lambda table: {'table': table, 'total_rows': 1}):
+            etl.run_full_pipeline()
+            etl.run_full_pipeline()
+
+        assert not (etl.data_path / 'olist_geolocation_dataset.csv').exists()
+        assert load_df.call_count == 1
+        assert load_df.call_args[0][1] == 'geolocation'
+        entry = etl._load_manifest()['olist_geolocation_dataset.csv']
+        assert entry['hash'].startswith('crc32:')
+
+
+class TestETLGeolocation:
+    """Testes da carga em blocos de geolocation (centróides por CEP)"""
+
+    @pytest.fixture
+    def etl(self, tmp_path):
+        """Fixture: ETL com CSV de geolocalização e client mockado"""
+        with patch('python.etl.load_to_bigquery.bigquery.Client'):
+            etl = OlistBigQueryETL('project', 'dataset', str(tmp_path))
+        etl.client = Mock()
+
+        mock_job = Mock()
+        mock_job.errors = None
+        etl.client.load_table_from_dataframe.return_value = mock_job
+
+        pd.DataFrame({
+            'geolocation_zip_code_prefix': ['01001', '01001', '01001', '01001', '20000', '99999'],
+            'geolocation_lat': [-23.0, -23.0, -24.0, -23.0, -22.9, 38.7],
+            'geolocation_lng': [-46.0, -46.0, -47.0, -46.0, -43.2, -9.1],
+            'geolocation_city': ['sao paulo', 'são paulo', 'sao paulo', 'sao paulo', 'rio de janeiro', 'lisboa'],
+            'geolocation_state': ['SP', 'SP', 'SP', 'SP', 'RJ', 'SP'],
+        }).to_csv(tmp_path / 'olist_geolocation_dataset.csv', index=False)
+        return etl
+
+    def test_geolocation_is_first_class_table(self, etl):
+        """Testa que geolocation faz parte do mapping e tem schema"""
+        assert etl.table_mapping['olist_geolocation_dataset.csv'] == 'geolocation'
+        fields = [f.name for f in etl.schemas['geolocation']]
+        assert fields[0] == 'geolocation_zip_code_prefix'
+        assert 'geolocation_points' in fields
+
+    @pytest.mark.parametrize('chunksize', [1, 2, 100])
+    def test_centroids_deduplicate_across_chunks(self, etl, chunksize):
+        """Testa dedup de pontos e média por CEP, independente do bloco"""
+        df = etl.load_geolocation_centroids(chunksize=chunksize).set_index('geolocation_zip_code_prefix')
+
+        # 01001: pontos distintos (-23, -46) e (-24, -47); 99999 está fora do Brasil
+        assert list(df.index) == ['01001', '20000']
+        assert df.loc['01001', 'geolocation_points'] == 2
+        assert df.loc['01001', 'geolocation_lat'] == pytest.approx(-23.5)
+        assert df.loc['01001', 'geolocation_lng'] == pytest.approx(-46.5)
+        assert df.loc['01001', 'geolocation_city'] == 'sao paulo'
+        assert df.loc['20000', 'geolocation_points'] == 1
+
+    def test_zip_prefix_keeps_leading_zeros(self, etl):
+        """Testa que o CEP é lido como texto"""
+        df = etl.load_geolocation_centroids()
+
+        assert '01001' in set(df['geolocation_zip_code_prefix'])
+
+    def test_process_table_uploads_centroids(self, etl):
+        """Testa que o pipeline carrega os centróides, não os pontos"""
+        with patch.object(etl, 'validate_data_quality', return_value={'total_rows': 2}):
+            etl._process_table('olist_geolocation_dataset.csv', 'geolocation')
+
+        uploaded = etl.client.load_table_from_dataframe.call_args[0][0]
+        assert len(uploaded) == 2
+        assert etl.client.load_table_from_dataframe.call_args[0][1] == 'project.dataset.geolocation'
+
+    def test_centroids_from_zip(self, etl, tmp_path):
+        """Testa a leitura direta do ZIP quando o CSV não foi extraído"""
+        import zipfile
+
+        csv_path = etl.data_path / 'olist_geolocation_dataset.csv'
+        zip_path = tmp_path / 'dataset.zip'
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.write(csv_path, 'olist_geolocation_dataset.csv')
+        csv_path.unlink()
+        etl.zip_path = zip_path
+
+        df = etl.load_geolocation_centroids()
+
+        assert len(df) == 2
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file